@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Analysis Job Queue for LUNGSCAREAI Backend
+Accepts analysis uploads as jobs that return an id immediately, runs them at a bounded
+concurrency and publishes their progress (decoded, classified, narrated, report_built)
+to pollers and WebSocket subscribers. Finished jobs are persisted as JSON.
+
+Settings:
+    LUNGSCARE_ANALYSIS_JOB_CONCURRENCY   analyses running at once (default 2)
+    LUNGSCARE_ANALYSIS_JOB_QUEUE_SIZE    jobs waiting before submissions are refused (default 100)
+    LUNGSCARE_ANALYSIS_JOB_HISTORY       finished jobs kept in memory (default 500, all stay on disk)
+    LUNGSCARE_ANALYSIS_JOB_DIR           where job records are persisted (default analysis_jobs)
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from executors import run_in_stage
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work"""
+
+
+class AnalysisJobQueue:
+    """Bounded queue of analysis jobs processed by a fixed number of runner tasks"""
+
+    def __init__(self, pipeline, get_patient_info, concurrency=None, queue_size=None,
+                 history=None, job_dir=None):
+        self.pipeline = pipeline
+        self.get_patient_info = get_patient_info
+        self.concurrency = max(1, concurrency or _env_int("LUNGSCARE_ANALYSIS_JOB_CONCURRENCY", 2))
+        self.queue_size = max(1, queue_size or _env_int("LUNGSCARE_ANALYSIS_JOB_QUEUE_SIZE", 100))
+        self.history = max(1, history or _env_int("LUNGSCARE_ANALYSIS_JOB_HISTORY", 500))
+        self.job_dir = job_dir or os.getenv("LUNGSCARE_ANALYSIS_JOB_DIR", "analysis_jobs")
+        self.jobs = {}
+        self._subscribers = {}
+        self._queue = None
+        self._runners = []
+
+    def start(self):
+        os.makedirs(self.job_dir, exist_ok=True)
+        self._mark_interrupted()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._runners = [asyncio.create_task(self._runner()) for _ in range(self.concurrency)]
+        print(f"📋 Analysis job queue started ({self.concurrency} runners)")
+
+    async def close(self):
+        for runner in self._runners:
+            runner.cancel()
+        self._runners = []
+
+    def _job_path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _persist(self, job_id, record):
+        with open(self._job_path(job_id), "w") as f:
+            f.write(record)
+
+    async def _save(self, job):
+        # Serialized on the loop so the writer thread never sees a record being updated
+        await run_in_stage("io", self._persist, job["id"], json.dumps(job, indent=2))
+
+    def _mark_interrupted(self):
+        """Jobs left queued/running by a previous process will never finish; record them as failed
+        and delete their uploads"""
+        for name in os.listdir(self.job_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.job_dir, name)
+            try:
+                with open(path, "r") as f:
+                    job = json.load(f)
+                if job.get("status") not in TERMINAL_STATUSES:
+                    job["status"] = "failed"
+                    job["error"] = "Interrupted by a server restart"
+                    job["updated_at"] = time.time()
+                    with open(path, "w") as f:
+                        json.dump(job, f, indent=2)
+                    upload_path = job.get("upload_path")
+                    if upload_path and os.path.exists(upload_path):
+                        os.remove(upload_path)
+            except Exception as e:
+                print(f"⚠️ Could not check job record {name}: {e}")
+
+    async def submit(self, modality, analysis_type, file_path, file_name, patient_number):
+        """Queue an analysis of an already saved upload and return the job record"""
+        if self._queue is None:
+            raise RuntimeError("Analysis job queue is not running")
+        if self._queue.full():
+            raise QueueFullError("Analysis queue is full, try again later")
+
+        now = time.time()
+        job = {
+            "id": str(uuid.uuid4()),
+            "modality": modality,
+            "analysis_type": analysis_type,
+            "patient_number": patient_number,
+            "file_name": file_name,
+            "upload_path": file_path,
+            "status": "queued",
+            "stage": None,
+            "stages": [],
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.jobs[job["id"]] = job
+        await self._save(job)
+        self._queue.put_nowait((job["id"], file_path))
+        return job
+
+    async def get(self, job_id):
+        """Job record from memory, or from disk for jobs no longer held in memory"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        path = self._job_path(job_id)
+        if not os.path.exists(path):
+            return None
+        return await run_in_stage("io", self._load, path)
+
+    @staticmethod
+    def _load(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def recent(self, limit=50):
+        jobs = sorted(self.jobs.values(), key=lambda job: job["created_at"], reverse=True)
+        return jobs[:limit]
+
+    def subscribe(self, job_id):
+        """Queue receiving this job's events until it finishes"""
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id, queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    async def _publish(self, job, event, data=None):
+        job["updated_at"] = time.time()
+        message = {"job_id": job["id"], "event": event, "status": job["status"], "stage": job["stage"]}
+        if data:
+            message["data"] = data
+        for queue in list(self._subscribers.get(job["id"], ())):
+            queue.put_nowait(message)
+        await self._save(job)
+
+    async def _stage(self, job, stage, data=None):
+        job["stage"] = stage
+        job["stages"].append({"stage": stage, "at": time.time()})
+        await self._publish(job, stage, data)
+
+    async def _runner(self):
+        while True:
+            job_id, file_path = await self._queue.get()
+            try:
+                await self._run(self.jobs[job_id], file_path)
+            except Exception as e:
+                print(f"❌ Analysis job {job_id} runner error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job, file_path):
+        job["status"] = "running"
+        await self._publish(job, "started")
+        try:
+            patient_info = await run_in_stage("io", self.get_patient_info, job["patient_number"])
+
+            async def on_stage(stage, data):
+                await self._stage(job, stage, data)
+
+            job["result"] = await self.pipeline.run(
+                job["modality"], job["analysis_type"], file_path, job["file_name"],
+                job["patient_number"], patient_info, on_stage=on_stage
+            )
+            job["status"] = "completed"
+            await self._publish(job, "completed", job["result"])
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            await self._publish(job, "failed", {"detail": str(e)})
+        finally:
+            # Clean up uploaded file
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            self._trim_history()
+
+    def _trim_history(self):
+        finished = [job for job in self.jobs.values() if job["status"] in TERMINAL_STATUSES]
+        if len(finished) <= self.history:
+            return
+        finished.sort(key=lambda job: job["updated_at"])
+        for job in finished[:len(finished) - self.history]:
+            # Still available from disk through get()
+            self.jobs.pop(job["id"], None)
+
+    def status(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts,
+        }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Analysis Pipeline for LUNGSCAREAI Backend
+Orchestrates one audio or X-ray analysis: upload decoding, classification on the model workers, the two
+independent LLM calls (UI narrative, clinical report text) fired concurrently, then PDF
+assembly and the patient record update.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+from executors import run_in_stage
+
+# (modality, analysis_type) -> analysis tool and the report type recorded on the patient
+ANALYSIS_TYPES = {
+    ("audio", "basic"): {"tool": "audio_classification", "report_type": "Audio Analysis (Basic)"},
+    ("audio", "gradient"): {"tool": "audio_gradient_xai", "report_type": "Audio Analysis (Gradient XAI)"},
+    ("audio", "attention"): {"tool": "audio_attention_xai", "report_type": "Audio Analysis (Attention XAI)"},
+    ("xray", "basic"): {"tool": "xray_classification", "report_type": "X-ray Analysis (Basic)"},
+    ("xray", "visualization"): {"tool": "xray_visualization", "report_type": "X-ray Analysis (Visualization)"},
+}
+
+CLASSIFICATION_TYPES = {"audio": "lung_audio", "xray": "chest_xray"}
+
+
+def decode_upload(modality, file_path):
+    """Load an upload with the decoders the analysis tools use; raises ValueError if it cannot be read"""
+    try:
+        if modality == "audio":
+            import soundfile as sf
+            try:
+                data, sample_rate = sf.read(file_path)
+            except Exception:
+                # Compressed formats libsndfile cannot read
+                import librosa
+                data, sample_rate = librosa.load(file_path, sr=None)
+            return {"sample_rate": int(sample_rate), "duration": round(len(data) / sample_rate, 2)}
+
+        from PIL import Image
+        with Image.open(file_path) as image:
+            image.load()
+            return {"width": image.width, "height": image.height}
+    except Exception as e:
+        raise ValueError(f"Could not decode {modality} upload: {e}")
+
+
+class AnalysisPipeline:
+    """Runs classification, concurrent LLM narration and report building for an upload"""
+
+    def __init__(self, rag_agent, report_generator, model_workers, add_report_to_patient):
+        self.rag_agent = rag_agent
+        self.report_generator = report_generator
+        self.model_workers = model_workers
+        self.add_report_to_patient = add_report_to_patient
+
+    async def classify(self, modality, analysis_type, file_path):
+        """Run the analysis tool and return (result dict, raw JSON)"""
+        spec = ANALYSIS_TYPES[(modality, analysis_type)]
+        result_json = await self.model_workers.run_tool(spec["tool"], file_path)
+        return json.loads(result_json), result_json
+
+    async def stream_narrative(self, modality, result_json, on_token):
+        """Stream the UI narrative through on_token as it is generated and return the full text"""
+        narrate = (self.rag_agent.process_audio_classification if modality == "audio"
+                   else self.rag_agent.process_xray_classification)
+        build_prompt = (self.rag_agent.build_audio_prompt if modality == "audio"
+                        else self.rag_agent.build_xray_prompt)
+
+        prompt = await run_in_stage("retrieval", build_prompt, json.loads(result_json))
+        if prompt is None:
+            return await run_in_stage("llm", narrate, result_json)
+
+        chunks = []
+        try:
+            async for chunk in self.rag_agent.llm.astream(prompt):
+                text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if text:
+                    chunks.append(text)
+                    await on_token(text)
+        except Exception as e:
+            print(f"Warning: narrative streaming failed: {e}")
+            if not chunks:
+                # Nothing sent yet, fall back to the blocking call
+                text = await run_in_stage("llm", narrate, result_json)
+                await on_token(text)
+                return text
+        return "".join(chunks)
+
+    async def narrate(self, modality, analysis_type, result, result_json, on_token=None):
+        """Fire the independent LLM calls concurrently; returns (detailed, clinical_text).
+
+        With on_token the UI narrative is streamed instead of returned in one piece.
+        """
+        label = result['label']
+        confidence = result.get('confidence', 0)
+
+        # XAI/visualization details are left out of the conversational narrative
+        if analysis_type != "basic":
+            result_json = json.dumps({
+                "label": label,
+                "confidence": confidence,
+                "classification_type": CLASSIFICATION_TYPES[modality]
+            })
+        narrate = (self.rag_agent.process_audio_classification if modality == "audio"
+                   else self.rag_agent.process_xray_classification)
+
+        if on_token is not None:
+            narrative = self.stream_narrative(modality, result_json, on_token)
+        else:
+            narrative = run_in_stage("llm", narrate, result_json)
+
+        return await asyncio.gather(
+            narrative,
+            run_in_stage("llm", self.rag_agent.generate_clinical_report_text, label, confidence, modality),
+        )
+
+    async def build_report(self, modality, patient_info, result, clinical_report_text, file_path):
+        generate = (self.report_generator.generate_medical_report if modality == "audio"
+                    else self.report_generator.generate_xray_report)
+        return await run_in_stage(
+            "report", generate,
+            patient_info, result['label'], clinical_report_text, file_path, result.get('visualization_saved')
+        )
+
+    async def run(self, modality, analysis_type, file_path, file_name, patient_number, patient_info,
+                  on_stage=None, on_token=None):
+        """Run the full analysis and return the AnalysisResponse payload.
+
+        on_stage, if given, is awaited as on_stage(stage, data) after each stage completes;
+        on_token, if given, receives the UI narrative as it streams.
+        """
+        async def emit(stage, data):
+            if on_stage is not None:
+                await on_stage(stage, data)
+
+        # Unreadable uploads fail here, before a model worker is involved
+        decoded = await run_in_stage("io", decode_upload, modality, file_path)
+        await emit("decoded", decoded)
+
+        result, result_json = await self.classify(modality, analysis_type, file_path)
+        await emit("classified", {"result": result})
+
+        detailed_analysis, clinical_report_text = await self.narrate(
+            modality, analysis_type, result, result_json, on_token=on_token
+        )
+        await emit("narrated", {"detailed_analysis": detailed_analysis})
+
+        report_path = await self.build_report(
+            modality, patient_info, result, clinical_report_text, file_path
+        )
+
+        # Add report to patient record
+        report_info = {
+            'type': ANALYSIS_TYPES[(modality, analysis_type)]["report_type"],
+            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'result': result['label'],
+            'confidence': result.get('confidence', 0),
+            'report_path': report_path,
+            'file_name': file_name
+        }
+        if result.get('visualization_saved'):
+            report_info['visualization_path'] = result['visualization_saved']
+        await run_in_stage("io", self.add_report_to_patient, patient_number, report_info)
+        await emit("report_built", {"report_path": report_path})
+
+        return {
+            "success": True,
+            "result": result,
+            "detailed_analysis": detailed_analysis,
+            "report_path": report_path,
+            "visualization_path": result.get('visualization_saved'),
+        }
@@ -9,15 +9,18 @@ import warnings
 import multiprocessing
 warnings.filterwarnings("ignore", message=".*resource_tracker.*", category=UserWarning)
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from sse_starlette.sse import EventSourceResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from contextlib import asynccontextmanager
 import os
+import asyncio
 import shutil
+import threading
 import uuid
 import json
 from datetime import datetime
@@ -26,20 +29,62 @@ from datetime import datetime
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import our existing modules
-from inf import AudioClassificationTool, AudioGradientXAITool, AudioAttentionXAITool
-from xray_tools import XrayClassificationTool, XrayVisualizationTool
+# Import our existing modules (audio/X-ray inference runs through model_workers)
 from rag import MedicalRAGAgent, PatientManager, MedicalReportGenerator
+from model_registry import model_registry
+from model_workers import model_workers
+from executors import run_in_stage, shutdown_executors, executor_status
+from analysis_pipeline import AnalysisPipeline, ANALYSIS_TYPES
+from analysis_jobs import AnalysisJobQueue, QueueFullError, TERMINAL_STATUSES
+from patient_context import PatientContextStore
+from chat_sessions import ChatSessionStore
 
 # Global variables for components
 rag_agent = None
 patient_manager = None
 report_generator = None
+analysis_pipeline = None
+analysis_jobs = None
+# Bounded per-patient report context for chat, updated as reports are appended
+patient_contexts = PatientContextStore()
+# Server-side chat conversations keyed by session id
+chat_sessions = ChatSessionStore()
+# Background tasks (e.g. streamed analyses outliving their response) kept referenced until done
+_background_tasks = set()
+
+def _track_background(task):
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+MODEL_SWEEP_INTERVAL = 60  # seconds between idle-model eviction sweeps
+# seconds between checks of the knowledge base version for the precomputed retrieval contexts
+CONTEXT_REFRESH_INTERVAL = float(os.getenv("LUNGSCARE_CONTEXT_REFRESH_INTERVAL", "300"))
+
+async def _sweep_idle_models():
+    """Periodically unload models that have been idle longer than the registry timeout"""
+    while True:
+        await asyncio.sleep(MODEL_SWEEP_INTERVAL)
+        try:
+            model_registry.evict_idle()
+        except Exception as e:
+            print(f"⚠️ Model sweep warning: {e}")
+
+async def _refresh_static_contexts():
+    """Recompute the static retrieval contexts when the collection version changes"""
+    while True:
+        await asyncio.sleep(CONTEXT_REFRESH_INTERVAL)
+        if rag_agent is None:
+            continue
+        try:
+            await run_in_stage("retrieval", rag_agent.refresh_static_contexts)
+        except Exception as e:
+            print(f"⚠️ Static context refresh warning: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global rag_agent, patient_manager, report_generator
+    global rag_agent, patient_manager, report_generator, analysis_pipeline, analysis_jobs
     print("🚀 Initializing LUNGSCAREAI Backend...")
     
     try:
@@ -47,14 +92,32 @@ async def lifespan(app: FastAPI):
         rag_agent = MedicalRAGAgent()
         patient_manager = PatientManager()
         report_generator = MedicalReportGenerator()
+        model_workers.start()
+        analysis_pipeline = AnalysisPipeline(rag_agent, report_generator, model_workers, _add_report_to_patient)
+        analysis_jobs = AnalysisJobQueue(analysis_pipeline, _get_patient_info)
+        analysis_jobs.start()
         print("✅ All components initialized successfully!")
     except Exception as e:
         print(f"❌ Initialization error: {e}")
+    
+    if rag_agent is not None and os.getenv("LUNGSCARE_LLM_CACHE_WARMUP", "0") == "1":
+        _track_background(asyncio.create_task(_warm_quick_info_cache()))
+    if rag_agent is not None and os.getenv("LUNGSCARE_REPORT_TEXT_PREGENERATE", "0") == "1":
+        _track_background(asyncio.create_task(run_in_stage("llm", rag_agent.report_text_store.pregenerate)))
+
+    sweeper = asyncio.create_task(_sweep_idle_models())
+    context_refresher = asyncio.create_task(_refresh_static_contexts())
         
     yield
     
     # Shutdown
     print("🔄 Shutting down LUNGSCAREAI Backend...")
+    sweeper.cancel()
+    context_refresher.cancel()
+    if analysis_jobs is not None:
+        await analysis_jobs.close()
+    await model_workers.close()
+    shutdown_executors()
     
     # Clean up resources
     try:
@@ -144,6 +207,8 @@ class QuestionRequest(BaseModel):
     question: str
     language: Optional[str] = "english"
     patient_number: Optional[str] = None
+    # Conversation state lives on the server; chat_history only seeds a new session
+    session_id: Optional[str] = None
     chat_history: Optional[List[ChatMessage]] = None
 
 # Components are now initialized in the lifespan handler above
@@ -153,6 +218,62 @@ class QuestionRequest(BaseModel):
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/models")
+async def get_models():
+    """Report which analysis models are currently resident in memory"""
+    status = model_registry.status()
+    status["workers"] = model_workers.status()
+    status["executors"] = executor_status()
+    return status
+
+@app.get("/api/workers")
+async def get_workers():
+    """Report model worker pools per modality"""
+    return model_workers.status()
+
+@app.get("/api/workers/{modality}/models")
+async def get_worker_models(modality: str):
+    """Report the models resident in one of a modality's workers"""
+    if modality not in ("audio", "xray"):
+        raise HTTPException(status_code=404, detail=f"Unknown modality '{modality}'")
+    return await model_workers.resident_models(modality)
+
+@app.post("/api/workers/{modality}/restart")
+async def restart_workers(modality: str, terminate: bool = False):
+    """Restart one modality's model workers without touching the other"""
+    try:
+        return model_workers.restart(modality, terminate=terminate)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/api/retrieval")
+async def get_retrieval_status():
+    """Retriever availability and embedding cache hit rates"""
+    if rag_agent is None:
+        raise HTTPException(status_code=503, detail="RAG agent is not initialized")
+    return rag_agent.retrieval_status()
+
+@app.get("/api/caches")
+async def get_caches():
+    """Hit rates and sizes of the response caches"""
+    if rag_agent is None:
+        raise HTTPException(status_code=503, detail="RAG agent is not initialized")
+    return {
+        "llm_responses": await run_in_stage("io", rag_agent.llm_cache.stats),
+        "query_embeddings": rag_agent.embeddings.stats() if rag_agent.embeddings is not None else None,
+        "chat_answers": rag_agent.answer_cache.stats(),
+        "report_texts": rag_agent.report_text_store.stats(),
+        "llm_coalescing": rag_agent.llm.stats(),
+        "patient_contexts": patient_contexts.stats(),
+        "chat_sessions": chat_sessions.stats(),
+    }
+
+@app.get("/api/runtime")
+async def get_runtime():
+    """Report requested and effective PyTorch/TensorFlow thread settings per modality"""
+    # Read from the worker processes, where the settings are applied
+    return await model_workers.runtime_settings()
+
 # Load sample data for demo
 @app.post("/api/demo/load-sample-data")
 async def load_sample_data():
@@ -185,6 +306,13 @@ async def clear_demo_data():
 async def register_patient(patient_data: PatientCreate):
     """Register a new patient"""
     try:
+        patient_info = await run_in_stage("io", _register_patient, patient_data)
+        return PatientResponse(**patient_info)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _register_patient(patient_data: PatientCreate) -> dict:
+    with _patient_records_lock:
         # Create patient info
         patient_counter = patient_manager.load_patient_counter()
         patient_counter += 1
@@ -204,17 +332,13 @@ async def register_patient(patient_data: PatientCreate):
         # Set the counter before saving
         patient_manager.patient_counter = patient_counter
         patient_manager.save_patient_data(patient_info)
-        
-        return PatientResponse(**patient_info)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return patient_info
 
 @app.get("/api/patients")
 async def get_patients():
     """Get all registered patients"""
     try:
-        with open("patient_records.json", "r") as f:
-            data = json.load(f)
+        data = await run_in_stage("io", _load_patient_records)
         
         # Handle both old format (direct array) and new format (with patients key)
         if isinstance(data, list):
@@ -228,6 +352,9 @@ async def get_patients():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac')
+XRAY_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+
 # Audio Analysis Endpoints
 @app.post("/api/analyze/audio/basic")
 async def analyze_audio_basic(
@@ -255,149 +382,28 @@ async def analyze_audio_attention(
 
 async def _process_audio_analysis(file: UploadFile, patient_number: str, analysis_type: str):
     """Common audio analysis processing"""
-    if not file.filename.lower().endswith(('.wav', '.mp3', '.m4a', '.flac')):
+    if not file.filename.lower().endswith(AUDIO_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Invalid audio file format")
     
+    file_path = None
     try:
         # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1]
-        file_path = f"uploads/{file_id}{file_extension}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_path = await _stage_upload(file)
         
         # Get patient info
-        patient_info = _get_patient_info(patient_number)
+        patient_info = await run_in_stage("io", _get_patient_info, patient_number)
         
-        # Perform analysis based on type
-        if analysis_type == "basic":
-            tool = AudioClassificationTool()
-            result_json = tool._run(file_path)
-            result = json.loads(result_json)
-            
-            # Get detailed analysis for UI (conversational)
-            detailed_analysis = rag_agent.process_audio_classification(result_json)
-            
-            # Generate clinical report text for PDF (formal, non-conversational)
-            clinical_report_text = rag_agent.generate_clinical_report_text(
-                result['label'], result['confidence'], "audio"
-            )
-
-            # Generate report with clinical text
-            report_path = report_generator.generate_medical_report(
-                patient_info, result['label'], clinical_report_text, file_path
-            )
-            
-            # Add report to patient record
-            report_info = {
-                'type': 'Audio Analysis (Basic)',
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'result': result['label'],
-                'confidence': result['confidence'],
-                'report_path': report_path,
-                'file_name': file.filename
-            }
-            _add_report_to_patient(patient_number, report_info)
-            
-            return AnalysisResponse(
-                success=True,
-                result=result,
-                detailed_analysis=detailed_analysis,
-                report_path=report_path
-            )
-        
-        elif analysis_type == "gradient":
-            tool = AudioGradientXAITool()
-            result_json = tool._run(file_path)
-            result = json.loads(result_json)
-            
-            # Conversational response for UI
-            detailed_analysis = rag_agent.process_audio_classification(
-                json.dumps({
-                    "label": result['label'],
-                    "confidence": result['confidence'],
-                    "classification_type": "lung_audio"
-                })
-            )
-            
-            # Clinical report text for PDF
-            clinical_report_text = rag_agent.generate_clinical_report_text(
-                result['label'], result['confidence'], "audio"
-            )
-
-            report_path = report_generator.generate_medical_report(
-                patient_info, result['label'], clinical_report_text, file_path, result.get('visualization_saved')
-            )
-            
-            # Add report to patient record
-            report_info = {
-                'type': 'Audio Analysis (Gradient XAI)',
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'result': result['label'],
-                'confidence': result['confidence'],
-                'report_path': report_path,
-                'visualization_path': result.get('visualization_saved'),
-                'file_name': file.filename
-            }
-            _add_report_to_patient(patient_number, report_info)
-            
-            return AnalysisResponse(
-                success=True,
-                result=result,
-                detailed_analysis=detailed_analysis,
-                report_path=report_path,
-                visualization_path=result.get('visualization_saved')
-            )
-        
-        elif analysis_type == "attention":
-            tool = AudioAttentionXAITool()
-            result_json = tool._run(file_path)
-            result = json.loads(result_json)
-            
-            # Conversational response for UI
-            detailed_analysis = rag_agent.process_audio_classification(
-                json.dumps({
-                    "label": result['label'],
-                    "confidence": result['confidence'],
-                    "classification_type": "lung_audio"
-                })
-            )
-            
-            # Clinical report text for PDF
-            clinical_report_text = rag_agent.generate_clinical_report_text(
-                result['label'], result['confidence'], "audio"
-            )
-
-            report_path = report_generator.generate_medical_report(
-                patient_info, result['label'], clinical_report_text, file_path, result.get('visualization_saved')
-            )
-            
-            # Add report to patient record
-            report_info = {
-                'type': 'Audio Analysis (Attention XAI)',
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'result': result['label'],
-                'confidence': result['confidence'],
-                'report_path': report_path,
-                'visualization_path': result.get('visualization_saved'),
-                'file_name': file.filename
-            }
-            _add_report_to_patient(patient_number, report_info)
-            
-            return AnalysisResponse(
-                success=True,
-                result=result,
-                detailed_analysis=detailed_analysis,
-                report_path=report_path,
-                visualization_path=result.get('visualization_saved')
-            )
+        # Classification, concurrent LLM narration and report building
+        payload = await analysis_pipeline.run(
+            "audio", analysis_type, file_path, file.filename, patient_number, patient_info
+        )
+        return AnalysisResponse(**payload)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         # Clean up uploaded file
-        if os.path.exists(file_path):
+        if file_path and os.path.exists(file_path):
             os.remove(file_path)
 
 # X-ray Analysis Endpoints
@@ -419,120 +425,196 @@ async def analyze_xray_visualization(
 
 async def _process_xray_analysis(file: UploadFile, patient_number: str, analysis_type: str):
     """Common X-ray analysis processing"""
-    if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff')):
+    if not file.filename.lower().endswith(XRAY_EXTENSIONS):
         raise HTTPException(status_code=400, detail="Invalid image file format")
     
+    file_path = None
     try:
         # Save uploaded file
-        file_id = str(uuid.uuid4())
-        file_extension = os.path.splitext(file.filename)[1]
-        file_path = f"uploads/{file_id}{file_extension}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_path = await _stage_upload(file)
         
         # Get patient info
-        patient_info = _get_patient_info(patient_number)
-        
-        # Perform analysis based on type
-        if analysis_type == "basic":
-            tool = XrayClassificationTool()
-            result_json = tool._run(file_path)
-            result = json.loads(result_json)
-            
-            # Conversational response for UI
-            detailed_analysis = rag_agent.process_xray_classification(result_json)
-            
-            # Clinical report text for PDF (formal, non-conversational)
-            clinical_report_text = rag_agent.generate_clinical_report_text(
-                result['label'], result.get('confidence', 0), "xray"
-            )
-
-            # Generate report with clinical text
-            report_path = report_generator.generate_xray_report(
-                patient_info, result['label'], clinical_report_text, file_path
-            )
-            
-            # Add report to patient record
-            report_info = {
-                'type': 'X-ray Analysis (Basic)',
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'result': result['label'],
-                'confidence': result.get('confidence', 0),
-                'report_path': report_path,
-                'file_name': file.filename
-            }
-            _add_report_to_patient(patient_number, report_info)
-            
-            return AnalysisResponse(
-                success=True,
-                result=result,
-                detailed_analysis=detailed_analysis,
-                report_path=report_path
-            )
+        patient_info = await run_in_stage("io", _get_patient_info, patient_number)
         
-        elif analysis_type == "visualization":
-            tool = XrayVisualizationTool()
-            result_json = tool._run(file_path)
-            result = json.loads(result_json)
-            
-            # Conversational response for UI
-            detailed_analysis = rag_agent.process_xray_classification(
-                json.dumps({
-                    "label": result['label'],
-                    "confidence": result['confidence'],
-                    "classification_type": "chest_xray"
-                })
-            )
-            
-            # Clinical report text for PDF
-            clinical_report_text = rag_agent.generate_clinical_report_text(
-                result['label'], result['confidence'], "xray"
-            )
-
-            report_path = report_generator.generate_xray_report(
-                patient_info, result['label'], clinical_report_text, file_path, result.get('visualization_saved')
-            )
-            
-            # Add report to patient record
-            report_info = {
-                'type': 'X-ray Analysis (Visualization)',
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'result': result['label'],
-                'confidence': result.get('confidence', 0),
-                'report_path': report_path,
-                'visualization_path': result.get('visualization_saved'),
-                'file_name': file.filename
-            }
-            _add_report_to_patient(patient_number, report_info)
-            
-            return AnalysisResponse(
-                success=True,
-                result=result,
-                detailed_analysis=detailed_analysis,
-                report_path=report_path,
-                visualization_path=result.get('visualization_saved')
-            )
+        # Classification, concurrent LLM narration and report building
+        payload = await analysis_pipeline.run(
+            "xray", analysis_type, file_path, file.filename, patient_number, patient_info
+        )
+        return AnalysisResponse(**payload)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
         # Clean up uploaded file
-        if os.path.exists(file_path):
+        if file_path and os.path.exists(file_path):
             os.remove(file_path)
 
+# Streaming analysis endpoints (Server-Sent Events)
+# Events: classified -> token* -> narrated -> report_built -> done (or error)
+@app.post("/api/analyze/audio/{analysis_type}/stream")
+async def analyze_audio_stream(
+    analysis_type: str,
+    file: UploadFile = File(...),
+    patient_number: str = Form(...)
+):
+    """Audio analysis streamed as Server-Sent Events"""
+    return await _stream_analysis("audio", analysis_type, file, patient_number)
+
+@app.post("/api/analyze/xray/{analysis_type}/stream")
+async def analyze_xray_stream(
+    analysis_type: str,
+    file: UploadFile = File(...),
+    patient_number: str = Form(...)
+):
+    """X-ray analysis streamed as Server-Sent Events"""
+    return await _stream_analysis("xray", analysis_type, file, patient_number)
+
+async def _stream_analysis(modality: str, analysis_type: str, file: UploadFile, patient_number: str):
+    """Save the upload, then stream the analysis stages and narrative tokens as they complete"""
+    if (modality, analysis_type) not in ANALYSIS_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown {modality} analysis type '{analysis_type}'")
+    extensions = AUDIO_EXTENSIONS if modality == "audio" else XRAY_EXTENSIONS
+    if not file.filename.lower().endswith(extensions):
+        detail = "Invalid audio file format" if modality == "audio" else "Invalid image file format"
+        raise HTTPException(status_code=400, detail=detail)
+
+    # The upload must be read before the response starts streaming
+    file_path = await _stage_upload(file)
+    try:
+        patient_info = await run_in_stage("io", _get_patient_info, patient_number)
+    except Exception as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    events = asyncio.Queue()
+
+    async def on_stage(stage, data):
+        await events.put(_sse(stage, data))
+
+    async def on_token(text):
+        await events.put(_sse("token", {"text": text}))
+
+    async def run_analysis():
+        try:
+            payload = await analysis_pipeline.run(
+                modality, analysis_type, file_path, file.filename, patient_number, patient_info,
+                on_stage=on_stage, on_token=on_token
+            )
+            await events.put(_sse("done", payload))
+        except Exception as e:
+            await events.put(_sse("error", {"detail": str(e)}))
+        finally:
+            # Clean up uploaded file; runs even if the client disconnected mid-stream
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            await events.put(None)
+
+    # The analysis keeps running if the client goes away so the report is still recorded
+    _track_background(asyncio.create_task(run_analysis()))
+
+    async def event_stream():
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+
+    return EventSourceResponse(event_stream())
+
+# Analysis job endpoints: submit returns a job id at once, progress via polling or WebSocket
+@app.post("/api/jobs/analyze/{modality}/{analysis_type}", status_code=202)
+async def submit_analysis_job(
+    modality: str,
+    analysis_type: str,
+    file: UploadFile = File(...),
+    patient_number: str = Form(...)
+):
+    """Queue an audio or X-ray analysis and return its job id"""
+    if (modality, analysis_type) not in ANALYSIS_TYPES:
+        raise HTTPException(status_code=404, detail=f"Unknown {modality} analysis type '{analysis_type}'")
+    extensions = AUDIO_EXTENSIONS if modality == "audio" else XRAY_EXTENSIONS
+    if not file.filename.lower().endswith(extensions):
+        detail = "Invalid audio file format" if modality == "audio" else "Invalid image file format"
+        raise HTTPException(status_code=400, detail=detail)
+    if analysis_jobs is None:
+        raise HTTPException(status_code=503, detail="Analysis job queue is not available")
+
+    file_path = await _stage_upload(file)
+    try:
+        job = await analysis_jobs.submit(modality, analysis_type, file_path, file.filename, patient_number)
+    except QueueFullError as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/ws",
+    }
+
+@app.get("/api/jobs")
+async def list_analysis_jobs(limit: int = 50):
+    """Recent analysis jobs and queue status"""
+    if analysis_jobs is None:
+        raise HTTPException(status_code=503, detail="Analysis job queue is not available")
+    return {"jobs": analysis_jobs.recent(limit), "queue": analysis_jobs.status()}
+
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Current status, completed stages and (when finished) the result of a job"""
+    if analysis_jobs is None:
+        raise HTTPException(status_code=503, detail="Analysis job queue is not available")
+    job = await analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.websocket("/api/jobs/{job_id}/ws")
+async def analysis_job_events(websocket: WebSocket, job_id: str):
+    """Push a job snapshot followed by its progress events until it finishes"""
+    await websocket.accept()
+    if analysis_jobs is None:
+        await websocket.close(code=1011)
+        return
+
+    # Subscribe before taking the snapshot so no event falls between the two
+    events = analysis_jobs.subscribe(job_id)
+    try:
+        job = await analysis_jobs.get(job_id)
+        if job is None:
+            await websocket.send_json({"job_id": job_id, "event": "error", "detail": "Job not found"})
+            return
+        await websocket.send_json({"job_id": job_id, "event": "snapshot", "job": job})
+        if job["status"] in TERMINAL_STATUSES:
+            return
+        while True:
+            message = await events.get()
+            await websocket.send_json(message)
+            if message["status"] in TERMINAL_STATUSES:
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        analysis_jobs.unsubscribe(job_id, events)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
 # ═══════════════════════════════════════════════════════════
 # UNIQUE FEATURES - Symptom Checker, Second Opinion, Health Tips
 # ═══════════════════════════════════════════════════════════
 
-@app.post("/api/symptom-checker")
-async def check_symptoms(request: SymptomCheckRequest):
-    """AI-powered symptom checker for respiratory conditions"""
-    try:
-        # Build symptom analysis prompt
-        symptoms_str = ", ".join(request.symptoms)
+def _symptom_checker_prompt(request: SymptomCheckRequest) -> str:
+    """Build the symptom checker prompt"""
+    # Build symptom analysis prompt
+    symptoms_str = ", ".join(request.symptoms)
 
-        prompt = f"""You are MedGemma, an expert medical AI assistant specializing in respiratory health.
+    prompt = f"""You are MedGemma, an expert medical AI assistant specializing in respiratory health.
 
 ═══════════════════════════════════════════════════════════
 🩺 SYMPTOM ANALYSIS REQUEST
@@ -570,40 +652,54 @@ Be thorough but not alarmist. Focus on respiratory conditions.
 ⚕️ End with medical disclaimer.
 
 RESPONSE:"""
+    return prompt
 
-        response = rag_agent.llm.invoke(prompt)
+@app.post("/api/symptom-checker")
+async def check_symptoms(request: SymptomCheckRequest):
+    """AI-powered symptom checker for respiratory conditions"""
+    try:
+        prompt = _symptom_checker_prompt(request)
+        response = await rag_agent.llm.ainvoke(prompt)
         if hasattr(response, 'content'):
             response_text = response.content
         else:
             response_text = str(response)
 
-        # Determine urgency level from response
-        urgency = "moderate"
-        if "🔴" in response_text or "High" in response_text:
-            urgency = "high"
-        elif "🚨" in response_text or "Emergency" in response_text:
-            urgency = "emergency"
-        elif "🟢" in response_text or "Low" in response_text:
-            urgency = "low"
-
         return {
             "success": True,
             "analysis": response_text,
-            "urgency": urgency,
+            "urgency": _detect_urgency(response_text),
             "symptoms_analyzed": request.symptoms
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/symptom-checker/stream")
+async def check_symptoms_stream(request: SymptomCheckRequest):
+    """Symptom checker streamed as Server-Sent Events"""
+    async def on_done(response_text):
+        return {"urgency": _detect_urgency(response_text), "symptoms_analyzed": request.symptoms}
+
+    return EventSourceResponse(_stream_llm(_symptom_checker_prompt(request), on_done))
 
-@app.post("/api/second-opinion")
-async def get_second_opinion(request: SecondOpinionRequest):
-    """Generate AI second opinion with differential diagnoses"""
-    try:
-        analysis_type_label = "lung audio" if request.analysis_type == "audio" else "chest X-ray"
 
-        prompt = f"""You are MedGemma providing a clinical second opinion analysis.
+def _detect_urgency(response_text: str) -> str:
+    """Determine urgency level from a symptom checker response"""
+    urgency = "moderate"
+    if "🔴" in response_text or "High" in response_text:
+        urgency = "high"
+    elif "🚨" in response_text or "Emergency" in response_text:
+        urgency = "emergency"
+    elif "🟢" in response_text or "Low" in response_text:
+        urgency = "low"
+    return urgency
+
+def _second_opinion_prompt(request: SecondOpinionRequest) -> str:
+    """Build the second opinion prompt"""
+    analysis_type_label = "lung audio" if request.analysis_type == "audio" else "chest X-ray"
+
+    prompt = f"""You are MedGemma providing a clinical second opinion analysis.
 
 ═══════════════════════════════════════════════════════════
 📊 PRIMARY DIAGNOSIS
@@ -640,8 +736,14 @@ Provide 1-2 key clinical insights about this diagnosis.
 Keep response concise and clinically relevant.
 
 RESPONSE:"""
+    return prompt
 
-        response = rag_agent.llm.invoke(prompt)
+@app.post("/api/second-opinion")
+async def get_second_opinion(request: SecondOpinionRequest):
+    """Generate AI second opinion with differential diagnoses"""
+    try:
+        prompt = _second_opinion_prompt(request)
+        response = await rag_agent.llm.ainvoke(prompt)
         if hasattr(response, 'content'):
             response_text = response.content
         else:
@@ -659,22 +761,25 @@ RESPONSE:"""
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/second-opinion/stream")
+async def get_second_opinion_stream(request: SecondOpinionRequest):
+    """Second opinion streamed as Server-Sent Events"""
+    return EventSourceResponse(_stream_llm(_second_opinion_prompt(request)))
 
-@app.post("/api/health-tips")
-async def get_health_tips(request: HealthTipsRequest):
-    """Get personalized health tips based on category or condition"""
-    try:
-        # Customize prompt based on request
-        if request.condition:
-            topic = f"managing {request.condition}"
-        elif request.category == "lung_health":
-            topic = "maintaining optimal lung health"
-        elif request.category == "post_diagnosis":
-            topic = "recovery and health maintenance after respiratory diagnosis"
-        else:
-            topic = "general respiratory wellness"
 
-        prompt = f"""You are MedGemma, providing expert health advice.
+def _health_tips_prompt(request: HealthTipsRequest) -> str:
+    """Build the health tips prompt"""
+    # Customize prompt based on request
+    if request.condition:
+        topic = f"managing {request.condition}"
+    elif request.category == "lung_health":
+        topic = "maintaining optimal lung health"
+    elif request.category == "post_diagnosis":
+        topic = "recovery and health maintenance after respiratory diagnosis"
+    else:
+        topic = "general respiratory wellness"
+
+    prompt = f"""You are MedGemma, providing expert health advice.
 
 ═══════════════════════════════════════════════════════════
 💡 HEALTH TIPS REQUEST
@@ -717,12 +822,14 @@ Make tips practical and actionable. Use emojis for visual appeal.
 ⚕️ End with: "These are general wellness tips. Consult your doctor for personalized advice."
 
 RESPONSE:"""
+    return prompt
 
-        response = rag_agent.llm.invoke(prompt)
-        if hasattr(response, 'content'):
-            response_text = response.content
-        else:
-            response_text = str(response)
+@app.post("/api/health-tips")
+async def get_health_tips(request: HealthTipsRequest):
+    """Get personalized health tips based on category or condition"""
+    try:
+        # The prompt only depends on category/condition, so repeated requests hit the cache
+        response_text = await rag_agent.cached_llm.ainvoke(_health_tips_prompt(request))
 
         return {
             "success": True,
@@ -734,38 +841,31 @@ RESPONSE:"""
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/health-tips/stream")
+async def get_health_tips_stream(request: HealthTipsRequest):
+    """Health tips streamed as Server-Sent Events"""
+    return EventSourceResponse(_stream_llm(_health_tips_prompt(request)))
 
-@app.get("/api/quick-info/{topic}")
-async def get_quick_info(topic: str):
-    """Get quick medical information on common topics"""
 
-    # Predefined quick info topics
-    quick_topics = {
-        "breathing-exercises": "breathing exercises for lung health",
-        "pneumonia": "pneumonia symptoms prevention treatment",
-        "covid": "COVID-19 symptoms prevention recovery",
-        "asthma": "asthma management triggers treatment",
-        "copd": "COPD chronic obstructive pulmonary disease",
-        "tuberculosis": "tuberculosis TB symptoms treatment",
-        "smoking-cessation": "quit smoking lung health recovery",
-        "air-quality": "indoor air quality respiratory health"
-    }
+# Predefined quick info topics
+QUICK_INFO_TOPICS = {
+    "breathing-exercises": "breathing exercises for lung health",
+    "pneumonia": "pneumonia symptoms prevention treatment",
+    "covid": "COVID-19 symptoms prevention recovery",
+    "asthma": "asthma management triggers treatment",
+    "copd": "COPD chronic obstructive pulmonary disease",
+    "tuberculosis": "tuberculosis TB symptoms treatment",
+    "smoking-cessation": "quit smoking lung health recovery",
+    "air-quality": "indoor air quality respiratory health"
+}
 
-    if topic.lower() not in quick_topics:
-        return {
-            "success": False,
-            "error": "Topic not found",
-            "available_topics": list(quick_topics.keys())
-        }
+async def _quick_info(query: str) -> str:
+    """Retrieve context for a quick info topic and answer it (cached per prompt)"""
+    # Get relevant docs from RAG
+    docs = await run_in_stage("retrieval", rag_agent.keyword_documents, query, 3)
+    context = "\n".join([doc.page_content for doc in docs])
 
-    try:
-        query = quick_topics[topic.lower()]
-
-        # Get relevant docs from RAG
-        docs = rag_agent.retriever.invoke(query)
-        context = "\n".join([doc.page_content for doc in docs[:3]])
-
-        prompt = f"""You are MedGemma providing quick medical information.
+    prompt = f"""You are MedGemma providing quick medical information.
 
 Topic: {query}
 
@@ -781,11 +881,29 @@ Provide a concise, informative response about {query}:
 
 RESPONSE:"""
 
-        response = rag_agent.llm.invoke(prompt)
-        if hasattr(response, 'content'):
-            response_text = response.content
-        else:
-            response_text = str(response)
+    return await rag_agent.cached_llm.ainvoke(prompt)
+
+async def _warm_quick_info_cache():
+    """Fill the LLM response cache for every quick info topic"""
+    for topic, query in QUICK_INFO_TOPICS.items():
+        try:
+            await _quick_info(query)
+        except Exception as e:
+            print(f"⚠️ Quick info warm-up failed for '{topic}': {e}")
+    print(f"🔥 Quick info cache warmed for {len(QUICK_INFO_TOPICS)} topics")
+
+@app.get("/api/quick-info/{topic}")
+async def get_quick_info(topic: str):
+    """Get quick medical information on common topics"""
+    if topic.lower() not in QUICK_INFO_TOPICS:
+        return {
+            "success": False,
+            "error": "Topic not found",
+            "available_topics": list(QUICK_INFO_TOPICS.keys())
+        }
+
+    try:
+        response_text = await _quick_info(QUICK_INFO_TOPICS[topic.lower()])
 
         return {
             "success": True,
@@ -802,39 +920,134 @@ RESPONSE:"""
 async def chat_with_system(request: QuestionRequest):
     """Chat with the medical AI system with patient context and chat history"""
     try:
-        patient_info = None
-        patient_reports_context = ""
-        
-        # Get patient context if provided
-        if request.patient_number:
-            try:
-                patient_info = _get_patient_info(request.patient_number)
-                patient_reports_context = _get_patient_reports_context(patient_info)
-            except:
-                # Continue without patient context if not found
-                pass
+        patient_info, patient_reports_context, chat_context, session = await _chat_context(request)
         
-        # Prepare chat history context
-        chat_context = ""
-        if request.chat_history and len(request.chat_history) > 0:
-            chat_context = "\n\nPrevious conversation:\n"
-            for msg in request.chat_history[-6:]:  # Use last 6 messages for context
-                role = "Human" if msg.type == "user" else "Assistant"
-                chat_context += f"{role}: {msg.content}\n"
-        
-        # Get response with full context
-        response = rag_agent.answer_question_with_context(
-            question=request.question,
-            language=request.language,
-            patient_info=patient_info,
-            patient_reports_context=patient_reports_context,
-            chat_context=chat_context
+        # Get response with full context (general answers may come straight from the semantic cache)
+        response = await run_in_stage(
+            "retrieval", rag_agent.cached_answer,
+            request.question, request.language, patient_info, patient_reports_context, chat_context
         )
+        if response is None:
+            documents = await run_in_stage("retrieval", _session_documents, session, request.question)
+            response = await run_in_stage(
+                "llm", rag_agent.answer_question_with_context,
+                question=request.question,
+                language=request.language,
+                patient_info=patient_info,
+                patient_reports_context=patient_reports_context,
+                chat_context=chat_context,
+                documents=documents,
+                check_cache=False
+            )
+        session.add_turn(request.question, response)
         
-        return {"response": response}
+        return {"response": response, "session_id": session.session_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_with_system_stream(request: QuestionRequest):
+    """Chat answer streamed token by token as Server-Sent Events"""
+    patient_info, patient_reports_context, chat_context, session = await _chat_context(request)
+
+    async def event_stream():
+        cached = await run_in_stage(
+            "retrieval", rag_agent.cached_answer,
+            request.question, request.language, patient_info, patient_reports_context, chat_context
+        )
+        if cached is not None:
+            session.add_turn(request.question, cached)
+            yield _sse("token", {"text": cached})
+            yield _sse("done", {"response": cached, "cached": True, "session_id": session.session_id})
+            return
+
+        documents = await run_in_stage("retrieval", _session_documents, session, request.question)
+        prompt, rag_failed = await run_in_stage(
+            "retrieval", rag_agent.build_question_prompt,
+            request.question, request.language, patient_info, patient_reports_context, chat_context, documents
+        )
+        chunks = []
+        try:
+            async for chunk in rag_agent.llm.astream(prompt):
+                text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if text:
+                    chunks.append(text)
+                    yield _sse("token", {"text": text})
+        except Exception as e:
+            error_str = str(e)
+            print(f"Error streaming LLM response: {error_str}")
+            if chunks:
+                yield _sse("error", {"detail": error_str})
+                return
+            # Nothing sent yet: answer with the same fallback message as /api/chat
+            fallback = rag_agent.question_error_message(request.question, error_str, rag_failed)
+            session.add_turn(request.question, fallback)
+            yield _sse("token", {"text": fallback})
+            yield _sse("done", {"response": fallback, "session_id": session.session_id})
+            return
+        response_text = "".join(chunks)
+        session.add_turn(request.question, response_text)
+        await run_in_stage(
+            "retrieval", rag_agent.remember_answer,
+            request.question, response_text, rag_failed, request.language,
+            patient_info, patient_reports_context, chat_context
+        )
+        yield _sse("done", {"response": response_text, "session_id": session.session_id})
+
+    return EventSourceResponse(event_stream())
+
+@app.get("/api/chat/sessions/{session_id}")
+async def get_chat_session(session_id: str):
+    """Conversation state kept for a chat session"""
+    session = chat_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return session.snapshot()
+
+@app.delete("/api/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    """End a chat session"""
+    if not chat_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {"deleted": session_id}
+
+async def _chat_context(request: QuestionRequest):
+    """Patient info, patient report context, session chat context and the session for a chat request"""
+    patient_info = None
+    patient_reports_context = ""
+    
+    # Get patient context if provided
+    if request.patient_number:
+        try:
+            patient_info = await run_in_stage("io", _get_patient_info, request.patient_number)
+            patient_reports_context = _get_patient_reports_context(patient_info)
+        except:
+            # Continue without patient context if not found
+            pass
+    
+    # Conversation context comes from the server-side session; an unknown or expired id
+    # starts a new session, seeded from chat_history when the client still sends it
+    session = chat_sessions.get_or_create(
+        request.session_id,
+        [("Human" if msg.type == "user" else "Assistant", msg.content) for msg in request.chat_history or []]
+    )
+    return patient_info, patient_reports_context, session.chat_context(), session
+
+def _session_documents(session, question: str):
+    """Knowledge base documents for a chat question, reused from the session for follow-ups"""
+    if rag_agent.retriever is None:
+        return None
+    # Lexical retrieval needs no encoder pass, so reuse falls back to exact question matches
+    embed_query = None
+    if rag_agent.retrieval_mode != "lexical" and rag_agent.embeddings is not None:
+        embed_query = rag_agent.embeddings.embed_query
+    try:
+        return chat_sessions.documents(session, question, embed_query, rag_agent.retrieve_question_documents)
+    except Exception as e:
+        # build_question_prompt retries the search and reports RAG as unavailable
+        print(f"Warning: session retrieval failed: {e}")
+        return None
+
 # File Download Endpoints
 @app.get("/api/download/report/{filename}")
 async def download_report(filename: str):
@@ -857,6 +1070,48 @@ app.mount("/static/outputs", StaticFiles(directory="outputs"), name="outputs")
 app.mount("/static/reports", StaticFiles(directory="reports"), name="reports")
 
 # Helper functions
+# Serializes read-modify-write of patient_records.json now that requests overlap
+_patient_records_lock = threading.Lock()
+
+def _load_patient_records():
+    with open("patient_records.json", "r") as f:
+        return json.load(f)
+
+def _save_upload(file: UploadFile, file_path: str):
+    """Write an uploaded file to disk"""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+async def _stage_upload(file: UploadFile) -> str:
+    """Save an upload under a unique name in uploads/ and return its path"""
+    file_id = str(uuid.uuid4())
+    file_extension = os.path.splitext(file.filename)[1]
+    file_path = f"uploads/{file_id}{file_extension}"
+    await run_in_stage("io", _save_upload, file, file_path)
+    return file_path
+
+def _sse(event: str, data) -> dict:
+    """Server-Sent Event with a JSON payload"""
+    return {"event": event, "data": json.dumps(data)}
+
+async def _stream_llm(prompt: str, on_done=None):
+    """Stream an LLM answer as token events followed by a done event (or an error event)"""
+    chunks = []
+    try:
+        async for chunk in rag_agent.llm.astream(prompt):
+            text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if text:
+                chunks.append(text)
+                yield _sse("token", {"text": text})
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+        return
+    response_text = "".join(chunks)
+    done = {"response": response_text}
+    if on_done is not None:
+        done.update(await on_done(response_text))
+    yield _sse("done", done)
+
 def _get_patient_info(patient_number: str) -> dict:
     """Get patient information by patient number"""
     try:
@@ -879,6 +1134,10 @@ def _get_patient_info(patient_number: str) -> dict:
 
 def _add_report_to_patient(patient_number: str, report_info: dict):
     """Add report information to patient record"""
+    with _patient_records_lock:
+        _append_patient_report(patient_number, report_info)
+
+def _append_patient_report(patient_number: str, report_info: dict):
     try:
         with open("patient_records.json", "r") as f:
             data = json.load(f)
@@ -892,11 +1151,13 @@ def _add_report_to_patient(patient_number: str, report_info: dict):
             counter = data.get("counter", 100)
         
         # Find and update the patient
+        updated_patient = None
         for patient in patients:
             if patient['patient_number'] == patient_number:
                 if 'reports' not in patient:
                     patient['reports'] = []
                 patient['reports'].append(report_info)
+                updated_patient = patient
                 break
         
         # Save updated data
@@ -908,34 +1169,17 @@ def _add_report_to_patient(patient_number: str, report_info: dict):
                     'counter': counter,
                     'patients': patients
                 }, f, indent=2)
+
+        if updated_patient is not None:
+            patient_contexts.record_report(updated_patient)
                 
     except Exception as e:
         print(f"Error adding report to patient: {e}")
 
 def _get_patient_reports_context(patient_info: dict) -> str:
-    """Extract patient reports context for AI chat"""
+    """Extract patient reports context for AI chat (recent reports plus aggregates, token-bounded)"""
     try:
-        context = f"\nPatient Information:\n"
-        context += f"Name: {patient_info['name']}\n"
-        context += f"Age: {patient_info.get('age', 'N/A')}\n"
-        context += f"Gender: {patient_info.get('gender', 'N/A')}\n"
-        context += f"Area: {patient_info.get('area', 'N/A')}\n"
-        
-        reports = patient_info.get('reports', [])
-        if reports:
-            context += f"\nMedical Reports Summary ({len(reports)} reports):\n"
-            for i, report in enumerate(reports, 1):
-                context += f"\nReport {i} ({report.get('date', 'No date')}):\n"
-                context += f"- Type: {report.get('type', 'Unknown')}\n"
-                context += f"- Result: {report.get('result', 'No result')}\n"
-                if 'confidence' in report:
-                    context += f"- Confidence: {report['confidence']}%\n"
-                if 'file_name' in report:
-                    context += f"- File: {report['file_name']}\n"
-        else:
-            context += "\nNo medical reports available for this patient.\n"
-        
-        return context
+        return patient_contexts.context(patient_info)
     except Exception as e:
         print(f"Error getting patient reports context: {e}")
         return f"\nPatient: {patient_info.get('name', 'Unknown')}\nNo additional context available.\n"
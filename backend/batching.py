@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Dynamic Micro-Batching for LUNGSCAREAI Backend
+Gathers analysis requests that arrive within a short window and runs them as one batch,
+fanning the per-item results back to each waiting request.
+
+Settings (MODALITY = AUDIO or XRAY, falling back to the global value):
+    LUNGSCARE_<MODALITY>_BATCH_WINDOW_MS / LUNGSCARE_BATCH_WINDOW_MS   default 15
+    LUNGSCARE_<MODALITY>_MAX_BATCH_SIZE  / LUNGSCARE_MAX_BATCH_SIZE    default 8
+"""
+
+import asyncio
+import os
+
+
+def batch_settings(modality):
+    """Batch window (ms) and maximum batch size for a modality"""
+    def setting(name, default):
+        value = os.getenv(f"LUNGSCARE_{modality.upper()}_{name}") or os.getenv(f"LUNGSCARE_{name}")
+        try:
+            return type(default)(value) if value else default
+        except ValueError:
+            return default
+
+    return {
+        "window_ms": max(0.0, setting("BATCH_WINDOW_MS", 15.0)),
+        "max_batch_size": max(1, setting("MAX_BATCH_SIZE", 8)),
+    }
+
+
+class BatchScheduler:
+    """Collects submitted items for up to window_ms (or max_batch_size items) per batch.
+
+    run_batch is an async callable taking a list of items and returning one result per item.
+    """
+
+    def __init__(self, name, run_batch, window_ms=15.0, max_batch_size=8):
+        self.name = name
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = None
+        self._collector = None
+        self._dispatches = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, item):
+        """Queue an item and wait for its result"""
+        if self.max_batch_size <= 1:
+            self.batches += 1
+            self.items += 1
+            self.largest_batch = max(self.largest_batch, 1)
+            return (await self.run_batch([item]))[0]
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._collector is None or self._collector.done():
+            self._collector = asyncio.create_task(self._collect())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without waiting so the next window starts collecting immediately
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+        for task in list(self._dispatches):
+            task.cancel()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
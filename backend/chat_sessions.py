@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Chat Sessions for LUNGSCAREAI Backend
+Server-side conversation state so clients send a session id instead of the whole history.
+Each session keeps the last few messages verbatim, older ones compacted into short topic
+lines, and a small cache of recently retrieved documents that follow-up questions on the
+same topic reuse instead of searching the knowledge base again. Without an embedding model
+(lexical retrieval) only a repeat of the same normalised question reuses documents.
+
+Settings:
+    LUNGSCARE_CHAT_SESSION_TTL               idle seconds before a session expires (default 3600)
+    LUNGSCARE_CHAT_SESSION_MAX               sessions kept, least recently used dropped (default 1000)
+    LUNGSCARE_CHAT_SESSION_MESSAGES          messages kept verbatim in the prompt (default 6)
+    LUNGSCARE_CHAT_SESSION_RETRIEVALS        retrievals cached per session (default 4)
+    LUNGSCARE_CHAT_SESSION_REUSE_THRESHOLD   question similarity needed to reuse documents (default 0.75)
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# Older messages are compacted to one line of at most this many characters each
+COMPACT_LINE_CHARS = 160
+COMPACT_LINES = 10
+
+
+def _env_number(name, default):
+    try:
+        return type(default)(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def normalize_question(question):
+    """Exact-match key of a question: lowercased, whitespace collapsed, trailing punctuation dropped"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def _compact(role, content):
+    """One-line digest of an older message: its first sentence, truncated"""
+    text = " ".join(content.split())
+    first_sentence = text.split(". ")[0]
+    if len(first_sentence) > COMPACT_LINE_CHARS:
+        first_sentence = first_sentence[:COMPACT_LINE_CHARS - 3] + "..."
+    return f"- {role}: {first_sentence}"
+
+
+class ChatSession:
+    """Rolling conversation context and retrieval cache of one chat"""
+
+    def __init__(self, session_id, max_messages, max_retrievals):
+        self.session_id = session_id
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.max_messages = max_messages
+        self.messages = deque()                        # (role, content), newest last
+        self.earlier = deque(maxlen=COMPACT_LINES)     # compacted lines of older messages
+        self.retrievals = deque(maxlen=max_retrievals)  # (unit question vector or normalised question, documents)
+        self.turns = 0
+        self.retrieval_hits = 0
+        self.lock = threading.Lock()
+
+    def add_message(self, role, content):
+        with self.lock:
+            self.messages.append((role, content))
+            while len(self.messages) > self.max_messages:
+                self.earlier.append(_compact(*self.messages.popleft()))
+
+    def add_turn(self, question, answer):
+        self.add_message("Human", question)
+        self.add_message("Assistant", answer)
+        with self.lock:
+            self.turns += 1
+
+    def chat_context(self):
+        """Conversation context for the prompt, in the format /api/chat has always used"""
+        with self.lock:
+            if not self.messages:
+                return ""
+            context = "\n\nPrevious conversation:\n"
+            if self.earlier:
+                context += "Earlier in this conversation:\n" + "\n".join(self.earlier) + "\n"
+            for role, content in self.messages:
+                context += f"{role}: {content}\n"
+            return context
+
+    def cached_documents(self, key, threshold):
+        """Documents retrieved for a similar (vector key) or identical (text key) recent question, else None"""
+        with self.lock:
+            best, best_score = None, threshold
+            for cached_key, documents in self.retrievals:
+                if isinstance(key, str) or isinstance(cached_key, str):
+                    if cached_key == key:
+                        best = documents
+                    continue
+                score = float(cached_key @ key)
+                if score >= best_score:
+                    best, best_score = documents, score
+            if best is not None:
+                self.retrieval_hits += 1
+            return best
+
+    def remember_documents(self, key, documents):
+        with self.lock:
+            self.retrievals.append((key, documents))
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "session_id": self.session_id,
+                "created_at": self.created_at,
+                "last_used": self.last_used,
+                "turns": self.turns,
+                "messages": [{"role": role, "content": content} for role, content in self.messages],
+                "earlier": list(self.earlier),
+                "cached_retrievals": len(self.retrievals),
+                "retrieval_hits": self.retrieval_hits,
+            }
+
+
+class ChatSessionStore:
+    """In-memory chat sessions with idle expiry and an LRU bound"""
+
+    def __init__(self, ttl=None, max_sessions=None, max_messages=None, max_retrievals=None, reuse_threshold=None):
+        self.ttl = ttl if ttl is not None else _env_number("LUNGSCARE_CHAT_SESSION_TTL", 3600.0)
+        self.max_sessions = max_sessions or _env_number("LUNGSCARE_CHAT_SESSION_MAX", 1000)
+        self.max_messages = max_messages or _env_number("LUNGSCARE_CHAT_SESSION_MESSAGES", 6)
+        self.max_retrievals = max_retrievals or _env_number("LUNGSCARE_CHAT_SESSION_RETRIEVALS", 4)
+        self.reuse_threshold = (reuse_threshold if reuse_threshold is not None
+                                else _env_number("LUNGSCARE_CHAT_SESSION_REUSE_THRESHOLD", 0.75))
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.retrieval_hits = 0
+        self.retrieval_misses = 0
+
+    def _expire(self, now):
+        for session_id in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]:
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def get(self, session_id):
+        """Live session by id, or None if unknown or expired"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id=None, history=None):
+        """The session for an id; a new one (seeded with [(role, content)] history) if it has none"""
+        session = self.get(session_id) if session_id else None
+        if session is not None:
+            return session
+        session = ChatSession(str(uuid.uuid4()), self.max_messages, self.max_retrievals)
+        for role, content in history or []:
+            session.add_message(role, content)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def documents(self, session, question, embed_query, retrieve):
+        """Documents for a question, reusing the session's retrieval for a similar recent question.
+
+        With embed_query None (no encoder pass wanted) reuse needs the same normalised question.
+        """
+        if embed_query is None:
+            key = normalize_question(question)
+        else:
+            key = np.asarray(embed_query(question), dtype=np.float32)
+            norm = np.linalg.norm(key)
+            if norm:
+                key = key / norm
+        documents = session.cached_documents(key, self.reuse_threshold)
+        if documents is not None:
+            with self._lock:
+                self.retrieval_hits += 1
+            return documents
+        documents = retrieve(question)
+        session.remember_documents(key, documents)
+        with self._lock:
+            self.retrieval_misses += 1
+        return documents
+
+    def stats(self):
+        with self._lock:
+            lookups = self.retrieval_hits + self.retrieval_misses
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl": self.ttl,
+                "created": self.created,
+                "expired": self.expired,
+                "retrieval_hits": self.retrieval_hits,
+                "retrieval_misses": self.retrieval_misses,
+                "retrieval_hit_rate": round(self.retrieval_hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Stage Executors for LUNGSCAREAI Backend
+Bounded thread pools that keep blocking work (inference, LLM/RAG calls, PDF building,
+file I/O) off the event loop, sized per stage so one stage cannot starve the others.
+
+Settings: LUNGSCARE_<STAGE>_POOL_SIZE for STAGE in INFERENCE, LLM, RETRIEVAL, REPORT, IO
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+STAGE_POOL_SIZES = {
+    "inference": 2,   # in-process model inference when worker processes are disabled
+    "llm": 8,         # synchronous LLM/RAG helpers (network bound)
+    "retrieval": 4,   # embedding + vector search
+    "report": 2,      # ReportLab PDF building
+    "io": 4,          # upload saving and patient record files
+}
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def stage_pool_size(stage):
+    default = STAGE_POOL_SIZES[stage]
+    try:
+        size = int(os.getenv(f"LUNGSCARE_{stage.upper()}_POOL_SIZE", default))
+    except ValueError:
+        size = default
+    return max(1, size)
+
+
+def get_executor(stage):
+    """Return (creating on first use) the bounded executor for a stage"""
+    if stage not in STAGE_POOL_SIZES:
+        raise KeyError(f"Unknown executor stage '{stage}'")
+    with _lock:
+        executor = _executors.get(stage)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=stage_pool_size(stage), thread_name_prefix=f"lungscare-{stage}")
+            _executors[stage] = executor
+        return executor
+
+
+async def run_in_stage(stage, fn, *args, **kwargs):
+    """Run a blocking callable on a stage's executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(stage), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def executor_status():
+    with _lock:
+        return {
+            stage: {"pool_size": stage_pool_size(stage), "started": stage in _executors}
+            for stage in STAGE_POOL_SIZES
+        }
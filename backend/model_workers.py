@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Model Workers for LUNGSCAREAI Backend
+Runs audio (PyTorch) and X-ray (TensorFlow) inference in dedicated worker processes so
+neither framework shares the API server's interpreter, GIL or memory.
+
+Settings:
+    LUNGSCARE_AUDIO_WORKERS   processes serving audio analysis (default 1, 0 = in-process)
+    LUNGSCARE_XRAY_WORKERS    processes serving X-ray analysis (default 1, 0 = in-process)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from model_registry import create_tool, model_registry, tool_modality
+from batching import BatchScheduler, batch_settings
+from executors import run_in_stage
+
+MODALITIES = ("audio", "xray")
+# Plain classification tools run one batched forward pass for requests arriving together
+BATCHED_TOOLS = ("audio_classification", "xray_classification")
+WORKER_SWEEP_INTERVAL = 60  # seconds between idle-model sweeps inside a worker
+
+# Tool instances of the current process (a worker, or the API server when running in-process)
+_process_tools = {}
+_process_tools_lock = threading.Lock()
+
+
+def _sweep_idle_models():
+    while True:
+        time.sleep(WORKER_SWEEP_INTERVAL)
+        try:
+            model_registry.evict_idle()
+        except Exception as e:
+            print(f"⚠️ Worker model sweep warning: {e}")
+
+
+def _init_worker(modality):
+    """Worker process initializer: apply the modality's runtime settings before any model loads"""
+    from runtime_config import configure_runtime
+
+    # Runs on the worker's main thread, which executes every task, before any pool threads start
+    configure_runtime(modality, pin_cpus=True)
+    threading.Thread(target=_sweep_idle_models, daemon=True).start()
+    print(f"🧩 {modality} model worker started (pid {os.getpid()})")
+
+
+def _get_process_tool(tool_name):
+    with _process_tools_lock:
+        tool = _process_tools.get(tool_name)
+        if tool is None:
+            tool = create_tool(tool_name)
+            _process_tools[tool_name] = tool
+        return tool
+
+
+def run_tool(tool_name, path):
+    """Run an analysis tool on a file in the current process and return its JSON result"""
+    return _get_process_tool(tool_name)._run(path)
+
+
+def run_tool_batch(tool_name, paths):
+    """Run an analysis tool's batched forward pass on several files in the current process"""
+    return _get_process_tool(tool_name)._run_batch(paths)
+
+
+def _resident_models():
+    return {"pid": os.getpid(), "resident": model_registry.resident()}
+
+
+def _runtime_settings(modality):
+    """Requested and effective runtime settings of a modality in the current process"""
+    from runtime_config import runtime_settings
+
+    return dict(runtime_settings()["modalities"][modality], pid=os.getpid())
+
+
+class ModelWorkerPool:
+    """A restartable pool of worker processes dedicated to one modality"""
+
+    def __init__(self, modality, processes):
+        self.modality = modality
+        self.processes = processes
+        self.restarts = 0
+        self.submitted = 0
+        self.failed = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    # spawn keeps torch/TF state from being forked into the workers
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.modality,),
+                )
+        return self._executor
+
+    def _detach(self, expected=None):
+        """Take the current executor out of service; with expected, only if it is still that one"""
+        with self._lock:
+            executor = self._executor
+            if executor is None or (expected is not None and executor is not expected):
+                return None
+            self._executor = None
+            return executor
+
+    @staticmethod
+    def _stop(executor, terminate):
+        # Queued jobs are never cancelled: they drain on the old workers, or, when those are
+        # terminated, fail with BrokenProcessPool and their submit() resubmits to the new pool
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False)
+        if terminate:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+    def shutdown(self, terminate=False):
+        executor = self._detach()
+        if executor is not None:
+            self._stop(executor, terminate)
+
+    def restart(self, terminate=False, expected=None):
+        """Replace the worker processes. Returns False if expected was already replaced.
+
+        Queued and in-flight jobs finish on the old workers while new ones go to the new
+        pool; with terminate the old workers are killed and those jobs are resubmitted.
+        """
+        executor = self._detach(expected)
+        if executor is None and expected is not None:
+            return False
+        if executor is not None:
+            self._stop(executor, terminate)
+        self.restarts += 1
+        self.start()
+        print(f"🔁 {self.modality} model workers restarted")
+        return True
+
+    async def submit(self, fn, *args):
+        """Run fn(*args) in a worker, restarting the pool once if a worker died"""
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        executor = self.start()
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # Every in-flight caller sees the same broken pool; only the first replaces it
+            if self.restart(terminate=True, expected=executor):
+                self.failed += 1
+                print(f"⚠️ {self.modality} worker pool broken, restarted")
+            return await loop.run_in_executor(self.start(), fn, *args)
+
+    def status(self):
+        with self._lock:
+            executor = self._executor
+        processes = (getattr(executor, "_processes", None) or {}) if executor else {}
+        return {
+            "modality": self.modality,
+            "processes": self.processes,
+            "pids": sorted(processes),
+            "running": executor is not None,
+            "restarts": self.restarts,
+            "submitted": self.submitted,
+            "failed": self.failed,
+        }
+
+
+class ModelWorkers:
+    """Routes analysis jobs to per-modality worker pools (or runs them in-process)"""
+
+    def __init__(self):
+        self.pools = {}
+        for modality in MODALITIES:
+            try:
+                processes = int(os.getenv(f"LUNGSCARE_{modality.upper()}_WORKERS", "1"))
+            except ValueError:
+                processes = 1
+            if processes > 0:
+                self.pools[modality] = ModelWorkerPool(modality, processes)
+
+        self.batchers = {}
+        for tool_name in BATCHED_TOOLS:
+            settings = batch_settings(tool_modality(tool_name))
+            self.batchers[tool_name] = BatchScheduler(
+                tool_name,
+                lambda paths, tool_name=tool_name: self._run_batch(tool_name, paths),
+                window_ms=settings["window_ms"],
+                max_batch_size=settings["max_batch_size"],
+            )
+
+    def start(self):
+        for pool in self.pools.values():
+            pool.start()
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(terminate=True)
+
+    async def close(self):
+        for batcher in self.batchers.values():
+            await batcher.close()
+        self.shutdown()
+
+    def restart(self, modality, terminate=False):
+        if modality not in self.pools:
+            raise KeyError(f"No worker pool for modality '{modality}'")
+        self.pools[modality].restart(terminate=terminate)
+        return self.pools[modality].status()
+
+    async def run_tool(self, tool_name, path):
+        """Run an analysis tool on its modality's workers and return the tool's JSON result"""
+        if tool_name in self.batchers:
+            return await self.batchers[tool_name].submit(os.path.abspath(path))
+        pool = self.pools.get(tool_modality(tool_name))
+        if pool is None:
+            return await run_in_stage("inference", run_tool, tool_name, path)
+        return await pool.submit(run_tool, tool_name, os.path.abspath(path))
+
+    async def _run_batch(self, tool_name, paths):
+        pool = self.pools.get(tool_modality(tool_name))
+        if pool is None:
+            return await run_in_stage("inference", run_tool_batch, tool_name, paths)
+        return await pool.submit(run_tool_batch, tool_name, paths)
+
+    async def runtime_settings(self):
+        """Runtime settings per modality, as applied in the process that runs its inference"""
+        from runtime_config import runtime_settings
+
+        settings = runtime_settings()
+        for modality, pool in self.pools.items():
+            settings["modalities"][modality] = await pool.submit(_runtime_settings, modality)
+        return settings
+
+    async def resident_models(self, modality):
+        """Models resident in one of the modality's workers"""
+        pool = self.pools.get(modality)
+        if pool is None:
+            return await run_in_stage("inference", _resident_models)
+        return await pool.submit(_resident_models)
+
+    def status(self):
+        status = {
+            modality: self.pools[modality].status() if modality in self.pools else {"modality": modality, "in_process": True}
+            for modality in MODALITIES
+        }
+        status["batching"] = {name: batcher.stats() for name, batcher in self.batchers.items()}
+        return status
+
+
+model_workers = ModelWorkers()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Patient Context Summaries for LUNGSCAREAI Backend
+Bounded chat context per patient: the most recent reports verbatim plus rolling aggregates
+(counts, average confidence and date range per report type and result) over all of them.
+Summaries are updated incrementally when a report is appended, cached by patient record
+version and rendered within a token budget, so prompt size stays flat for long-term patients.
+
+Settings:
+    LUNGSCARE_PATIENT_CONTEXT_RECENT   reports kept verbatim (default 5)
+    LUNGSCARE_PATIENT_CONTEXT_TOKENS   approximate token budget of the rendered context (default 600)
+"""
+
+import os
+import threading
+from collections import deque
+
+# Rough English token size; good enough to bound the prompt without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def record_version(patient_info):
+    """Version of a patient record's report history: count plus the identity of the last report"""
+    reports = patient_info.get('reports') or []
+    if not reports:
+        return (0, None)
+    last = reports[-1]
+    return (len(reports), last.get('date'), last.get('report_path') or last.get('file_name'))
+
+
+def _report_lines(number, report):
+    lines = [f"\nReport {number} ({report.get('date', 'No date')}):",
+             f"- Type: {report.get('type', 'Unknown')}",
+             f"- Result: {report.get('result', 'No result')}"]
+    if 'confidence' in report:
+        lines.append(f"- Confidence: {report['confidence']}%")
+    if 'file_name' in report:
+        lines.append(f"- File: {report['file_name']}")
+    return "\n".join(lines) + "\n"
+
+
+class PatientSummary:
+    """Rolling aggregates over every report plus the last few reports verbatim"""
+
+    def __init__(self, recent_reports):
+        self.count = 0
+        self.first_date = None
+        self.last_date = None
+        self.groups = {}  # (type, result) -> {"count", "confidence_sum", "confidence_count", "last_date"}
+        self.recent = deque(maxlen=recent_reports)  # (report number, report)
+        self.version = (0, None)
+
+    def add(self, report):
+        self.count += 1
+        date = report.get('date')
+        if date:
+            self.first_date = self.first_date or date
+            self.last_date = date
+        group = self.groups.setdefault(
+            (report.get('type', 'Unknown'), report.get('result', 'No result')),
+            {"count": 0, "confidence_sum": 0.0, "confidence_count": 0, "last_date": None}
+        )
+        group["count"] += 1
+        try:
+            group["confidence_sum"] += float(report['confidence'])
+            group["confidence_count"] += 1
+        except (KeyError, TypeError, ValueError):
+            pass
+        group["last_date"] = date or group["last_date"]
+        self.recent.append((self.count, report))
+
+    def aggregate_lines(self):
+        lines = []
+        # Most frequent findings first so truncation drops the rarest
+        for (report_type, result), group in sorted(self.groups.items(), key=lambda item: -item[1]["count"]):
+            line = f"- {report_type}: {result} x{group['count']}"
+            if group["confidence_count"]:
+                line += f", avg confidence {group['confidence_sum'] / group['confidence_count']:.1f}%"
+            if group["last_date"]:
+                line += f", last {group['last_date']}"
+            lines.append(line)
+        return lines
+
+
+class PatientContextStore:
+    """Per-patient context summaries, maintained on report append and rebuilt on version mismatch"""
+
+    def __init__(self, recent_reports=None, token_budget=None):
+        self.recent_reports = max(1, recent_reports or _env_int("LUNGSCARE_PATIENT_CONTEXT_RECENT", 5))
+        self.token_budget = token_budget or _env_int("LUNGSCARE_PATIENT_CONTEXT_TOKENS", 600)
+        self._summaries = {}  # patient number -> PatientSummary
+        self._rendered = {}   # patient number -> (version, profile, text)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.incremental_updates = 0
+        self.rebuilds = 0
+
+    def _build(self, patient_info):
+        summary = PatientSummary(self.recent_reports)
+        for report in patient_info.get('reports') or []:
+            summary.add(report)
+        summary.version = record_version(patient_info)
+        self.rebuilds += 1
+        return summary
+
+    def record_report(self, patient_info):
+        """Fold the report just appended to patient_info into its cached summary"""
+        patient_number = patient_info.get('patient_number')
+        with self._lock:
+            summary = self._summaries.get(patient_number)
+            self._rendered.pop(patient_number, None)
+            reports = patient_info.get('reports') or []
+            if summary is None or summary.count != len(reports) - 1:
+                # Not cached (or out of step): rebuilt on the next chat request
+                self._summaries.pop(patient_number, None)
+                return
+            summary.add(reports[-1])
+            summary.version = record_version(patient_info)
+            self.incremental_updates += 1
+
+    def context(self, patient_info):
+        """Bounded reports context for a patient's chat prompt"""
+        patient_number = patient_info.get('patient_number')
+        version = record_version(patient_info)
+        profile = (patient_info.get('name'), patient_info.get('age'),
+                   patient_info.get('gender'), patient_info.get('area'))
+        with self._lock:
+            rendered = self._rendered.get(patient_number)
+            if rendered is not None and rendered[0] == version and rendered[1] == profile:
+                self.hits += 1
+                return rendered[2]
+            summary = self._summaries.get(patient_number)
+            if summary is None or summary.version != version:
+                summary = self._build(patient_info)
+                self._summaries[patient_number] = summary
+            text = self._render(patient_info, summary)
+            self._rendered[patient_number] = (version, profile, text)
+            return text
+
+    def _render(self, patient_info, summary):
+        header = f"\nPatient Information:\n"
+        header += f"Name: {patient_info['name']}\n"
+        header += f"Age: {patient_info.get('age', 'N/A')}\n"
+        header += f"Gender: {patient_info.get('gender', 'N/A')}\n"
+        header += f"Area: {patient_info.get('area', 'N/A')}\n"
+        if not summary.count:
+            return header + "\nNo medical reports available for this patient.\n"
+
+        budget = self.token_budget * CHARS_PER_TOKEN - len(header)
+        aggregates = [f"\nMedical Reports Summary ({summary.count} reports"
+                      + (f", {summary.first_date} to {summary.last_date}" if summary.first_date else "")
+                      + "):"] + summary.aggregate_lines()
+        recent = [_report_lines(number, report) for number, report in summary.recent]
+
+        # Keep the newest reports verbatim first, then as many aggregate lines as still fit
+        kept_recent = []
+        used = 0
+        for block in reversed(recent):
+            if kept_recent and used + len(block) > budget // 2:
+                break
+            kept_recent.insert(0, block)
+            used += len(block)
+        kept_aggregates = []
+        for line in aggregates:
+            if kept_aggregates and used + len(line) + 1 > budget:
+                kept_aggregates.append("- ...")
+                break
+            kept_aggregates.append(line)
+            used += len(line) + 1
+
+        text = header + "\n".join(kept_aggregates) + "\n"
+        if kept_recent:
+            text += f"\nMost recent reports ({len(kept_recent)} of {summary.count}):\n" + "".join(kept_recent)
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "patients": len(self._summaries),
+                "recent_reports": self.recent_reports,
+                "token_budget": self.token_budget,
+                "hits": self.hits,
+                "incremental_updates": self.incremental_updates,
+                "rebuilds": self.rebuilds,
+            }
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from batching import BatchScheduler, batch_settings
+
+
+class Recorder:
+    """run_batch double recording each batch and returning the items doubled"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail:
+            raise RuntimeError("inference failed")
+        return [item * 2 for item in items]
+
+
+async def _submit_all(scheduler, items):
+    try:
+        return await asyncio.gather(*(scheduler.submit(item) for item in items), return_exceptions=True)
+    finally:
+        await scheduler.close()
+
+
+def test_requests_in_one_window_share_a_batch():
+    run_batch = Recorder()
+    scheduler = BatchScheduler("test", run_batch, window_ms=50, max_batch_size=8)
+
+    assert asyncio.run(_submit_all(scheduler, [1, 2, 3])) == [2, 4, 6]
+    assert run_batch.batches == [[1, 2, 3]]
+    assert scheduler.stats()["largest_batch"] == 3
+
+
+def test_full_batches_are_dispatched_without_waiting_for_the_window():
+    run_batch = Recorder()
+    scheduler = BatchScheduler("test", run_batch, window_ms=10000, max_batch_size=2)
+
+    results = asyncio.run(asyncio.wait_for(_submit_all(scheduler, [1, 2, 3, 4]), 5))
+    assert results == [2, 4, 6, 8]
+    assert run_batch.batches == [[1, 2], [3, 4]]
+    assert scheduler.stats()["average_batch_size"] == 2.0
+
+
+def test_batch_failure_reaches_every_request():
+    scheduler = BatchScheduler("test", Recorder(fail=True), window_ms=50, max_batch_size=8)
+
+    results = asyncio.run(_submit_all(scheduler, [1, 2]))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_batch_size_one_runs_each_request_directly():
+    run_batch = Recorder()
+    scheduler = BatchScheduler("test", run_batch, window_ms=50, max_batch_size=1)
+
+    assert asyncio.run(_submit_all(scheduler, [1, 2])) == [2, 4]
+    assert run_batch.batches == [[1], [2]]
+
+
+@pytest.mark.parametrize("env, expected", [
+    ({}, {"window_ms": 15.0, "max_batch_size": 8}),
+    ({"LUNGSCARE_MAX_BATCH_SIZE": "4"}, {"window_ms": 15.0, "max_batch_size": 4}),
+    ({"LUNGSCARE_MAX_BATCH_SIZE": "4", "LUNGSCARE_XRAY_MAX_BATCH_SIZE": "16"}, {"window_ms": 15.0, "max_batch_size": 16}),
+    ({"LUNGSCARE_XRAY_BATCH_WINDOW_MS": "bad"}, {"window_ms": 15.0, "max_batch_size": 8}),
+])
+def test_batch_settings_prefer_the_modality_value(monkeypatch, env, expected):
+    for name in ("LUNGSCARE_MAX_BATCH_SIZE", "LUNGSCARE_XRAY_MAX_BATCH_SIZE",
+                 "LUNGSCARE_BATCH_WINDOW_MS", "LUNGSCARE_XRAY_BATCH_WINDOW_MS"):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    assert batch_settings("xray") == expected
@@ -0,0 +1,67 @@
+from patient_context import CHARS_PER_TOKEN, PatientContextStore
+
+
+def _patient(reports):
+    return {"patient_number": "P1", "name": "Jane Doe", "age": 54, "gender": "F", "area": "North",
+            "reports": reports}
+
+
+def _report(i, result="Normal"):
+    return {"type": f"Audio Analysis (Type {i % 7})", "date": f"2026-01-{i % 28 + 1:02d} 10:00:00",
+            "result": result, "confidence": 80 + i % 20, "file_name": f"recording_{i}.wav"}
+
+
+def test_patient_without_reports():
+    text = PatientContextStore().context(_patient([]))
+    assert "Name: Jane Doe" in text
+    assert "No medical reports available" in text
+
+
+def test_recent_reports_verbatim_and_aggregates_over_all():
+    reports = [_report(0, "Asthma"), _report(1, "Asthma"), _report(2, "Normal")]
+    text = PatientContextStore(recent_reports=2).context(_patient(reports))
+
+    assert "Medical Reports Summary (3 reports" in text
+    assert "Most recent reports (2 of 3)" in text
+    assert "recording_0.wav" not in text
+    assert "recording_2.wav" in text
+
+
+def test_context_stays_within_the_token_budget():
+    store = PatientContextStore(recent_reports=5, token_budget=150)
+    sizes = [len(store.context(_patient([_report(i) for i in range(count)]))) for count in (10, 500)]
+
+    # Bounded by the budget and flat in the number of reports
+    assert all(size <= 150 * CHARS_PER_TOKEN + 40 for size in sizes)
+    assert abs(sizes[1] - sizes[0]) < 150 * CHARS_PER_TOKEN // 4
+
+
+def test_appended_report_is_folded_in_incrementally():
+    store = PatientContextStore(recent_reports=3)
+    patient = _patient([_report(0)])
+    store.context(patient)
+    assert store.context(patient) == store.context(patient)
+    assert store.stats()["hits"] == 2
+
+    patient["reports"].append(_report(1, "Pneumonia"))
+    store.record_report(patient)
+    text = store.context(patient)
+
+    stats = store.stats()
+    assert stats["incremental_updates"] == 1
+    assert stats["rebuilds"] == 1
+    assert "Pneumonia" in text and "(2 reports" in text
+
+
+def test_out_of_step_summary_is_rebuilt():
+    store = PatientContextStore()
+    patient = _patient([_report(0)])
+    store.context(patient)
+
+    # Two reports appended behind the store's back, then one recorded
+    patient["reports"] += [_report(1), _report(2)]
+    store.record_report(patient)
+    text = store.context(patient)
+
+    assert store.stats()["rebuilds"] == 2
+    assert "(3 reports" in text
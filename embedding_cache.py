@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Embedding Cache for LUNGSCAREAI
+LRU cache of query embeddings in front of the sentence-transformer model, so repeated
+questions and quick-info topics skip re-encoding.
+
+Settings: LUNGSCARE_EMBEDDING_CACHE_SIZE   cached query embeddings (default 1024, 0 = off)
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_query(text):
+    """Cache key for a query: case and whitespace do not change the embedding.
+
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so lowercasing is lossless.
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings instance with an LRU cache for embed_query"""
+
+    def __init__(self, embeddings, max_size=None):
+        self.embeddings = embeddings
+        if max_size is None:
+            try:
+                max_size = int(os.getenv("LUNGSCARE_EMBEDDING_CACHE_SIZE", "1024"))
+            except ValueError:
+                max_size = 1024
+        self.max_size = max(0, max_size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        # Corpus documents are embedded once at indexing time; nothing to gain from caching
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        if not self.max_size:
+            return self.embeddings.embed_query(text)
+
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+
+        vector = self.embeddings.embed_query(key)
+        with self._lock:
+            self._cache[key] = tuple(vector)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return list(vector)
+
+    def embed_queries(self, texts):
+        """Embed several queries: cache hits are served, all misses are encoded in one batch"""
+        keys = [normalize_query(text) for text in texts]
+        vectors = [None] * len(keys)
+        misses = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._cache.get(key) if self.max_size else None
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    vectors[i] = list(vector)
+                else:
+                    self.misses += 1
+                    misses.append(i)
+
+        if misses:
+            # Unique miss texts only; the encoder sees one batch
+            unique = list(dict.fromkeys(keys[i] for i in misses))
+            encoded = dict(zip(unique, self.embeddings.embed_documents(unique)))
+            with self._lock:
+                for key, vector in encoded.items():
+                    if self.max_size:
+                        self._cache[key] = tuple(vector)
+                        self._cache.move_to_end(key)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+            for i in misses:
+                vectors[i] = list(encoded[keys[i]])
+        return vectors
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -38,6 +38,8 @@ const ChatBot: React.FC = () => {
   const [selectedPatient, setSelectedPatient] = useState<string>('')
   const [currentMessage, setCurrentMessage] = useState('')
   const [messages, setMessages] = useState<Message[]>([])
+  // The server keeps the conversation; only its id is sent once a session exists
+  const [sessionId, setSessionId] = useState<string | null>(null)
   const messagesEndRef = useRef<HTMLDivElement>(null)
 
   const { data: patientsData } = useQuery('patients', async () => {
@@ -60,9 +62,10 @@ const ChatBot: React.FC = () => {
     async (question) => {
       const payload: any = {
         question,
-        language: 'english',
-        chat_history: messages.slice(-10)
+        language: 'english'
       }
+      if (sessionId) payload.session_id = sessionId
+      else payload.chat_history = messages.slice(-10)
       if (selectedPatient) payload.patient_number = selectedPatient
 
       const response = await fetch('/api/chat', {
@@ -75,6 +78,7 @@ const ChatBot: React.FC = () => {
     },
     {
       onSuccess: (data) => {
+        if (data.session_id) setSessionId(data.session_id)
         setMessages(prev => [...prev, { id: Date.now() + '_bot', type: 'bot', content: data.response, timestamp: new Date() }])
       },
       onError: (err) => {
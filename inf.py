@@ -8,56 +8,55 @@ import librosa
 import matplotlib.pyplot as plt
 from transformers import AutoFeatureExtractor, ASTForAudioClassification,AutoConfig
 from langchain.tools import BaseTool
-from typing import Optional, Any
 import json
+from model_registry import model_registry
+from runtime_config import configure_runtime
 
 
-_MODEL_CACHE = {
-    'extractor': None,
-    'model': None,
-    'loaded': False
-}
+def load_audio_model():
+    """Load the AST feature extractor and fine-tuned model (called by the model registry)"""
+    print("🚀 Loading shared audio models for faster inference...")
+    configure_runtime("audio")
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    MODEL_PATH = os.path.join(current_dir, "final_model_ast (1).pt")
+    EXTRACTOR = "MIT/ast-finetuned-audioset-10-10-0.4593"
 
-def get_cached_model():
-    """Get cached model components to avoid reloading"""
-    global _MODEL_CACHE
-    
-    if not _MODEL_CACHE['loaded']:
-        print("🚀 Loading shared audio models for faster inference...")
-        import os
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        MODEL_PATH = os.path.join(current_dir, "final_model_ast (1).pt")
-        EXTRACTOR = "MIT/ast-finetuned-audioset-10-10-0.4593"
+    config = AutoConfig.from_pretrained(
+        EXTRACTOR,
+        output_attentions=True,
+        num_labels=2,
+        label2id={"Normal": 0, "Abnormal": 1},
+        id2label={0: "Normal", 1: "Abnormal"}
+    )
 
-        config = AutoConfig.from_pretrained(
-            EXTRACTOR,
-            output_attentions=True,
-            num_labels=2,
-            label2id={"Normal": 0, "Abnormal": 1},
-            id2label={0: "Normal", 1: "Abnormal"}
+    extractor = AutoFeatureExtractor.from_pretrained(EXTRACTOR)
+    model = ASTForAudioClassification.from_pretrained(
+        EXTRACTOR,
+        config=config,
+        ignore_mismatched_sizes=True
         )
-
-        _MODEL_CACHE['extractor'] = AutoFeatureExtractor.from_pretrained(EXTRACTOR)
-        _MODEL_CACHE['model'] = ASTForAudioClassification.from_pretrained(
-            EXTRACTOR,
-            config=config,
-            ignore_mismatched_sizes=True
-            )
-        
-        state = torch.load(MODEL_PATH, map_location="cpu")
-        _MODEL_CACHE['model'].load_state_dict(state["model"], strict=False)
-        _MODEL_CACHE['model'].eval()
-        
-        # Move to GPU if available for faster inference
-        if torch.cuda.is_available():
-            _MODEL_CACHE['model'] = _MODEL_CACHE['model'].cuda()
-            print("✅ Models loaded on GPU for faster processing")
-        else:
-            print("✅ Models loaded on CPU")
-        
-        _MODEL_CACHE['loaded'] = True
     
-    return _MODEL_CACHE['extractor'], _MODEL_CACHE['model']
+    state = torch.load(MODEL_PATH, map_location="cpu")
+    model.load_state_dict(state["model"], strict=False)
+    model.eval()
+    
+    # Move to GPU if available for faster inference
+    if torch.cuda.is_available():
+        model = model.cuda()
+        print("✅ Models loaded on GPU for faster processing")
+    else:
+        print("✅ Models loaded on CPU")
+    
+    return extractor, model
+
+def unload_audio_model():
+    """Release cached GPU memory after the registry drops the audio model"""
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+def get_cached_model():
+    """Get cached model components to avoid reloading"""
+    return model_registry.get("audio")
 
 # XAI Helper functions
 def _get_feature_key(feat_dict):
@@ -91,13 +90,15 @@ class AudioClassificationTool(BaseTool):
     TARGET_LEN: int = 160000  # 16000 * 10
     labels: list = ["Normal", "Abnormal"]
     label_to_idx: dict = {"Normal": 0, "Abnormal": 1}
-    extractor: Optional[Any] = None
-    model: Optional[Any] = None
     
-    def __init__(self):
-        super().__init__()
-        # Use cached model for faster initialization
-        self.extractor, self.model = get_cached_model()
+    # Models are resolved through the registry on each use so idle ones can be unloaded
+    @property
+    def extractor(self):
+        return get_cached_model()[0]
+    
+    @property
+    def model(self):
+        return get_cached_model()[1]
     
     def _preprocess_audio(self, path: str):
         # Convert to absolute path if not already
@@ -136,32 +137,49 @@ class AudioClassificationTool(BaseTool):
         return wav
     
     def _run(self, path: str) -> str:
+        return self._run_batch([path])[0]
+    
+    def _run_batch(self, paths: list) -> list:
+        """Classify several audio files with one batched forward pass (one JSON result per path)"""
+        results = [None] * len(paths)
+        wavs, indices = [], []
+        for i, path in enumerate(paths):
+            try:
+                wavs.append(self._preprocess_audio(path).numpy())
+                indices.append(i)
+            except Exception as e:
+                results[i] = f"Error processing audio: {str(e)}"
+        
+        if not wavs:
+            return results
+        
         try:
-            wav = self._preprocess_audio(path)
+            extractor, model = get_cached_model()
             
             # Fast inference with GPU acceleration if available
-            device = next(self.model.parameters()).device
+            device = next(model.parameters()).device
             
             with torch.no_grad():
-                inputs = self.extractor(wav.numpy(), sampling_rate=self.TARGET_SR, return_tensors="pt")
+                inputs = extractor(wavs, sampling_rate=self.TARGET_SR, return_tensors="pt")
                 
                 # Move inputs to same device as model for faster processing
                 if torch.cuda.is_available():
                     inputs = {k: v.to(device) if hasattr(v, 'to') else v for k, v in inputs.items()}
                 
-                logits = self.model(**inputs).logits
-                probs = torch.softmax(logits, dim=-1).squeeze().cpu().numpy()
-                pred_idx = int(probs.argmax())
-                pred_label = self.labels[pred_idx]
-                confidence = float(probs[pred_idx]) * 100
+                logits = model(**inputs).logits
+                probs = torch.softmax(logits, dim=-1).cpu().numpy()
             
-            return json.dumps({
-                "label": pred_label,
-                "confidence": round(confidence, 2),
-                "classification_type": "lung_audio"
-            })
+            for i, row in zip(indices, probs):
+                pred_idx = int(row.argmax())
+                results[i] = json.dumps({
+                    "label": self.labels[pred_idx],
+                    "confidence": round(float(row[pred_idx]) * 100, 2),
+                    "classification_type": "lung_audio"
+                })
         except Exception as e:
-            return f"Error processing audio: {str(e)}"
+            for i in indices:
+                results[i] = f"Error processing audio: {str(e)}"
+        return results
 
 class AudioGradientXAITool(BaseTool):
     name: str = "audio_gradient_xai"
@@ -172,13 +190,15 @@ class AudioGradientXAITool(BaseTool):
     TARGET_LEN: int = 160000  # 16000 * 10
     labels: list = ["Normal", "Abnormal"]
     label_to_idx: dict = {"Normal": 0, "Abnormal": 1}
-    extractor: Optional[Any] = None
-    model: Optional[Any] = None
     
-    def __init__(self):
-        super().__init__()
-        # Use cached model for faster initialization
-        self.extractor, self.model = get_cached_model()
+    # Models are resolved through the registry on each use so idle ones can be unloaded
+    @property
+    def extractor(self):
+        return get_cached_model()[0]
+    
+    @property
+    def model(self):
+        return get_cached_model()[1]
     
     def _preprocess_audio(self, path: str):
         # Convert to absolute path if not already
@@ -325,13 +345,15 @@ class AudioAttentionXAITool(BaseTool):
     TARGET_LEN: int = 160000  # 16000 * 10
     labels: list = ["Normal", "Abnormal"]
     label_to_idx: dict = {"Normal": 0, "Abnormal": 1}
-    extractor: Optional[Any] = None
-    model: Optional[Any] = None
     
-    def __init__(self):
-        super().__init__()
-        # Use cached model for faster initialization
-        self.extractor, self.model = get_cached_model()
+    # Models are resolved through the registry on each use so idle ones can be unloaded
+    @property
+    def extractor(self):
+        return get_cached_model()[0]
+    
+    @property
+    def model(self):
+        return get_cached_model()[1]
     
     def _preprocess_audio(self, path: str):
         # Convert to absolute path if not already
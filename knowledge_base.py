@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+"""
+Knowledge Base for LUNGSCAREAI
+Loads the medical Q/A corpus, splits it into retrieval chunks and builds the versioned
+embedding artifact that vector stores are populated from without re-embedding.
+
+Artifact layout (<artifact dir>/<version>/):
+    embeddings.npy   L2-normalised float32 chunk embeddings, one row per chunk (cast to
+                     LUNGSCARE_VECTOR_INDEX_DTYPE when the embedded index loads them)
+    chunks.jsonl     {"page_content", "metadata", "chunk_hash"} per row
+    manifest.json    version, content hash, embedding model and chunking parameters
+<artifact dir>/LATEST names the newest version.
+
+Build offline with:
+    python knowledge_base.py build [--corpus PATH] [--output DIR] [--batch-size N] [--workers N]
+Sync an existing Qdrant collection with corpus changes (only changed chunks are touched):
+    python knowledge_base.py ingest [--corpus PATH] [--url URL] [--collection NAME] [--workers N]
+Change a collection's quantization / on-disk storage, in place or into a new collection:
+    python knowledge_base.py reindex [--collection NAME] [--target NAME] [--quantization none|scalar|binary]
+        [--on-disk | --in-ram] [--on-disk-payload | --payload-in-ram]
+
+Settings:
+    LUNGSCARE_KB_ARTIFACT_DIR     artifact directory (default knowledge_base_artifacts)
+    LUNGSCARE_UPSERT_BATCH_SIZE   points per Qdrant upsert request (default 1024)
+    LUNGSCARE_UPLOAD_THREADS      concurrent upsert requests while embedding (default 2)
+    LUNGSCARE_EMBED_WORKERS       embedding processes (default half the cores)
+    LUNGSCARE_EMBED_BATCH_SIZE    encoder batch size (default 64)
+    LUNGSCARE_EMBED_JOB_SIZE      texts per embedding worker job (default 1024)
+
+Qdrant collection storage (applied when a collection is created or reindexed):
+    LUNGSCARE_QDRANT_QUANTIZATION     none (default), scalar (int8, ~4x smaller) or binary (~32x smaller)
+    LUNGSCARE_QDRANT_ON_DISK          1 keeps original vectors on disk (memory-mapped), default 0
+    LUNGSCARE_QDRANT_ON_DISK_PAYLOAD  1 keeps payloads (chunk text) on disk, default 0
+    LUNGSCARE_QDRANT_ALWAYS_RAM       1 (default) pins the quantized vectors in RAM
+    LUNGSCARE_QDRANT_RESCORE          1 (default) rescores quantized candidates with the original vectors
+    LUNGSCARE_QDRANT_OVERSAMPLING     quantized candidates fetched per result before rescoring (default 2.0)
+    LUNGSCARE_QDRANT_HNSW_M / LUNGSCARE_QDRANT_HNSW_EF_CONSTRUCT   HNSW graph parameters (default 16 / 200)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from langchain_community.document_loaders import JSONLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+CORPUS_PATH = "medical_meadow_wikidoc_patient_info_cleaned.json"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+MANIFEST_FILE = "manifest.json"
+LATEST_FILE = "LATEST"
+# Small side collection recording which knowledge base content version each collection holds
+VERSION_COLLECTION = "lungscare_kb_versions"
+QUANTIZATION_TYPES = ("none", "scalar", "binary")
+
+
+def source_hash(record):
+    """Content hash of one corpus record (question and answer)"""
+    payload = json.dumps({"input": record.get("input", ""), "output": record.get("output", "")}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def add_input_to_metadata(record, metadata):
+    # JSONLoader's seq_num (record position) and absolute source path change with every insert
+    # and every checkout location; only stable fields are kept so chunk hashes and point ids don't
+    return {
+        "source": os.path.basename(metadata.get("source", "")),
+        "input": record.get("input", ""),
+        # Lets ingestion tell which source record each chunk came from
+        "source_hash": source_hash(record),
+    }
+
+
+def load_corpus_chunks(corpus_path=CORPUS_PATH):
+    """Load the corpus as 'Q: ...\\nA: ...' documents and split them into retrieval chunks"""
+    loader = JSONLoader(
+        file_path=corpus_path,
+        jq_schema=".[]",
+        text_content=True,
+        content_key="output",
+        metadata_func=add_input_to_metadata
+    )
+    docs = loader.load()
+
+    for d in docs:
+        d.page_content = f"Q: {d.metadata.get('input','')}\nA: {d.page_content}"
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return splitter.split_documents(docs)
+
+
+def chunk_hash(page_content, metadata):
+    """Content hash of a chunk: its text and source record, independent of corpus order and location"""
+    payload = json.dumps({
+        "page_content": page_content,
+        "input": metadata.get("input", ""),
+        "source_hash": metadata.get("source_hash", ""),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def content_version(hashes):
+    """Hash naming a set of chunks embedded with the current model and chunking parameters"""
+    content = hashlib.sha256()
+    content.update(f"{EMBEDDING_MODEL}|{CHUNK_SIZE}|{CHUNK_OVERLAP}".encode("utf-8"))
+    # Sorted: the version names the chunk content, not the order of records in the corpus file
+    for h in sorted(hashes):
+        content.update(h.encode("utf-8"))
+    return content.hexdigest()
+
+
+def point_id(chunk_hash_value):
+    """Deterministic vector store id for a chunk, so identical chunks map to the same point"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"lungscare-chunk:{chunk_hash_value}"))
+
+
+def artifact_root():
+    return os.getenv("LUNGSCARE_KB_ARTIFACT_DIR", "knowledge_base_artifacts")
+
+
+def latest_artifact(root=None):
+    """Directory of the newest built artifact, or None if none has been built"""
+    root = root or artifact_root()
+    try:
+        with open(os.path.join(root, LATEST_FILE), "r") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(root, version)
+    return path if os.path.exists(os.path.join(path, MANIFEST_FILE)) else None
+
+
+def load_manifest(artifact_dir):
+    with open(os.path.join(artifact_dir, MANIFEST_FILE), "r") as f:
+        return json.load(f)
+
+
+def load_artifact_chunks(artifact_dir):
+    from vector_index import CHUNKS_FILE
+
+    with open(os.path.join(artifact_dir, CHUNKS_FILE), "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def corpus_chunk_table(corpus_path=CORPUS_PATH):
+    """(texts, metadatas, chunk hashes) of the corpus, identical chunks stored once"""
+    texts, metadatas, hashes, seen = [], [], [], set()
+    for d in load_corpus_chunks(corpus_path):
+        h = chunk_hash(d.page_content, d.metadata)
+        if h in seen:
+            continue
+        seen.add(h)
+        texts.append(d.page_content)
+        metadatas.append(d.metadata)
+        hashes.append(h)
+    return texts, metadatas, hashes
+
+
+def artifact_vectors_by_hash(artifact_dir):
+    """Map chunk hash -> embedding row of an existing artifact (for reuse), {} if none"""
+    import numpy as np
+
+    from vector_index import EMBEDDINGS_FILE
+
+    if artifact_dir is None:
+        return {}
+    vectors = np.load(os.path.join(artifact_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    return {r["chunk_hash"]: vectors[i] for i, r in enumerate(load_artifact_chunks(artifact_dir)) if "chunk_hash" in r}
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_flag(name, default):
+    return os.getenv(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def collection_settings(quantization=None, on_disk=None, on_disk_payload=None, rescore=None, oversampling=None):
+    """Qdrant collection storage settings; arguments override the LUNGSCARE_QDRANT_* settings"""
+    quantization = (quantization or os.getenv("LUNGSCARE_QDRANT_QUANTIZATION", "none")).lower()
+    if quantization not in QUANTIZATION_TYPES:
+        raise ValueError(f"Unknown quantization '{quantization}' (expected one of {', '.join(QUANTIZATION_TYPES)})")
+    try:
+        default_oversampling = float(os.getenv("LUNGSCARE_QDRANT_OVERSAMPLING", "2.0"))
+    except ValueError:
+        default_oversampling = 2.0
+    return {
+        "quantization": quantization,
+        "on_disk": _env_flag("LUNGSCARE_QDRANT_ON_DISK", False) if on_disk is None else on_disk,
+        "on_disk_payload": (_env_flag("LUNGSCARE_QDRANT_ON_DISK_PAYLOAD", False)
+                            if on_disk_payload is None else on_disk_payload),
+        "always_ram": _env_flag("LUNGSCARE_QDRANT_ALWAYS_RAM", True),
+        "rescore": _env_flag("LUNGSCARE_QDRANT_RESCORE", True) if rescore is None else rescore,
+        "oversampling": default_oversampling if oversampling is None else oversampling,
+        "hnsw_m": _env_int("LUNGSCARE_QDRANT_HNSW_M", 16),
+        "hnsw_ef_construct": _env_int("LUNGSCARE_QDRANT_HNSW_EF_CONSTRUCT", 200),
+    }
+
+
+def _quantization_config(settings):
+    from qdrant_client.models import (BinaryQuantization, BinaryQuantizationConfig, ScalarQuantization,
+                                      ScalarQuantizationConfig, ScalarType)
+
+    if settings["quantization"] == "scalar":
+        # int8 per dimension; the 0.99 quantile clips outliers that would waste the range
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8, quantile=0.99, always_ram=settings["always_ram"]
+        ))
+    if settings["quantization"] == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=settings["always_ram"]))
+    return None
+
+
+def create_collection(client, collection_name, settings=None):
+    """Create the chunk collection with the configured HNSW, quantization and on-disk settings"""
+    from qdrant_client.models import Distance, HnswConfigDiff, VectorParams
+
+    settings = settings or collection_settings()
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(
+            size=EMBEDDING_DIM,
+            distance=Distance.COSINE,
+            on_disk=settings["on_disk"],
+            hnsw_config=HnswConfigDiff(
+                m=settings["hnsw_m"],                          # connections per node (speed vs accuracy)
+                ef_construct=settings["hnsw_ef_construct"],    # candidate list size during construction
+                full_scan_threshold=10000,                     # exact search for small datasets
+                max_indexing_threads=4,                        # parallel indexing
+            ),
+        ),
+        quantization_config=_quantization_config(settings),
+        on_disk_payload=settings["on_disk_payload"],
+    )
+    print(f"✅ Created collection '{collection_name}' (quantization {settings['quantization']}, "
+          f"vectors {'on disk' if settings['on_disk'] else 'in RAM'}, "
+          f"payload {'on disk' if settings['on_disk_payload'] else 'in RAM'})")
+
+
+def search_params(settings=None, hnsw_ef=None):
+    """Qdrant SearchParams for the collection settings: quantized search with optional rescoring"""
+    from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+    settings = settings or collection_settings()
+    quantization = None
+    if settings["quantization"] != "none":
+        quantization = QuantizationSearchParams(
+            rescore=settings["rescore"],
+            oversampling=settings["oversampling"] if settings["rescore"] else None,
+        )
+    if quantization is None and not hnsw_ef:
+        return None
+    return SearchParams(hnsw_ef=hnsw_ef or None, quantization=quantization)
+
+
+def collection_storage(client, collection_name):
+    """Quantization and on-disk storage a Qdrant collection was configured with"""
+    info = client.get_collection(collection_name)
+    quantization = "none"
+    config = info.config.quantization_config
+    if config is not None:
+        quantization = next((name for name in ("scalar", "binary", "product") if getattr(config, name, None)),
+                            type(config).__name__)
+    vectors = info.config.params.vectors
+    return {
+        "quantization": quantization,
+        "on_disk": bool(getattr(vectors, "on_disk", False)),
+        "on_disk_payload": bool(info.config.params.on_disk_payload),
+        "points": info.points_count,
+    }
+
+
+def copy_collection(client, source, target, batch_size=None):
+    """Copy every point (vector and payload) of one collection into another, without re-embedding"""
+    from qdrant_client.models import PointStruct
+
+    batch_size = batch_size or _env_int("LUNGSCARE_UPSERT_BATCH_SIZE", 1024)
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                wait=True,
+            )
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def reindex_collection(client, collection_name, target=None, settings=None):
+    """Apply storage settings to a collection.
+
+    With a target, a new collection is created with the settings and filled from the latest
+    artifact (or by copying the source's vectors), leaving the source for side-by-side
+    benchmarking. Without one, the source is updated in place and Qdrant rebuilds it in the
+    background.
+    """
+    from qdrant_client.models import CollectionParamsDiff, Disabled, HnswConfigDiff, VectorParamsDiff
+
+    settings = settings or collection_settings()
+    started = time.time()
+    if target and target != collection_name:
+        create_collection(client, target, settings)
+        artifact_dir = latest_artifact()
+        if artifact_dir is not None:
+            upsert_artifact(client, target, artifact_dir)
+        else:
+            copy_collection(client, collection_name, target)
+            version = read_collection_version(client, collection_name)
+            if version is not None:
+                store_collection_version(client, target, version)
+        collection_name = target
+    else:
+        quantization = _quantization_config(settings)
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=settings["on_disk"])},
+            # Same graph parameters as create_collection; Qdrant rebuilds the index with them
+            hnsw_config=HnswConfigDiff(m=settings["hnsw_m"], ef_construct=settings["hnsw_ef_construct"]),
+            quantization_config=quantization if quantization is not None else Disabled.DISABLED,
+            collection_params=CollectionParamsDiff(on_disk_payload=settings["on_disk_payload"]),
+        )
+    storage = collection_storage(client, collection_name)
+    print(f"✅ Reindexed '{collection_name}' in {time.time() - started:.1f}s: {storage}")
+    return {"collection": collection_name, **storage}
+
+
+def embed_settings(batch_size=None, workers=None):
+    """Encoder batch size, texts per worker job and embedding worker processes"""
+    batch_size = batch_size or _env_int("LUNGSCARE_EMBED_BATCH_SIZE", 64)
+    return {
+        "batch_size": max(1, batch_size),
+        "job_size": max(batch_size, _env_int("LUNGSCARE_EMBED_JOB_SIZE", 1024)),
+        "workers": max(1, workers or _env_int("LUNGSCARE_EMBED_WORKERS", max(1, (os.cpu_count() or 2) // 2))),
+    }
+
+
+# SentenceTransformer of the current embedding worker process
+_worker_model = None
+
+
+def _load_encoder():
+    global _worker_model
+    if _worker_model is None:
+        from sentence_transformers import SentenceTransformer
+
+        _worker_model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+
+
+def _init_embed_worker(threads):
+    """Embedding worker initializer: split the cores between workers and load the encoder once"""
+    import torch
+
+    torch.set_num_threads(threads)
+    _load_encoder()
+
+
+def _encode(texts, batch_size):
+    import numpy as np
+
+    vectors = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def embed_batches(texts, batch_size=None, workers=None):
+    """Yield (start, vectors) for consecutive jobs of texts, in order, as they finish.
+
+    With several workers the jobs are encoded in parallel processes, so the caller can
+    consume (e.g. upload) earlier jobs while later ones are still embedding.
+    """
+    settings = embed_settings(batch_size, workers)
+    job_size = settings["job_size"]
+    starts = range(0, len(texts), job_size)
+    workers = min(settings["workers"], max(1, len(starts)))
+
+    if workers <= 1:
+        # In-process: keep the caller's torch thread settings
+        _load_encoder()
+        for start in starts:
+            yield start, _encode(texts[start:start + job_size], settings["batch_size"])
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    print(f"🧵 Embedding with {workers} processes x {threads} threads, {job_size} texts per job")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # spawn keeps torch state from being forked into the workers
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_embed_worker,
+        initargs=(threads,),
+    ) as pool:
+        futures = [(start, pool.submit(_encode, texts[start:start + job_size], settings["batch_size"]))
+                   for start in starts]
+        for start, future in futures:
+            yield start, future.result()
+
+
+def iter_chunk_vectors(texts, hashes, previous_artifact=None, batch_size=None, workers=None):
+    """Yield (positions, vectors) batches covering every chunk.
+
+    Chunks whose hash is in the previous artifact reuse its rows; the rest are embedded.
+    """
+    import numpy as np
+
+    reused = artifact_vectors_by_hash(previous_artifact)
+    present = [i for i, h in enumerate(hashes) if h in reused]
+    missing = [i for i, h in enumerate(hashes) if h not in reused]
+    print(f"📚 Embedding {len(missing)} new/changed chunks with {EMBEDDING_MODEL} ({len(present)} reused)...")
+
+    job_size = embed_settings(batch_size, workers)["job_size"]
+    for start in range(0, len(present), job_size):
+        positions = present[start:start + job_size]
+        yield positions, np.stack([np.asarray(reused[hashes[i]], dtype=np.float32) for i in positions])
+
+    for start, vectors in embed_batches([texts[i] for i in missing], batch_size, workers):
+        yield missing[start:start + len(vectors)], vectors
+
+
+def embed_chunks(texts, hashes, previous_artifact=None, batch_size=None, workers=None):
+    """Embedding matrix for all chunks (see iter_chunk_vectors)"""
+    import numpy as np
+
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for positions, batch in iter_chunk_vectors(texts, hashes, previous_artifact, batch_size, workers):
+        vectors[positions] = batch
+    return vectors
+
+
+def build_artifact(corpus_path=CORPUS_PATH, root=None, batch_size=None, workers=None):
+    """Chunk and embed the corpus into a new versioned artifact; returns its directory"""
+    from vector_index import write_index
+
+    root = root or artifact_root()
+    started = time.time()
+    texts, metadatas, hashes = corpus_chunk_table(corpus_path)
+
+    content_hash = content_version(hashes)
+    version = content_hash[:12]
+    artifact_dir = os.path.join(root, version)
+
+    if os.path.exists(os.path.join(artifact_dir, MANIFEST_FILE)):
+        print(f"✅ Knowledge base artifact {version} is already built")
+    else:
+        # Only chunks missing from the previous artifact are embedded
+        vectors = embed_chunks(texts, hashes, latest_artifact(root), batch_size, workers)
+        write_index(artifact_dir, vectors, texts, metadatas, dtype="float32",
+                    extras=[{"chunk_hash": h} for h in hashes])
+
+        manifest = {
+            "version": version,
+            "content_hash": content_hash,
+            "corpus": os.path.basename(corpus_path),
+            "embedding_model": EMBEDDING_MODEL,
+            "dimension": EMBEDDING_DIM,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "chunks": len(texts),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with open(os.path.join(artifact_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        print(f"✅ Knowledge base artifact {version} built in {time.time() - started:.1f}s")
+
+    with open(os.path.join(root, LATEST_FILE), "w") as f:
+        f.write(version)
+    return artifact_dir
+
+
+def upsert_artifact(client, collection_name, artifact_dir, batch_size=None):
+    """Bulk-upsert an artifact's precomputed embeddings into a Qdrant collection"""
+    import numpy as np
+
+    from vector_index import EMBEDDINGS_FILE
+
+    batch_size = batch_size or _env_int("LUNGSCARE_UPSERT_BATCH_SIZE", 1024)
+    started = time.time()
+    vectors = np.load(os.path.join(artifact_dir, EMBEDDINGS_FILE), mmap_mode="r")
+    records = load_artifact_chunks(artifact_dir)
+
+    # Payload layout matches langchain's Qdrant store (page_content / metadata keys)
+    client.upload_collection(
+        collection_name=collection_name,
+        vectors=vectors,
+        payload=({"page_content": r["page_content"], "metadata": r["metadata"], "chunk_hash": r["chunk_hash"]}
+                 for r in records),
+        ids=(point_id(r["chunk_hash"]) for r in records),
+        batch_size=batch_size,
+        wait=True,
+    )
+    store_collection_version(client, collection_name, load_manifest(artifact_dir)["content_hash"])
+    print(f"✅ Upserted {len(records)} chunks into '{collection_name}' in {time.time() - started:.1f}s")
+    return len(records)
+
+
+def store_collection_version(client, collection_name, version):
+    """Record the content version a collection now holds (read back by read_collection_version)"""
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    if not client.collection_exists(VERSION_COLLECTION):
+        client.create_collection(VERSION_COLLECTION, vectors_config=VectorParams(size=1, distance=Distance.DOT))
+    client.upsert(
+        collection_name=VERSION_COLLECTION,
+        points=[PointStruct(
+            id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"lungscare-collection:{collection_name}")),
+            vector=[1.0],
+            payload={"collection": collection_name, "version": version,
+                     "updated_at": time.strftime("%Y-%m-%d %H:%M:%S")},
+        )],
+        wait=True,
+    )
+
+
+def read_collection_version(client, collection_name):
+    """Content version recorded for a collection, or None if it was never recorded"""
+    if not client.collection_exists(VERSION_COLLECTION):
+        return None
+    points = client.retrieve(
+        collection_name=VERSION_COLLECTION,
+        ids=[str(uuid.uuid5(uuid.NAMESPACE_URL, f"lungscare-collection:{collection_name}"))],
+        with_payload=True,
+    )
+    return (points[0].payload or {}).get("version") if points else None
+
+
+def stored_chunk_hashes(client, collection_name, page_size=1024):
+    """Map point id -> stored chunk hash (None for points written without one)"""
+    stored = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=page_size,
+            offset=offset,
+            with_payload=["chunk_hash"],
+            with_vectors=False,
+        )
+        for point in points:
+            stored[str(point.id)] = (point.payload or {}).get("chunk_hash")
+        if offset is None:
+            return stored
+
+
+def sync_collection(client, collection_name, corpus_path=CORPUS_PATH, batch_size=None,
+                    embed_batch_size=None, embed_workers=None):
+    """Bring a Qdrant collection in line with the corpus using content-hash deltas.
+
+    Only chunks whose hash is not stored are embedded and upserted; points whose hash no
+    longer occurs in the corpus (or that carry no hash) are deleted. Upserts run on upload
+    threads while later batches are still embedding, so an empty collection is a pipelined
+    full rebuild.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from qdrant_client.models import PointIdsList, PointStruct
+
+    batch_size = batch_size or _env_int("LUNGSCARE_UPSERT_BATCH_SIZE", 1024)
+    upload_threads = max(1, _env_int("LUNGSCARE_UPLOAD_THREADS", 2))
+    started = time.time()
+    texts, metadatas, hashes = corpus_chunk_table(corpus_path)
+    stored = stored_chunk_hashes(client, collection_name)
+
+    stored_hashes = set(h for h in stored.values() if h)
+    current_hashes = set(hashes)
+    added = [i for i, h in enumerate(hashes) if h not in stored_hashes]
+    removed = [point for point, h in stored.items() if h not in current_hashes]
+
+    def upsert(rows, vectors):
+        client.upsert(
+            collection_name=collection_name,
+            points=[
+                PointStruct(
+                    id=point_id(hashes[i]),
+                    vector=vector.tolist(),
+                    payload={"page_content": texts[i], "metadata": metadatas[i], "chunk_hash": hashes[i]},
+                )
+                for i, vector in zip(rows, vectors)
+            ],
+            wait=True,
+        )
+
+    uploads = []
+    with ThreadPoolExecutor(max_workers=upload_threads, thread_name_prefix="lungscare-upload") as uploader:
+        # Unchanged chunks of the latest artifact are reused rather than re-embedded
+        for positions, vectors in iter_chunk_vectors(
+            [texts[i] for i in added], [hashes[i] for i in added], latest_artifact(),
+            embed_batch_size, embed_workers
+        ):
+            rows = [added[p] for p in positions]
+            for start in range(0, len(rows), batch_size):
+                uploads.append(uploader.submit(upsert, rows[start:start + batch_size], vectors[start:start + batch_size]))
+        for start in range(0, len(removed), batch_size):
+            uploads.append(uploader.submit(
+                client.delete,
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=removed[start:start + batch_size]),
+                wait=True,
+            ))
+        for upload in uploads:
+            upload.result()
+
+    # Same content hash as an artifact built from this corpus
+    store_collection_version(client, collection_name, content_version(hashes))
+    sources_changed = len(set(metadatas[i].get("source_hash") for i in added))
+    stats = {
+        "chunks": len(hashes),
+        "added": len(added),
+        "deleted": len(removed),
+        "unchanged": len(hashes) - len(added),
+        "sources_changed": sources_changed,
+        "seconds": round(time.time() - started, 1),
+    }
+    print(f"✅ Synced '{collection_name}': {stats['added']} upserted, {stats['deleted']} deleted, "
+          f"{stats['unchanged']} unchanged in {stats['seconds']}s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LUNGSCAREAI knowledge base tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="chunk and embed the corpus into a versioned artifact")
+    build.add_argument("--corpus", default=CORPUS_PATH)
+    build.add_argument("--output", default=None, help="artifact directory (default LUNGSCARE_KB_ARTIFACT_DIR)")
+
+    ingest = commands.add_parser("ingest", help="incrementally sync a Qdrant collection with the corpus")
+    ingest.add_argument("--corpus", default=CORPUS_PATH)
+    ingest.add_argument("--url", default="http://localhost:6333")
+    ingest.add_argument("--collection", default="medical_meadow")
+
+    reindex = commands.add_parser("reindex", help="apply quantization / on-disk storage settings to a collection")
+    reindex.add_argument("--url", default="http://localhost:6333")
+    reindex.add_argument("--collection", default="medical_meadow")
+    reindex.add_argument("--target", default=None, help="build a new collection instead of updating in place")
+    reindex.add_argument("--quantization", choices=QUANTIZATION_TYPES, default=None,
+                         help="default LUNGSCARE_QDRANT_QUANTIZATION")
+    reindex.add_argument("--on-disk", dest="on_disk", action="store_true", default=None)
+    reindex.add_argument("--in-ram", dest="on_disk", action="store_false")
+    reindex.add_argument("--on-disk-payload", dest="on_disk_payload", action="store_true", default=None)
+    reindex.add_argument("--payload-in-ram", dest="on_disk_payload", action="store_false")
+
+    for command in (build, ingest):
+        command.add_argument("--workers", type=int, default=None, help="embedding processes (default LUNGSCARE_EMBED_WORKERS)")
+    build.add_argument("--batch-size", type=int, default=None, help="encoder batch size (default LUNGSCARE_EMBED_BATCH_SIZE)")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        print(build_artifact(args.corpus, args.output, args.batch_size, args.workers))
+    elif args.command == "ingest":
+        from qdrant_client import QdrantClient
+
+        client = QdrantClient(url=args.url, timeout=60)
+        print(json.dumps(sync_collection(client, args.collection, args.corpus, embed_workers=args.workers), indent=2))
+    elif args.command == "reindex":
+        from qdrant_client import QdrantClient
+
+        client = QdrantClient(url=args.url, timeout=300)
+        settings = collection_settings(args.quantization, args.on_disk, args.on_disk_payload)
+        print(json.dumps(reindex_collection(client, args.collection, args.target, settings), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Lexical Index for LUNGSCAREAI
+Compact in-process BM25 inverted index over the knowledge base chunks, and a retriever that
+fuses it with dense (embedding) search by reciprocal rank fusion. Exact drug and disease
+names that the embedding model blurs are matched lexically, and short keyword queries can be
+answered from the lexical index alone without an encoder pass.
+
+Postings are stored CSR-style (term offsets into one doc id array and one weight array) with
+the BM25 weight of every (term, chunk) pair precomputed, so a query is a few array additions.
+
+Settings:
+    LUNGSCARE_RETRIEVAL_MODE         dense (default), hybrid or lexical
+    LUNGSCARE_QUICK_INFO_RETRIEVAL   lexical (default) or default (same as LUNGSCARE_RETRIEVAL_MODE)
+    LUNGSCARE_HYBRID_CANDIDATES      results taken from each side before fusion (default 20)
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from vector_index import top_k
+
+RETRIEVAL_MODES = ("dense", "hybrid", "lexical")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Question words and fillers that appear in nearly every "Q: What is ...?" chunk
+STOPWORDS = frozenset("""
+a about an and are as at be by can do does for from has have how i if in is it its me my of on or
+should so that the their there these this to was what when where which who why will with you your
+""".split())
+# Reciprocal rank fusion constant (Cormack et al.); damps the weight of the very top ranks
+RRF_K = 60
+
+
+def retrieval_mode():
+    mode = os.getenv("LUNGSCARE_RETRIEVAL_MODE", "dense").lower()
+    return mode if mode in RETRIEVAL_MODES else "dense"
+
+
+def quick_info_mode():
+    mode = os.getenv("LUNGSCARE_QUICK_INFO_RETRIEVAL", "lexical").lower()
+    return "lexical" if mode == "lexical" else retrieval_mode()
+
+
+def hybrid_candidates():
+    try:
+        return int(os.getenv("LUNGSCARE_HYBRID_CANDIDATES", "20"))
+    except ValueError:
+        return 20
+
+
+def tokenize(text):
+    """Lowercased alphanumeric terms without stopwords (no stemming: exact names must match)"""
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if len(term) > 1 and term not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over chunk records ({"page_content", "metadata"})"""
+
+    def __init__(self, records, k1=1.5, b=0.75):
+        self.records = records
+        term_ids = {}
+        doc_terms = []  # per chunk: (term ids, term frequencies)
+        lengths = np.zeros(len(records), dtype=np.float32)
+        for doc_id, record in enumerate(records):
+            counts = Counter(tokenize(record["page_content"]))
+            lengths[doc_id] = sum(counts.values())
+            doc_terms.append((
+                np.fromiter((term_ids.setdefault(term, len(term_ids)) for term in counts), dtype=np.int32, count=len(counts)),
+                np.fromiter(counts.values(), dtype=np.float32, count=len(counts)),
+            ))
+
+        n_terms = len(term_ids)
+        all_terms = np.concatenate([terms for terms, _ in doc_terms]) if doc_terms else np.empty(0, dtype=np.int32)
+        all_tf = np.concatenate([tf for _, tf in doc_terms]) if doc_terms else np.empty(0, dtype=np.float32)
+        all_docs = np.repeat(np.arange(len(records), dtype=np.int32), [len(terms) for terms, _ in doc_terms])
+
+        # Group postings by term (stable, so doc ids stay ascending within a term)
+        order = np.argsort(all_terms, kind="stable")
+        doc_freq = np.bincount(all_terms, minlength=n_terms)
+        self._offsets = np.concatenate([[0], np.cumsum(doc_freq)]).astype(np.int64)
+        self._doc_ids = all_docs[order]
+
+        avg_length = float(lengths.mean()) if len(records) else 0.0
+        idf = np.log(1.0 + (len(records) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        tf = all_tf[order]
+        norm = k1 * (1.0 - b + b * lengths[self._doc_ids] / (avg_length or 1.0))
+        self._weights = (idf[all_terms[order]] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+        self._term_ids = term_ids
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+        return cls([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents], **kwargs)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def vocabulary_size(self):
+        return len(self._term_ids)
+
+    def nbytes(self):
+        return self._offsets.nbytes + self._doc_ids.nbytes + self._weights.nbytes
+
+    def search(self, query, k=4):
+        """(Document, BM25 score) pairs for the k best matching chunks, best first"""
+        scores = np.zeros(len(self.records), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            # Doc ids are unique within a term's postings, so fancy-index addition is exact
+            scores[self._doc_ids[start:end]] += self._weights[start:end]
+            matched = True
+        if not matched:
+            return []
+        results = []
+        for i in top_k(scores, k):
+            if scores[i] <= 0:
+                break
+            record = self.records[i]
+            results.append((Document(page_content=record["page_content"], metadata=record.get("metadata", {})),
+                            float(scores[i])))
+        return results
+
+    def stats(self):
+        return {
+            "chunks": len(self.records),
+            "terms": self.vocabulary_size,
+            "postings": int(self._doc_ids.shape[0]),
+            "postings_bytes": self.nbytes(),
+        }
+
+
+def reciprocal_rank_fusion(ranked_lists, k, rrf_k=RRF_K):
+    """Fuse several best-first Document lists: score = sum of 1 / (rrf_k + rank) per list"""
+    scores = {}
+    documents = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, 1):
+            key = doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense, lexical or fused (reciprocal rank fusion) retrieval behind the retriever interface"""
+
+    dense: Optional[Any] = None     # dense retriever returning `candidates` results
+    lexical: Optional[Any] = None   # BM25Index
+    mode: str = "hybrid"
+    k: int = 3
+    candidates: int = 20
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        return self.search(query, self.mode)
+
+    def search(self, query, mode=None, k=None):
+        mode = mode or self.mode
+        k = k or self.k
+        if mode == "lexical" or self.dense is None:
+            return [doc for doc, _ in self.lexical.search(query, k)]
+        dense_docs = self.dense.invoke(query)
+        if mode == "dense" or self.lexical is None:
+            return dense_docs[:k]
+        return self.fuse(dense_docs, query, k)
+
+    def fuse(self, dense_docs, query, k=None):
+        """Fuse already retrieved dense candidates with the lexical results for the query"""
+        lexical_docs = [doc for doc, _ in self.lexical.search(query, self.candidates)]
+        return reciprocal_rank_fusion([dense_docs, lexical_docs], k or self.k)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+LLM Response Cache for LUNGSCAREAI
+Caches responses to deterministic prompts (quick info, health tips, clinical report text)
+in a small in-memory LRU backed by SQLite, keyed by a hash of the prompt and model
+parameters, with TTL expiry and a bounded number of entries.
+
+Settings:
+    LUNGSCARE_LLM_CACHE_PATH             SQLite file (default llm_cache.sqlite3)
+    LUNGSCARE_LLM_CACHE_TTL              seconds an entry stays valid (default 604800 = 7 days)
+    LUNGSCARE_LLM_CACHE_MAX_ENTRIES      entries kept on disk (default 5000, 0 = cache off)
+    LUNGSCARE_LLM_CACHE_MEMORY_ENTRIES   entries kept in memory (default 256)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def _env_number(name, default):
+    try:
+        return type(default)(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def llm_parameters(llm):
+    """Model parameters that change the response for a given prompt"""
+    return {
+        "model": getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__,
+        "temperature": getattr(llm, "temperature", None),
+        "max_tokens": getattr(llm, "max_output_tokens", None) or getattr(llm, "max_tokens", None),
+    }
+
+
+def response_text(response):
+    """Text of an LLM response (AIMessage from newer langchain-google-genai, or plain text)"""
+    return response.content if hasattr(response, 'content') else str(response)
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of LLM responses with TTL and size bounds"""
+
+    def __init__(self, path=None, ttl=None, max_entries=None, memory_entries=None):
+        self.path = path or os.getenv("LUNGSCARE_LLM_CACHE_PATH", "llm_cache.sqlite3")
+        self.ttl = ttl if ttl is not None else _env_number("LUNGSCARE_LLM_CACHE_TTL", 604800.0)
+        self.max_entries = max_entries if max_entries is not None else _env_number("LUNGSCARE_LLM_CACHE_MAX_ENTRIES", 5000)
+        self.memory_entries = (memory_entries if memory_entries is not None
+                               else _env_number("LUNGSCARE_LLM_CACHE_MEMORY_ENTRIES", 256))
+        self.enabled = self.max_entries > 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def make_key(prompt, parameters):
+        payload = json.dumps({"prompt": prompt, **parameters}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, response, expires_at):
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached response for a key, or None if missing or expired"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            try:
+                db = self._connection()
+                row = db.execute("SELECT response, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    db.commit()
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache read failed: {e}")
+            self.misses += 1
+            return None
+
+    def set(self, key, response, ttl=None):
+        if not self.enabled:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, response, expires_at)
+            try:
+                db = self._connection()
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, expires_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, response, now, expires_at, now)
+                )
+                self._evict(db, now)
+                db.commit()
+                self.writes += 1
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache write failed: {e}")
+
+    def _evict(self, db, now):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            try:
+                self._connection().execute("DELETE FROM responses")
+                self._connection().commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache clear failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            disk_entries = None
+            if self.enabled:
+                try:
+                    disk_entries = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "path": self.path,
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedLLM:
+    """Wraps an LLM so responses to repeated prompts come from the cache. Returns response text."""
+
+    def __init__(self, llm, cache):
+        self.llm = llm
+        self.cache = cache
+
+    def _key(self, prompt):
+        return self.cache.make_key(prompt, llm_parameters(self.llm))
+
+    def invoke(self, prompt, ttl=None):
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        text = response_text(self.llm.invoke(prompt))
+        if text:
+            self.cache.set(key, text, ttl)
+        return text
+
+    async def ainvoke(self, prompt, ttl=None):
+        # Only awaited by the backend, whose stage executors live next to its app module
+        from executors import run_in_stage
+
+        key = self._key(prompt)
+        # SQLite lookups are short but still blocking; keep them on the bounded io pool
+        cached = await run_in_stage("io", self.cache.get, key)
+        if cached is not None:
+            return cached
+        text = response_text(await self.llm.ainvoke(prompt))
+        if text:
+            await run_in_stage("io", self.cache.set, key, text, ttl)
+        return text
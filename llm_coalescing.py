@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+LLM Request Coalescing for LUNGSCAREAI
+Single-flight wrapper around the LLM client: concurrent calls with an identical prompt
+(and model parameters) share one in-flight request instead of each calling Gemini.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from llm_cache import LLMResponseCache, llm_parameters
+
+
+class CoalescingLLM:
+    """Shares one in-flight invoke/ainvoke per identical prompt; other attributes pass through"""
+
+    def __init__(self, llm):
+        self.llm = llm
+        self._inflight = {}        # key -> concurrent.futures.Future (invoke from threads)
+        self._async_inflight = {}  # key -> asyncio.Task (ainvoke on the event loop)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    def __getattr__(self, name):
+        # Model name, temperature, astream, ... come from the wrapped client
+        return getattr(self.llm, name)
+
+    def _key(self, prompt, kwargs):
+        if kwargs or not isinstance(prompt, str):
+            return None  # only plain prompt strings are coalesced
+        return LLMResponseCache.make_key(prompt, llm_parameters(self.llm))
+
+    def invoke(self, prompt, **kwargs):
+        key = self._key(prompt, kwargs)
+        if key is None:
+            return self.llm.invoke(prompt, **kwargs)
+
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+        try:
+            result = self.llm.invoke(prompt)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def ainvoke(self, prompt, **kwargs):
+        key = self._key(prompt, kwargs)
+        if key is None:
+            return await self.llm.ainvoke(prompt, **kwargs)
+
+        with self._lock:
+            self.calls += 1
+            task = self._async_inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self.llm.ainvoke(prompt))
+                self._async_inflight[key] = task
+                task.add_done_callback(lambda _, key=key: self._async_inflight.pop(key, None))
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        # A caller going away must not cancel the request the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight) + len(self._async_inflight),
+                "coalesced_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            }
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Model Registry for LUNGSCAREAI
+Loads each modality's model on first use, tracks last use and unloads idle models
+"""
+
+import gc
+import importlib
+import os
+import threading
+import time
+
+
+def _env_float(name, default):
+    """Read a float setting from the environment, falling back to the default"""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def _resolve(target):
+    """Resolve a 'module:function' string (or a callable) to a callable"""
+    if callable(target):
+        return target
+    module_name, func_name = target.split(":", 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def estimate_model_bytes(obj):
+    """Best-effort memory estimate for a loaded model bundle (torch modules, Keras models)"""
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_model_bytes(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(estimate_model_bytes(item) for item in obj.values())
+    # torch.nn.Module
+    if callable(getattr(obj, "parameters", None)):
+        try:
+            return int(sum(p.numel() * p.element_size() for p in obj.parameters()))
+        except Exception:
+            return 0
+    # tf.keras.Model (float32 weights)
+    if callable(getattr(obj, "count_params", None)):
+        try:
+            return int(obj.count_params()) * 4
+        except Exception:
+            return 0
+    return 0
+
+
+class ModelRegistry:
+    """Lazily loads models per modality and unloads them when idle or over the memory budget"""
+
+    def __init__(self, memory_budget_mb=None, idle_timeout=None):
+        # 0 disables the budget / idle timeout
+        self.memory_budget_mb = (memory_budget_mb if memory_budget_mb is not None
+                                 else _env_float("LUNGSCARE_MODEL_MEMORY_BUDGET_MB", 0))
+        self.idle_timeout = (idle_timeout if idle_timeout is not None
+                             else _env_float("LUNGSCARE_MODEL_IDLE_TIMEOUT", 900))
+        self._specs = {}
+        self._resident = {}
+        self._lock = threading.RLock()
+        self._load_locks = {}
+
+    def register(self, name, loader, unloader=None):
+        """Register a modality. Loader/unloader may be callables or 'module:function' strings."""
+        with self._lock:
+            self._specs[name] = {"loader": loader, "unloader": unloader}
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Return the loaded model bundle for a modality, loading it on first use"""
+        if name not in self._specs:
+            raise KeyError(f"Unknown model '{name}'. Registered: {list(self._specs)}")
+
+        with self._lock:
+            entry = self._resident.get(name)
+            if entry is not None:
+                entry["last_used"] = time.time()
+                entry["uses"] += 1
+                return entry["model"]
+
+        # Opportunistically drop other idle models before loading a new one
+        self.evict_idle()
+
+        with self._load_locks[name]:
+            with self._lock:
+                entry = self._resident.get(name)
+                if entry is not None:
+                    entry["last_used"] = time.time()
+                    entry["uses"] += 1
+                    return entry["model"]
+
+            started = time.time()
+            model = _resolve(self._specs[name]["loader"])()
+            now = time.time()
+
+            with self._lock:
+                self._resident[name] = {
+                    "model": model,
+                    "size_bytes": estimate_model_bytes(model),
+                    "loaded_at": now,
+                    "load_seconds": now - started,
+                    "last_used": now,
+                    "uses": 1,
+                }
+            print(f"📦 Model '{name}' loaded in {now - started:.1f}s")
+
+        self._enforce_budget(keep=name)
+        return model
+
+    def is_resident(self, name):
+        with self._lock:
+            return name in self._resident
+
+    def unload(self, name):
+        """Drop a resident model and run its unloader hook. Returns True if it was resident."""
+        with self._lock:
+            entry = self._resident.pop(name, None)
+        if entry is None:
+            return False
+
+        del entry
+        unloader = self._specs[name].get("unloader")
+        if unloader:
+            try:
+                _resolve(unloader)()
+            except Exception as e:
+                print(f"⚠️ Unloader for model '{name}' failed: {e}")
+        gc.collect()
+        print(f"🧹 Model '{name}' unloaded")
+        return True
+
+    def evict_idle(self, idle_timeout=None):
+        """Unload every model that has not been used within the idle timeout"""
+        timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        if not timeout:
+            return []
+
+        cutoff = time.time() - timeout
+        with self._lock:
+            idle = [name for name, entry in self._resident.items() if entry["last_used"] < cutoff]
+        return [name for name in idle if self.unload(name)]
+
+    def _enforce_budget(self, keep=None):
+        """Unload least recently used models until resident memory fits the budget"""
+        if not self.memory_budget_mb:
+            return []
+
+        budget = self.memory_budget_mb * 1024 * 1024
+        evicted = []
+        while True:
+            with self._lock:
+                total = sum(entry["size_bytes"] for entry in self._resident.values())
+                candidates = sorted(
+                    (entry["last_used"], name) for name, entry in self._resident.items() if name != keep
+                )
+            if total <= budget or not candidates:
+                break
+            name = candidates[0][1]
+            if self.unload(name):
+                evicted.append(name)
+        return evicted
+
+    def resident(self):
+        """Describe the currently loaded models"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "size_mb": round(entry["size_bytes"] / (1024 * 1024), 1),
+                    "loaded_at": entry["loaded_at"],
+                    "load_seconds": round(entry["load_seconds"], 2),
+                    "last_used": entry["last_used"],
+                    "idle_seconds": round(now - entry["last_used"], 1),
+                    "uses": entry["uses"],
+                }
+                for name, entry in self._resident.items()
+            ]
+
+    def status(self):
+        return {
+            "registered": list(self._specs),
+            "resident": self.resident(),
+            "memory_budget_mb": self.memory_budget_mb,
+            "idle_timeout": self.idle_timeout,
+        }
+
+
+# Analysis tools by name -> (module, class, modality). Imported on first use so processes
+# that never analyse a modality never import its framework.
+ANALYSIS_TOOLS = {
+    "audio_classification": ("inf", "AudioClassificationTool", "audio"),
+    "audio_gradient_xai": ("inf", "AudioGradientXAITool", "audio"),
+    "audio_attention_xai": ("inf", "AudioAttentionXAITool", "audio"),
+    "xray_classification": ("xray_tools", "XrayClassificationTool", "xray"),
+    "xray_visualization": ("xray_tools", "XrayVisualizationTool", "xray"),
+}
+
+
+def tool_modality(name):
+    """Modality ('audio' or 'xray') served by an analysis tool"""
+    return ANALYSIS_TOOLS[name][2]
+
+
+def create_tool(name):
+    """Instantiate an analysis tool by name, importing its module on first use"""
+    module_name, class_name, _ = ANALYSIS_TOOLS[name]
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# Process-wide registry shared by the audio and X-ray tools
+model_registry = ModelRegistry()
+model_registry.register("audio", "inf:load_audio_model", "inf:unload_audio_model")
+# No Keras clear_session(): it resets graph state process-wide, under any in-flight prediction;
+# dropping the registry's reference and collecting is enough to free the model
+model_registry.register("xray", "xray_tools:load_xray_model")
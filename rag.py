@@ -1,16 +1,25 @@
-from langchain_community.document_loaders import JSONLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import SentenceTransformerEmbeddings
 from langchain_community.vectorstores import Qdrant
-from langchain.agents import initialize_agent, AgentType, Tool
+from langchain_core.documents import Document
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-from inf import AudioClassificationTool, AudioGradientXAITool, AudioAttentionXAITool  # Fixed import
-from xray_tools import XrayClassificationTool, XrayVisualizationTool
+import hashlib
 import json
 import os
+import threading
 from qdrant_client import QdrantClient
+from model_registry import create_tool
+from embedding_cache import CachedEmbeddings
+from llm_cache import CachedLLM, LLMResponseCache
+from llm_coalescing import CoalescingLLM
+from semantic_cache import SemanticAnswerCache
+from report_text_store import ReportTextStore
+from knowledge_base import (build_artifact, collection_settings, collection_storage, corpus_chunk_table,
+                            create_collection, latest_artifact, load_artifact_chunks, load_manifest,
+                            read_collection_version, search_params, sync_collection, upsert_artifact)
+from lexical_index import BM25Index, HybridRetriever, hybrid_candidates, quick_info_mode, retrieval_mode
+from vector_index import NumpyVectorIndex
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -342,7 +351,7 @@ CLINICAL SUMMARY:"""
         story.append(summary_header)
         story.append(Spacer(1, 0.1*inch))
         
-        # Enhanced classification summary
+        # Enhanced classification summary (may be precomputed concurrently by the caller)
         enhanced_summary = self._create_enhanced_classification_summary(classification_result, detailed_analysis, "Audio")
         result_text = f"<b>Final Classification:</b> {classification_result}<br/><br/>{enhanced_summary}"
         result_para = Paragraph(result_text, self.body_style)
@@ -599,7 +608,7 @@ CLINICAL SUMMARY:"""
         story.append(summary_header)
         story.append(Spacer(1, 0.1*inch))
         
-        # Enhanced classification summary
+        # Enhanced classification summary (may be precomputed concurrently by the caller)
         enhanced_summary = self._create_enhanced_classification_summary(classification_result, detailed_analysis, "X-ray")
         result_text = f"<b>Final Classification:</b> {classification_result}<br/><br/>{enhanced_summary}"
         result_para = Paragraph(result_text, self.body_style)
@@ -641,22 +650,47 @@ CLINICAL SUMMARY:"""
         return filename
 
 class MedicalRAGAgent:
+    # Reduce k and add threshold to avoid errors
+    RETRIEVAL_K = 3
+    SCORE_THRESHOLD = 0.5
+
     def __init__(self):
         self.patient_manager = PatientManager()
         self.report_generator = MedicalReportGenerator()
         self.current_patient = None
+        self.last_tool_result = None
         self.last_detailed_analysis = ""
+        self._tools = {}
+        self.embeddings = None
+        self.lexical_index = None
+        self.retrieval_mode = "dense"
+        self.qdrant_storage = None
+        self.qdrant_search_params = None
+        self.qdrant_client = None
+        self.collection_name = None
+        self._static_contexts = {}
+        self._static_context_version = None
+        self._static_context_lock = threading.Lock()
         self.setup_rag()
+        # Responses to deterministic prompts (report text, quick info, health tips) are cached
+        self.llm_cache = LLMResponseCache()
+        self.cached_llm = CachedLLM(self.llm, self.llm_cache)
         self.setup_prompts()
-        self.setup_agent()
+        # Near-duplicate general questions reuse earlier answers until the corpus or prompts change
+        self.answer_cache = SemanticAnswerCache(self.embeddings)
+        self.prompt_version = hashlib.sha256((self.PERSONA + self.QUESTION_PROMPT).encode("utf-8")).hexdigest()[:12]
+        self.report_text_store = ReportTextStore(
+            self._write_clinical_report_text,
+            prompt_version=hashlib.sha256(self.CLINICAL_REPORT_PROMPT.encode("utf-8")).hexdigest()[:12]
+        )
+        self.refresh_static_contexts()
         # Pass LLM instance to report generator for summary generation
         self.report_generator.llm = self.llm
     
     def setup_rag(self):
         print("🚀 Setting up optimized RAG system...")
-        def add_input_to_metadata(record, metadata):
-            metadata["input"] = record.get("input", "")
-            return metadata
+        # qdrant (server only), numpy (embedded index only) or auto (qdrant, else embedded index)
+        backend = os.getenv("LUNGSCARE_VECTOR_BACKEND", "auto").lower()
         
         # Set up Qdrant connection to Docker instance
         qdrant_url = "http://localhost:6333"
@@ -664,18 +698,74 @@ class MedicalRAGAgent:
         
         # Create embeddings instance
         print("📚 Loading embeddings model...")
-        emb = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-        
+        # Query embeddings are LRU-cached; repeated questions skip re-encoding
+        emb = CachedEmbeddings(SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2"))
+        self.embeddings = emb
+        self.vectorstore = None
+        self.retriever = None
+
+        if backend == "numpy":
+            self._setup_local_index(emb)
+        else:
+            self._setup_qdrant(emb, qdrant_url, collection_name)
+            if self.vectorstore is None and backend == "auto":
+                print("↪️ Falling back to the embedded vector index")
+                self._setup_local_index(emb)
+
+        # dense (embeddings only), hybrid (dense fused with BM25) or lexical (BM25 only)
+        mode = retrieval_mode()
+        # The BM25 index also serves quick info topics and stands in when vector search is unavailable
+        if mode != "dense" or quick_info_mode() == "lexical" or self.vectorstore is None:
+            self._setup_lexical_index()
+
+        if self.vectorstore is None and self.lexical_index is None:
+            print("RAG will operate in limited mode without vector search.")
+            self._setup_llm()
+            return
+        if self.vectorstore is None:
+            print("↪️ Vector search unavailable; retrieving from the lexical index only")
+            mode = "lexical"
+        elif self.lexical_index is None:
+            mode = "dense"
+        self.retrieval_mode = mode
+
+        # Optimize retriever for faster responses (HNSW will be used automatically)
+        try:
+            search_kwargs = {"score_threshold": self.SCORE_THRESHOLD}
+            if self.qdrant_search_params is not None and not isinstance(self.vectorstore, NumpyVectorIndex):
+                # Quantized collections: oversample and rescore with the original vectors
+                search_kwargs["search_params"] = self.qdrant_search_params
+            if mode == "dense":
+                self.retriever = self.vectorstore.as_retriever(
+                    search_kwargs={"k": self.RETRIEVAL_K, **search_kwargs}
+                )
+            else:
+                dense = None
+                if mode == "hybrid":
+                    # More dense candidates than returned, so fusion can promote lexical matches
+                    dense = self.vectorstore.as_retriever(
+                        search_kwargs={"k": hybrid_candidates(), **search_kwargs}
+                    )
+                self.retriever = HybridRetriever(
+                    dense=dense, lexical=self.lexical_index, mode=mode,
+                    k=self.RETRIEVAL_K, candidates=hybrid_candidates()
+                )
+            print(f"🔎 Retrieval mode: {mode}")
+        except Exception as e:
+            print(f"⚠️ Error creating retriever: {e}")
+            print("RAG will operate in limited mode without vector search.")
+            self.retriever = None
+
+        self._setup_llm()
+
+    def _setup_qdrant(self, emb, qdrant_url, collection_name):
+        """Connect to (or create) the Qdrant collection; leaves vectorstore None on failure"""
         # Create Qdrant client to check if collection exists
         try:
             client = QdrantClient(url=qdrant_url, timeout=10)
         except Exception as e:
             print(f"⚠️ Warning: Could not connect to Qdrant at {qdrant_url}")
             print(f"Error: {e}")
-            print("RAG will operate in limited mode without vector search.")
-            self.vectorstore = None
-            self.retriever = None
-            self._setup_llm()
             return
 
         try:
@@ -695,26 +785,59 @@ class MedicalRAGAgent:
             print(f"⚠️ Collection '{collection_name}' not found or error accessing it: {e}")
             try:
                 print("Attempting to create new collection...")
-                self._create_new_collection(add_input_to_metadata, emb, client, collection_name)
+                self._create_new_collection(emb, client, collection_name)
             except Exception as create_error:
                 print(f"⚠️ Could not create collection: {create_error}")
-                print("RAG will operate in limited mode without vector search.")
                 self.vectorstore = None
-                self.retriever = None
-                self._setup_llm()
                 return
 
-        # Optimize retriever for faster responses (HNSW will be used automatically)
+        self.qdrant_client = client
+        self.collection_name = collection_name
         try:
-            self.retriever = self.vectorstore.as_retriever(
-                search_kwargs={"k": 3, "score_threshold": 0.5}  # Reduce k and add threshold to avoid errors
-            )
+            # Search parameters follow what the collection actually stores (it may predate the settings)
+            self.qdrant_storage = collection_storage(client, collection_name)
+            settings = collection_settings()
+            settings["quantization"] = self.qdrant_storage["quantization"]
+            self.qdrant_search_params = search_params(settings)
         except Exception as e:
-            print(f"⚠️ Error creating retriever: {e}")
-            print("RAG will operate in limited mode without vector search.")
-            self.retriever = None
+            print(f"⚠️ Could not read collection storage settings: {e}")
 
-        self._setup_llm()
+    def _setup_local_index(self, emb):
+        """Load the embedded NumPy index (the latest knowledge base artifact), building it on first use"""
+        try:
+            # The knowledge base artifact has the index file layout; load it in place
+            artifact_dir = latest_artifact()
+            if artifact_dir is None and NumpyVectorIndex.exists():
+                self.vectorstore = NumpyVectorIndex.load(emb)
+            else:
+                if artifact_dir is None:
+                    print("Building knowledge base artifact from the corpus...")
+                    artifact_dir = build_artifact()
+                self.vectorstore = NumpyVectorIndex.load(emb, artifact_dir)
+            print(f"✅ Embedded vector index ready with {len(self.vectorstore)} chunks")
+        except Exception as e:
+            print(f"⚠️ Could not load embedded vector index: {e}")
+            self.vectorstore = None
+
+    def _setup_lexical_index(self):
+        """Build the BM25 index over the same chunks the vector store holds"""
+        try:
+            if isinstance(self.vectorstore, NumpyVectorIndex):
+                records = self.vectorstore.records
+            else:
+                artifact_dir = latest_artifact()
+                if artifact_dir is not None:
+                    records = load_artifact_chunks(artifact_dir)
+                else:
+                    texts, metadatas, _ = corpus_chunk_table()
+                    records = [{"page_content": text, "metadata": metadata} for text, metadata in zip(texts, metadatas)]
+            self.lexical_index = BM25Index(records)
+            stats = self.lexical_index.stats()
+            print(f"✅ Lexical index ready: {stats['chunks']} chunks, {stats['terms']} terms, "
+                  f"{stats['postings_bytes'] / 1e6:.1f} MB of postings")
+        except Exception as e:
+            print(f"⚠️ Could not build lexical index: {e}")
+            self.lexical_index = None
 
     def _setup_llm(self):
         """Setup the LLM connection separately"""
@@ -731,7 +854,7 @@ class MedicalRAGAgent:
         
         # Initialize Gemini 2.0 Flash model
         from langchain_google_genai import ChatGoogleGenerativeAI
-        self.llm = ChatGoogleGenerativeAI(
+        self.base_llm = ChatGoogleGenerativeAI(
             model="gemini-2.5-flash",
             google_api_key=api_key,  # Explicitly pass the API key
             temperature=0.1,
@@ -739,57 +862,45 @@ class MedicalRAGAgent:
             timeout=60,
             max_retries=2
         )
+        # Identical prompts in flight at the same time share one Gemini request
+        self.llm = CoalescingLLM(self.base_llm)
     
-    def _create_new_collection(self, add_input_to_metadata, emb, client, collection_name):
+    def _create_new_collection(self, emb, client, collection_name):
         """Create a new Qdrant collection from documents"""
-        loader = JSONLoader(
-            file_path="medical_meadow_wikidoc_patient_info_cleaned.json",
-            jq_schema=".[]",
-            text_content=True,
-            content_key="output",
-            metadata_func=add_input_to_metadata
-        )
-        docs = loader.load()
-
-        for d in docs:
-            d.page_content = f"Q: {d.metadata.get('input','')}\nA: {d.page_content}"
+        # Fail fast when the server is unreachable, before any embedding work
+        client.get_collections()
 
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-        split_docs = splitter.split_documents(docs)
+        # Precomputed embeddings (built offline or shipped prebuilt) are upserted without re-embedding
+        artifact_dir = latest_artifact()
 
-        # Create persistent vectorstore with Docker Qdrant using HNSW optimization
-        from qdrant_client.models import Distance, VectorParams, HnswConfigDiff
-        
-        # Configure HNSW for faster similarity search
-        hnsw_config = HnswConfigDiff(
-            m=16,              # Number of connections per node (balance between speed and accuracy)
-            ef_construct=200,  # Size of dynamic candidate list during construction
-            full_scan_threshold=10000,  # Use exact search for small datasets
-            max_indexing_threads=4      # Parallel indexing
-        )
-        
-        # Create collection with proper vector configuration first
+        # Create the collection first: HNSW, quantization and on-disk storage come from the
+        # LUNGSCARE_QDRANT_* settings (see knowledge_base.py). Invalid settings raise here,
+        # before the creation attempt, rather than being mistaken for an existing collection.
+        settings = collection_settings()
         try:
-            client.create_collection(
-                collection_name=collection_name,
-                vectors_config=VectorParams(
-                    size=384,  # all-MiniLM-L6-v2 embedding dimension
-                    distance=Distance.COSINE,
-                    hnsw_config=hnsw_config
-                )
-            )
+            create_collection(client, collection_name, settings)
         except Exception as e:
-            # Collection might already exist
+            if not client.collection_exists(collection_name):
+                raise
+            # Collection already exists
             print(f"Collection creation note: {e}")
         
-        # Now create the vectorstore without vector_config parameter
-        self.vectorstore = Qdrant.from_documents(
-            split_docs, 
-            emb, 
-            url="http://localhost:6333",
-            collection_name=collection_name
+        if artifact_dir is not None:
+            upsert_artifact(client, collection_name, artifact_dir)
+            source = f"artifact {load_manifest(artifact_dir)['version']}"
+        else:
+            # No artifact: embed across processes with uploads pipelined behind the embedding
+            sync_collection(client, collection_name)
+            source = "corpus"
+
+        # Attach the langchain store to the filled collection
+        self.vectorstore = Qdrant(
+            client=client,
+            collection_name=collection_name,
+            embeddings=emb
         )
-        print(f"✅ New collection '{collection_name}' created with HNSW optimization and {len(split_docs)} documents!")
+        count = client.get_collection(collection_name).points_count
+        print(f"✅ New collection '{collection_name}' created with HNSW optimization and {count} documents ({source})!")
 
     def setup_prompts(self):
         """Setup enhanced prompts for better medical responses"""
@@ -1007,46 +1118,172 @@ If the question is NOT about health, medicine, symptoms, diseases, treatments, o
 ═══════════════════════════════════════════════════════════
 YOUR RESPONSE:"""
 
-    def get_relevant_context(self, query_type="general"):
-        """Get relevant context based on query type - optimized for speed while keeping quality"""
-        if query_type == "normal":
-            queries = [
-                "How can a patient keep lungs healthy? tips and precautions",
-                "Advice to maintain healthy lungs; preventive measures"
-            ]
-        elif query_type == "abnormal":
-            queries = [
-                "What are possible lung diseases given abnormal lung sounds? give differential diagnosis",
-                "Common respiratory conditions associated with abnormal lung exam; brief rationales",
-                "How can a patient keep lungs healthy? tips and precautions"
+    # Fixed retrieval queries per analysis outcome; their contexts only change with the corpus
+    STATIC_CONTEXT_QUERIES = {
+        "normal": [
+            "How can a patient keep lungs healthy? tips and precautions",
+            "Advice to maintain healthy lungs; preventive measures"
+        ],
+        "abnormal": [
+            "What are possible lung diseases given abnormal lung sounds? give differential diagnosis",
+            "Common respiratory conditions associated with abnormal lung exam; brief rationales",
+            "How can a patient keep lungs healthy? tips and precautions"
+        ],
+    }
+
+    def retrieval_status(self):
+        """Retriever configuration and cache counters"""
+        return {
+            "available": self.retriever is not None,
+            "backend": type(self.vectorstore).__name__ if self.vectorstore is not None else None,
+            "mode": self.retrieval_mode,
+            "quick_info_mode": quick_info_mode() if self.lexical_index is not None else self.retrieval_mode,
+            "lexical_index": self.lexical_index.stats() if self.lexical_index is not None else None,
+            "collection": self.collection_name,
+            "collection_storage": self.qdrant_storage,
+            "static_context_version": self._static_context_version,
+            "embedding_cache": self.embeddings.stats() if self.embeddings is not None else None,
+        }
+
+    def collection_version(self):
+        """Identifier that changes whenever the vector collection's contents change (None if unknown)"""
+        if isinstance(self.vectorstore, NumpyVectorIndex):
+            return self.vectorstore.version
+        if self.vectorstore is None and self.lexical_index is not None:
+            return f"lexical:{len(self.lexical_index)}"
+        if self.qdrant_client is None or self.collection_name is None:
+            return None
+        try:
+            # Content version recorded by artifact upserts and incremental syncs
+            version = read_collection_version(self.qdrant_client, self.collection_name)
+            if version is not None:
+                return f"{self.collection_name}:{version[:12]}"
+            # Collections filled before versions were recorded: the point count is the best proxy
+            info = self.qdrant_client.get_collection(self.collection_name)
+            return f"{self.collection_name}:{info.points_count}"
+        except Exception as e:
+            print(f"Warning: could not read collection version: {e}")
+            return None
+
+    def _search_vectors(self, vectors, k, score_threshold):
+        """One batched vector search for several query vectors; returns a Document list per vector"""
+        if isinstance(self.vectorstore, NumpyVectorIndex):
+            results = self.vectorstore.search_batch_by_vectors(vectors, k=k, score_threshold=score_threshold)
+            return [[doc for doc, _ in hits] for hits in results]
+
+        from qdrant_client.models import QueryRequest
+
+        responses = self.qdrant_client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                QueryRequest(query=list(vector), limit=k, score_threshold=score_threshold, with_payload=True,
+                             params=self.qdrant_search_params)
+                for vector in vectors
+            ],
+        )
+        return [
+            [
+                Document(
+                    page_content=(point.payload or {}).get("page_content", ""),
+                    metadata=(point.payload or {}).get("metadata") or {}
+                )
+                for point in response.points
             ]
+            for response in responses
+        ]
+
+    def retrieve_many(self, queries, k=None, score_threshold=None, dedupe=True):
+        """Retrieve documents for several queries with one encoder batch and one vector search.
+
+        Returns one Document list per query; with dedupe a document is only kept for the first
+        query that retrieved it.
+        """
+        k = k or self.RETRIEVAL_K
+        score_threshold = self.SCORE_THRESHOLD if score_threshold is None else score_threshold
+        if self.retriever is None:
+            raise RuntimeError("Vector search is not available")
+        if not queries:
+            return []
+
+        if self.retrieval_mode == "lexical":
+            results = [[doc for doc, _ in self.lexical_index.search(query, k)] for query in queries]
         else:
-            return ""
-        
-        # Optimized context retrieval with error handling
+            if hasattr(self.embeddings, "embed_queries"):
+                vectors = self.embeddings.embed_queries(queries)
+            else:
+                vectors = self.embeddings.embed_documents(queries)
+            if self.retrieval_mode == "hybrid":
+                dense = self._search_vectors(vectors, max(k, self.retriever.candidates), score_threshold)
+                results = [self.retriever.fuse(docs, query, k) for docs, query in zip(dense, queries)]
+            else:
+                results = self._search_vectors(vectors, k, score_threshold)
+
+        if dedupe:
+            seen = set()
+            for docs in results:
+                docs[:] = [doc for doc in docs if not (doc.page_content in seen or seen.add(doc.page_content))]
+        return results
+
+    def _build_static_context(self, queries, docs_by_query):
         all_context = []
+        seen = set()
+        for query in queries:
+            # Keep top 2 docs per query for quality, skipping ones an earlier query already added
+            docs = [doc for doc in docs_by_query[query] if doc.page_content not in seen][:2]
+            for doc in docs:
+                seen.add(doc.page_content)
+                all_context.append(doc.page_content)
+        # Keep full context but optimize formatting
+        return "\n\n".join(all_context[:6])  # Slightly more context for quality
+
+    def refresh_static_contexts(self, force=False):
+        """Precompute the fixed query-type contexts; a no-op unless the collection version changed"""
+        if self.retriever is None:
+            return False
+        version = self.collection_version()
+        if not force and self._static_contexts and version is not None and version == self._static_context_version:
+            return False
+
+        # Each distinct query is retrieved once even when shared between query types, all in one batch
+        distinct = list(dict.fromkeys(q for queries in self.STATIC_CONTEXT_QUERIES.values() for q in queries))
         try:
-            for query in queries:
-                docs = self.retriever.invoke(query)
-                for doc in docs[:2]:  # Keep top 2 docs per query for quality
-                    all_context.append(doc.page_content)
+            docs_by_query = dict(zip(distinct, self.retrieve_many(distinct, dedupe=False)))
         except Exception as e:
-            print(f"Warning: RAG context retrieval failed: {e}")
-            return ""  # Return empty context if retrieval fails
+            print(f"Warning: static context precompute failed: {e}")
+            return False
 
-        # Keep full context but optimize formatting
-        return "\n\n".join(all_context[:6])  # Slightly more context for quality
+        contexts = {
+            query_type: self._build_static_context(queries, docs_by_query)
+            for query_type, queries in self.STATIC_CONTEXT_QUERIES.items()
+        }
+        with self._static_context_lock:
+            self._static_contexts = contexts
+            self._static_context_version = version
+        print(f"📌 Static retrieval contexts ready (collection version {version})")
+        return True
 
-    def generate_clinical_report_text(self, classification_result: str, confidence: float, analysis_type: str = "audio") -> str:
-        """Generate professional clinical report text (not conversational)"""
+    def get_relevant_context(self, query_type="general"):
+        """Get relevant context based on query type - served from the precomputed static contexts"""
+        queries = self.STATIC_CONTEXT_QUERIES.get(query_type)
+        if queries is None:
+            return ""
 
-        analysis_label = "Lung Audio Auscultation" if analysis_type == "audio" else "Chest Radiograph"
+        with self._static_context_lock:
+            context = self._static_contexts.get(query_type)
+        if context is not None:
+            return context
+
+        # Not precomputed yet (e.g. the knowledge base was unavailable at startup)
+        if self.refresh_static_contexts(force=True):
+            with self._static_context_lock:
+                return self._static_contexts.get(query_type, "")
+        return ""
 
-        prompt = f"""You are a medical report writer generating text for a formal clinical report.
+    CLINICAL_REPORT_PROMPT = """You are a medical report writer generating text for a formal clinical report.
 
 ANALYSIS TYPE: {analysis_label}
 CLASSIFICATION RESULT: {classification_result}
-CONFIDENCE LEVEL: {confidence}%
+CONFIDENCE LEVEL: {confidence_band}
 
 Generate a professional clinical analysis report. Requirements:
 
@@ -1072,21 +1309,65 @@ CRITICAL FORMATTING RULES:
 
 CLINICAL REPORT:"""
 
-        try:
-            response = self.llm.invoke(prompt)
-            if hasattr(response, 'content'):
-                text = response.content
-            else:
-                text = str(response)
+    def _write_clinical_report_text(self, classification_result: str, confidence_band: str, analysis_type: str = "audio") -> str:
+        """Generate the formal report text for a label and confidence band (raises on LLM failure)"""
+        analysis_label = "Lung Audio Auscultation" if analysis_type == "audio" else "Chest Radiograph"
 
-            # Clean up any remaining conversational elements
-            text = self.report_generator._remove_emojis(text) if hasattr(self.report_generator, '_remove_emojis') else text
-            text = self.report_generator._make_clinical(text) if hasattr(self.report_generator, '_make_clinical') else text
+        prompt = self.CLINICAL_REPORT_PROMPT.format(
+            analysis_label=analysis_label,
+            classification_result=classification_result,
+            confidence_band=confidence_band
+        )
+        text = self.cached_llm.invoke(prompt)
+
+        # Clean up any remaining conversational elements
+        text = self.report_generator._remove_emojis(text) if hasattr(self.report_generator, '_remove_emojis') else text
+        text = self.report_generator._make_clinical(text) if hasattr(self.report_generator, '_make_clinical') else text
+
+        return text
 
-            return text
+    def generate_clinical_report_text(self, classification_result: str, confidence: float, analysis_type: str = "audio") -> str:
+        """Generate professional clinical report text (not conversational)"""
+        try:
+            # The text only depends on label, confidence band and modality; served from the store
+            return self.report_text_store.get(classification_result, confidence, analysis_type)
         except Exception as e:
             return f"Classification: {classification_result} (Confidence: {confidence}%). Clinical correlation recommended."
 
+    def build_audio_prompt(self, result: dict):
+        """Build the narrative prompt for a parsed audio classification result (None if unknown label)"""
+        label = result.get("label", "").lower()
+        confidence = result.get("confidence", 0)
+        
+        # Handle XAI information if present
+        xai_info = ""
+        if "xai_type" in result:
+            xai_info = f"XAI Analysis: {result.get('explanation', '')}"
+            
+        # Add visualization info if available
+        if "visualization_saved" in result:
+            xai_info += f"\nVisualization saved: {result.get('visualization_saved')}"
+
+        if label == "normal":
+            context = self.get_relevant_context("normal")
+            return self.NORMAL_PROMPT.format(
+                persona=self.PERSONA,
+                label=result.get("label"),
+                confidence=confidence,
+                xai_info=xai_info,
+                context=context
+            )
+        elif label == "abnormal":
+            context = self.get_relevant_context("abnormal")
+            return self.ABNORMAL_PROMPT.format(
+                persona=self.PERSONA,
+                label=result.get("label"),
+                confidence=confidence,
+                xai_info=xai_info,
+                context=context
+            )
+        return None
+
     def process_audio_classification(self, audio_result: str) -> str:
         """Process audio classification result and provide appropriate response"""
         try:
@@ -1096,37 +1377,8 @@ CLINICAL REPORT:"""
             
             # Try to parse as JSON
             result = json.loads(audio_result)
-            label = result.get("label", "").lower()
-            confidence = result.get("confidence", 0)
-            
-            # Handle XAI information if present
-            xai_info = ""
-            if "xai_type" in result:
-                xai_info = f"XAI Analysis: {result.get('explanation', '')}"
-                
-            # Add visualization info if available
-            if "visualization_saved" in result:
-                xai_info += f"\nVisualization saved: {result.get('visualization_saved')}"
-
-            if label == "normal":
-                context = self.get_relevant_context("normal")
-                prompt = self.NORMAL_PROMPT.format(
-                    persona=self.PERSONA,
-                    label=result.get("label"),
-                    confidence=confidence,
-                    xai_info=xai_info,
-                    context=context
-                )
-            elif label == "abnormal":
-                context = self.get_relevant_context("abnormal")
-                prompt = self.ABNORMAL_PROMPT.format(
-                    persona=self.PERSONA,
-                    label=result.get("label"),
-                    confidence=confidence,
-                    xai_info=xai_info,
-                    context=context
-                )
-            else:
+            prompt = self.build_audio_prompt(result)
+            if prompt is None:
                 return "Unable to process audio classification result."
             
             response = self.llm.invoke(prompt)
@@ -1147,6 +1399,22 @@ CLINICAL REPORT:"""
         except Exception as e:
             return f"Error processing audio result: {str(e)}"
         
+    def build_xray_prompt(self, result: dict) -> str:
+        """Build the narrative prompt for a parsed X-ray classification result"""
+        label = result.get("label", "Unknown")
+        confidence = result.get("confidence", 0)
+
+        # Get relevant context about the disease/condition
+        context = self.get_relevant_context(f"{label} disease symptoms prevention treatment")
+        
+        # Generate comprehensive response using the X-ray specific prompt
+        return self.XRAY_PROMPT.format(
+            persona=self.PERSONA,
+            label=label,
+            confidence=confidence,
+            context=context
+        )
+
     def process_xray_classification(self, xray_result: str) -> str:
         """Process X-ray classification result and provide comprehensive information"""
         try:
@@ -1156,24 +1424,13 @@ CLINICAL REPORT:"""
             
             # Try to parse as JSON
             result = json.loads(xray_result)
-            label = result.get("label", "Unknown")
-            confidence = result.get("confidence", 0)
             
             # Add visualization info if available
             viz_info = ""
             if "visualization_saved" in result:
                 viz_info = f"\n📊 X-ray visualization saved: {result.get('visualization_saved')}"
 
-            # Get relevant context about the disease/condition
-            context = self.get_relevant_context(f"{label} disease symptoms prevention treatment")
-            
-            # Generate comprehensive response using the X-ray specific prompt
-            prompt = self.XRAY_PROMPT.format(
-                persona=self.PERSONA,
-                label=label,
-                confidence=confidence,
-                context=context
-            )
+            prompt = self.build_xray_prompt(result)
             
             detailed_response = self.llm.invoke(prompt)
             # Handle AIMessage object from newer versions of langchain-google-genai
@@ -1274,18 +1531,33 @@ I encountered an unexpected error while processing your request.
 
 Thank you for your patience! 🏥""".format(question)
 
-    def answer_question_with_context(self, question: str, language: str = "english", patient_info: dict = None,
-                                   patient_reports_context: str = "", chat_context: str = "") -> str:
-        """Answer questions with patient context and chat history - Enhanced version with robust error handling"""
+    def keyword_documents(self, query: str, k: int = 3):
+        """Documents for a short keyword query such as a quick info topic; BM25 only unless configured otherwise"""
+        if self.lexical_index is not None and quick_info_mode() == "lexical":
+            return [doc for doc, _ in self.lexical_index.search(query, k)]
+        return self.retriever.invoke(query)[:k]
+
+    def retrieve_question_documents(self, question: str):
+        """Knowledge base documents for a chat question (raises if retrieval fails)"""
+        return self.retriever.invoke(question)[:4]
+
+    def build_question_prompt(self, question: str, language: str = "english", patient_info: dict = None,
+                              patient_reports_context: str = "", chat_context: str = "", documents=None):
+        """Build the chat prompt with RAG, patient and conversation context. Returns (prompt, rag_failed).
+
+        documents, when given (e.g. reused from a chat session), replace the knowledge base search.
+        """
         # Get relevant medical knowledge from RAG with error handling
         medical_context = ""
         rag_failed = False
 
+        if documents is not None:
+            medical_context = "\n\n".join([doc.page_content for doc in documents])
         # Only try RAG if retriever is available
-        if self.retriever is not None:
+        elif self.retriever is not None:
             try:
-                docs = self.retriever.invoke(question)
-                medical_context = "\n\n".join([doc.page_content for doc in docs[:4]])
+                docs = self.retrieve_question_documents(question)
+                medical_context = "\n\n".join([doc.page_content for doc in docs])
             except Exception as e:
                 print(f"Warning: RAG retrieval failed: {e}")
                 medical_context = ""  # Continue without RAG context
@@ -1320,29 +1592,80 @@ Thank you for your patience! 🏥""".format(question)
 
         full_context = "\n\n".join(context_parts) if context_parts else "No additional context available."
 
-        # Try to get response from Gemini with error handling
+        # Use enhanced prompt with persona
+        prompt = self.QUESTION_PROMPT.format(
+            persona=self.PERSONA,
+            context=full_context,
+            question=question,
+            language=language
+        )
+        return prompt, rag_failed
+
+    def _answer_cache_scope(self, language, patient_info, patient_reports_context, chat_context):
+        """Semantic cache scope for a question, or None when the answer is patient/conversation specific"""
+        if patient_info or patient_reports_context or chat_context:
+            return None
+        return (self._static_context_version, self.prompt_version, (language or "english").lower())
+
+    def cached_answer(self, question: str, language: str = "english", patient_info: dict = None,
+                      patient_reports_context: str = "", chat_context: str = ""):
+        """Stored answer to the same or a near-duplicate general question, else None"""
+        scope = self._answer_cache_scope(language, patient_info, patient_reports_context, chat_context)
+        if scope is None:
+            return None
         try:
-            # Use enhanced prompt with persona
-            prompt = self.QUESTION_PROMPT.format(
-                persona=self.PERSONA,
-                context=full_context,
-                question=question,
-                language=language
-            )
+            return self.answer_cache.lookup(question, scope)
+        except Exception as e:
+            print(f"Warning: semantic cache lookup failed: {e}")
+            return None
 
+    def remember_answer(self, question: str, answer: str, rag_failed: bool, language: str = "english",
+                        patient_info: dict = None, patient_reports_context: str = "", chat_context: str = ""):
+        """Store a general answer for near-duplicate questions (answers written without RAG context are not kept)"""
+        scope = self._answer_cache_scope(language, patient_info, patient_reports_context, chat_context)
+        if scope is None or rag_failed:
+            return
+        try:
+            self.answer_cache.store(question, scope, answer)
+        except Exception as e:
+            print(f"Warning: semantic cache store failed: {e}")
+
+    def answer_question_with_context(self, question: str, language: str = "english", patient_info: dict = None,
+                                   patient_reports_context: str = "", chat_context: str = "", documents=None,
+                                   check_cache: bool = True) -> str:
+        """Answer questions with patient context and chat history - Enhanced version with robust error handling"""
+        # Callers that already ran cached_answer() pass check_cache=False to skip a second lookup
+        if check_cache:
+            cached = self.cached_answer(question, language, patient_info, patient_reports_context, chat_context)
+            if cached is not None:
+                return cached
+
+        prompt, rag_failed = self.build_question_prompt(
+            question, language, patient_info, patient_reports_context, chat_context, documents
+        )
+
+        # Try to get response from Gemini with error handling
+        try:
             response = self.llm.invoke(prompt)
             # Handle AIMessage object from newer versions of langchain-google-genai
             if hasattr(response, 'content'):
-                return response.content
-            return str(response)
+                answer = response.content
+            else:
+                answer = str(response)
+            self.remember_answer(question, answer, rag_failed, language, patient_info,
+                                 patient_reports_context, chat_context)
+            return answer
 
         except Exception as e:
             error_str = str(e)
             print(f"Error getting LLM response: {error_str}")
+            return self.question_error_message(question, error_str, rag_failed)
 
-            # Handle quota exceeded error
-            if "quota" in error_str.lower() or "429" in error_str:
-                return """⚠️ **Service Temporarily Unavailable**
+    def question_error_message(self, question: str, error_str: str, rag_failed: bool) -> str:
+        """User-facing fallback when the LLM call for a chat question fails"""
+        # Handle quota exceeded error
+        if "quota" in error_str.lower() or "429" in error_str:
+            return """⚠️ **Service Temporarily Unavailable**
 
 I apologize, but I've reached my daily API quota limit. This is a temporary limitation of the free tier service.
 
@@ -1355,9 +1678,9 @@ I apologize, but I've reached my daily API quota limit. This is a temporary limi
 
 Thank you for your understanding! 🏥""".format(question)
 
-            # Handle other errors with a fallback response
-            elif rag_failed or "qdrant" in error_str.lower():
-                return """⚠️ **Limited Response Mode**
+        # Handle other errors with a fallback response
+        elif rag_failed or "qdrant" in error_str.lower():
+            return """⚠️ **Limited Response Mode**
 
 The medical knowledge database is temporarily unavailable, but I can still assist you with basic queries.
 
@@ -1370,8 +1693,8 @@ The medical knowledge database is temporarily unavailable, but I can still assis
 
 Please try your question again, or contact a healthcare provider for specific medical advice. 🏥""".format(question)
 
-            else:
-                return """⚠️ **Service Error**
+        else:
+            return """⚠️ **Service Error**
 
 I encountered an unexpected error while processing your request.
 
@@ -1384,109 +1707,79 @@ I encountered an unexpected error while processing your request.
 
 Thank you for your patience! 🏥""".format(question)
 
-    def setup_agent(self):
-        print("🔧 Setting up optimized audio and X-ray analysis tools...")
-        # Create all audio analysis tools (now using shared cached models)
-        basic_audio_tool = AudioClassificationTool()
-        gradient_xai_tool = AudioGradientXAITool()
-        attention_xai_tool = AudioAttentionXAITool()
-        
-        # Create X-ray analysis tools
-        basic_xray_tool = XrayClassificationTool()
-        xray_viz_tool = XrayVisualizationTool()
-        
-        def process_basic_audio(path: str) -> str:
-            """Basic audio classification with medical response"""
-            audio_result = basic_audio_tool._run(path)
-            detailed_result = self.process_audio_classification(audio_result)
-            # Store detailed result for PDF generation
-            self.last_detailed_analysis = detailed_result
-            return detailed_result
-        
-        def process_gradient_audio(path: str) -> str:
-            """Audio classification with gradient XAI and medical response"""
-            audio_result = gradient_xai_tool._run(path)
-            detailed_result = self.process_audio_classification(audio_result)
-            # Store detailed result for PDF generation
-            self.last_detailed_analysis = detailed_result
-            return detailed_result
-        
-        def process_attention_audio(path: str) -> str:
-            """Audio classification with attention XAI and medical response"""
-            audio_result = attention_xai_tool._run(path)
-            detailed_result = self.process_audio_classification(audio_result)
-            # Store detailed result for PDF generation
-            self.last_detailed_analysis = detailed_result
-            return detailed_result
-        
-        def process_basic_xray(path: str) -> str:
-            """X-ray classification with medical response"""
-            xray_result = basic_xray_tool._run(path)
-            detailed_result = self.process_xray_classification(xray_result)
-            # Store detailed result for PDF generation
-            self.last_detailed_analysis = detailed_result
-            return detailed_result
-        
-        def process_xray_with_viz(path: str) -> str:
-            """X-ray classification with visualization and medical response"""
-            xray_result = xray_viz_tool._run(path)
-            detailed_result = self.process_xray_classification(xray_result)
-            # Store detailed result for PDF generation
-            self.last_detailed_analysis = detailed_result
-            return detailed_result
-        
-        tools = [
-            Tool(
-                name="analyze_lung_audio",
-                description="Basic lung audio classification (Normal/Abnormal) with medical advice. Use for quick analysis. Input: path to audio file",
-                func=process_basic_audio
-            ),
-            Tool(
-                name="analyze_lung_audio_gradient_xai",
-                description="Lung audio classification with gradient-based explainability showing which audio parts influenced the prediction. Use when explanation is needed. Input: path to audio file",
-                func=process_gradient_audio
-            ),
-            Tool(
-                name="analyze_lung_audio_attention_xai", 
-                description="Lung audio classification with attention-based explainability showing which regions the model focused on. Use for detailed analysis. Input: path to audio file",
-                func=process_attention_audio
-            ),
-            Tool(
-                name="analyze_chest_xray",
-                description="Basic chest X-ray classification for lung diseases/conditions with medical information about symptoms and prevention. Input: path to X-ray image file (jpg, png, jpeg)",
-                func=process_basic_xray
-            ),
-            Tool(
-                name="analyze_chest_xray_with_visualization",
-                description="Chest X-ray classification with visualization showing top predictions and confidence scores. Use for detailed X-ray analysis. Input: path to X-ray image file",
-                func=process_xray_with_viz
-            ),
-            Tool(
-                name="medical_knowledge_search", 
-                description="Search medical knowledge base for general medical questions. Input: medical question",
-                func=self.answer_general_question
-            )
-        ]
-
-        # Optimize agent for faster responses while keeping all functionality
-        self.agent = initialize_agent(
-            tools=tools,
-            llm=self.llm,
-            agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
-            max_iterations=5,  # Limit iterations for speed while keeping functionality
-            early_stopping_method="generate"  # Stop early when answer is found
-        )
-        print("✅ Optimized agent setup complete!")
+    # (modality, analysis type) -> analysis tool. The file type and requested mode decide the
+    # tool, so dispatch needs no LLM round trips; the LLM only writes the final narrative.
+    TOOL_ROUTES = {
+        ("audio", "basic"): "audio_classification",
+        ("audio", "gradient"): "audio_gradient_xai",
+        ("audio", "attention"): "audio_attention_xai",
+        ("xray", "basic"): "xray_classification",
+        ("xray", "visualization"): "xray_visualization",
+    }
+    DEFAULT_ANALYSIS_TYPES = {"audio": "attention", "xray": "basic"}
+    FILE_MODALITIES = {
+        ".wav": "audio", ".mp3": "audio", ".m4a": "audio", ".flac": "audio",
+        ".jpg": "xray", ".jpeg": "xray", ".png": "xray", ".bmp": "xray", ".tiff": "xray",
+    }
+    # Words in a free-text request that select an analysis mode, checked in order
+    MODE_KEYWORDS = [
+        ("gradient", "gradient"),
+        ("attention", "attention"),
+        ("detailed", "attention"),
+        ("visuali", "visualization"),
+        ("basic", "basic"),
+        ("quick", "basic"),
+    ]
+
+    def route_tool(self, modality: str, analysis_type: str = None) -> str:
+        """Analysis tool name for a modality and requested analysis type"""
+        analysis_type = analysis_type or self.DEFAULT_ANALYSIS_TYPES[modality]
+        tool_name = self.TOOL_ROUTES.get((modality, analysis_type))
+        if tool_name is None:
+            raise ValueError(f"Unknown {modality} analysis type: {analysis_type}")
+        return tool_name
+
+    def analyze_file(self, file_path: str, modality: str, analysis_type: str = None) -> str:
+        """Run the routed analysis tool directly, then narrate its result with one LLM call"""
+        tool_result = self.get_tool(self.route_tool(modality, analysis_type))._run(file_path)
+        narrate = self.process_audio_classification if modality == "audio" else self.process_xray_classification
+        detailed_result = narrate(tool_result)
+        # Store raw and detailed results for PDF generation
+        self.last_tool_result = tool_result
+        self.last_detailed_analysis = detailed_result
+        return detailed_result
+
+    def _classification_label(self, fallback: str) -> str:
+        """Label of the last analysis for the report, or the fallback text if it failed"""
+        try:
+            return json.loads(self.last_tool_result).get("label") or fallback
+        except (TypeError, ValueError, AttributeError):
+            return fallback
+
+    def get_tool(self, name: str):
+        """Return a shared analysis tool, importing its module on first use"""
+        tool = self._tools.get(name)
+        if tool is None:
+            tool = create_tool(name)
+            self._tools[name] = tool
+        return tool
 
     def query(self, user_input: str) -> str:
-        """Main query interface"""
-        # Check if the query is about audio analysis
-        if any(keyword in user_input.lower() for keyword in ["audio", "sound", "wav", "file", "analyze", "classify"]):
-            return self.agent.run(user_input)
-        else:
-            # For general medical questions, use direct RAG
+        """Main query interface: file analyses are dispatched directly, anything else goes to RAG"""
+        file_path = None
+        for token in user_input.split():
+            token = token.strip("'\"`,;()")
+            if os.path.splitext(token)[1].lower() in self.FILE_MODALITIES:
+                file_path = token
+                break
+        if file_path is None:
             return self.answer_general_question(user_input)
+
+        modality = self.FILE_MODALITIES[os.path.splitext(file_path)[1].lower()]
+        lowered = user_input.lower()
+        analysis_type = next((mode for word, mode in self.MODE_KEYWORDS
+                              if word in lowered and (modality, mode) in self.TOOL_ROUTES), None)
+        return self.analyze_file(file_path, modality, analysis_type)
     
     def analyze_audio_with_report(self, audio_path: str, analysis_type: str = "attention"):
         """Analyze audio and generate PDF report"""
@@ -1497,21 +1790,15 @@ Thank you for your patience! 🏥""".format(question)
         print(f"\n🔊 Analyzing audio file: {os.path.basename(audio_path)}")
         print("⏳ Please wait...")
         
-        # Choose analysis type
-        if analysis_type == "basic":
-            query = f"Can you analyze this lung audio file: {audio_path}"
-        elif analysis_type == "gradient":
-            query = f"Can you analyze this lung audio with gradient explanation: {audio_path}"
-        else:  # attention (default)
-            query = f"Can you analyze this lung audio with detailed explanation: {audio_path}"
-        
-        # Get analysis result
-        result = self.query(query)
+        # Basic, gradient or attention (default) tool, then one narrative call
+        if analysis_type not in ("basic", "gradient"):
+            analysis_type = "attention"
+        result = self.analyze_file(audio_path, "audio", analysis_type)
         
         # Generate PDF report with detailed analysis
         report_path = self.report_generator.generate_medical_report(
             self.current_patient, 
-            result,  # Final summary
+            self._classification_label(result),  # Final classification
             self.last_detailed_analysis,  # Detailed analysis from LLM
             audio_path
         )
@@ -1530,19 +1817,15 @@ Thank you for your patience! 🏥""".format(question)
         print(f"\n🩻 Analyzing X-ray image: {os.path.basename(xray_path)}")
         print("⏳ Please wait...")
         
-        # Choose analysis type
-        if analysis_type == "visualization":
-            query = f"Can you analyze this chest X-ray with visualization: {xray_path}"
-        else:  # basic (default)
-            query = f"Can you analyze this chest X-ray image: {xray_path}"
-        
-        # Get analysis result
-        result = self.query(query)
+        # Basic (default) or visualization tool, then one narrative call
+        if analysis_type != "visualization":
+            analysis_type = "basic"
+        result = self.analyze_file(xray_path, "xray", analysis_type)
         
         # Generate PDF report with detailed analysis
         report_path = self.report_generator.generate_xray_report(
             self.current_patient, 
-            result,  # Final summary
+            self._classification_label(result),  # Final classification
             self.last_detailed_analysis,  # Detailed analysis from LLM
             xray_path
         )
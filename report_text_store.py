@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Clinical Report Text Store for LUNGSCAREAI
+The formal PDF report text depends only on the label, a confidence band and the modality,
+so it is generated once per (label, band, modality, prompt version), persisted as JSON and
+served from memory afterwards. Entries are filled lazily or pre-generated for every label.
+
+Settings:
+    LUNGSCARE_REPORT_TEXT_PATH   JSON file the texts are persisted to (default report_texts.json)
+"""
+
+import json
+import os
+import threading
+
+# (upper bound exclusive, band name, description used in the prompt)
+CONFIDENCE_BANDS = [
+    (50, "low", "below 50%"),
+    (75, "moderate", "50-75%"),
+    (90, "high", "75-90%"),
+    (float("inf"), "very_high", "90% or above"),
+]
+
+AUDIO_LABELS = ["Normal", "Abnormal"]
+
+
+def confidence_band(confidence):
+    """(band name, description) for a confidence percentage"""
+    try:
+        confidence = float(confidence)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    for upper, name, description in CONFIDENCE_BANDS:
+        if confidence < upper:
+            return name, description
+    return CONFIDENCE_BANDS[-1][1], CONFIDENCE_BANDS[-1][2]
+
+
+def xray_labels(path=None):
+    """X-ray class names from inv_class_indices.json"""
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "inv_class_indices.json")
+    with open(path, "r") as f:
+        return [label for _, label in sorted(json.load(f).items(), key=lambda item: int(item[0]))]
+
+
+class ReportTextStore:
+    """Report texts keyed by (label, confidence band, analysis type, prompt version).
+
+    generate(label, band_description, analysis_type) produces a text or raises; failures are
+    not stored so the next report retries.
+    """
+
+    def __init__(self, generate, prompt_version, path=None):
+        self.generate = generate
+        self.prompt_version = prompt_version
+        self.path = path or os.getenv("LUNGSCARE_REPORT_TEXT_PATH", "report_texts.json")
+        self._texts = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.generated = 0
+        self._load()
+
+    def _key(self, label, band, analysis_type):
+        return f"{analysis_type}|{label.strip().lower()}|{band}|{self.prompt_version}"
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ Could not read report text store {self.path}: {e}")
+            return
+        # Texts written for another prompt version are dropped
+        suffix = f"|{self.prompt_version}"
+        self._texts = {key: text for key, text in stored.items() if key.endswith(suffix)}
+
+    def _save(self):
+        with self._lock:
+            snapshot = dict(self._texts)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, label, confidence, analysis_type):
+        """Report text for a result, generating and storing it on first use"""
+        band, description = confidence_band(confidence)
+        key = self._key(label, band, analysis_type)
+        with self._lock:
+            text = self._texts.get(key)
+            if text is not None:
+                self.hits += 1
+                return text
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # One generation per key even when several reports need it at once
+        with key_lock:
+            with self._lock:
+                text = self._texts.get(key)
+                if text is not None:
+                    self.hits += 1
+                    return text
+            text = self.generate(label, description, analysis_type)
+            with self._lock:
+                self._texts[key] = text
+                self.generated += 1
+            try:
+                self._save()
+            except Exception as e:
+                print(f"⚠️ Could not persist report text store: {e}")
+            return text
+
+    def pregenerate(self, labels_by_type=None):
+        """Fill every (label, band) for the given {analysis_type: labels}; returns texts generated"""
+        if labels_by_type is None:
+            labels_by_type = {"audio": AUDIO_LABELS, "xray": xray_labels()}
+        # A confidence inside each band selects it
+        band_confidences = [0, 50, 75, 90]
+        before = self.generated
+        for analysis_type, labels in labels_by_type.items():
+            for label in labels:
+                for confidence in band_confidences:
+                    try:
+                        self.get(label, confidence, analysis_type)
+                    except Exception as e:
+                        print(f"⚠️ Report text pre-generation failed for {analysis_type}/{label}: {e}")
+        print(f"📝 Report texts pre-generated: {self.generated - before} new, {len(self._texts)} stored")
+        return self.generated - before
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "prompt_version": self.prompt_version,
+                "stored": len(self._texts),
+                "hits": self.hits,
+                "generated": self.generated,
+            }
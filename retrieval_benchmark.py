@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Retrieval Benchmark for LUNGSCAREAI
+Measures how well and how fast each retrieval backend finds the corpus's own answers. Every
+sampled corpus question is a query (verbatim, or reduced to its keywords as a paraphrase)
+and the relevant chunks are those of the record(s) asking that question. Reports recall@k,
+MRR and p50/p95 search latency per backend and configuration.
+
+Backends:
+    numpy     exact cosine search over the latest knowledge base artifact (embedded index)
+    lexical   BM25 over the same chunks
+    hybrid    numpy dense candidates fused with BM25 (reciprocal rank fusion)
+    qdrant    each --collections entry on the Qdrant server, per HNSW ef and (for quantized
+              collections) rescoring setting; quantization and on-disk storage are read from the
+              collection, so `knowledge_base.py reindex --target` variants are compared side by side
+
+Usage:
+    python retrieval_benchmark.py [--backends numpy,lexical,hybrid,qdrant] [--k 1,3,5]
+        [--thresholds 0,0.5] [--hnsw-ef 0,64,128] [--rescore 1,0] [--collections medical_meadow,...]
+        [--queries 500] [--query-form question|keywords|both] [--output results.json]
+
+Dense latencies are search only; query encoding is measured once and reported separately.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from knowledge_base import (CORPUS_PATH, EMBEDDING_MODEL, collection_settings, collection_storage, latest_artifact,
+                            search_params)
+from lexical_index import BM25Index, hybrid_candidates, reciprocal_rank_fusion, tokenize
+from vector_index import NumpyVectorIndex
+
+WARMUP_QUERIES = 10
+
+
+def _int_list(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+
+def _float_list(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def load_queries(corpus_path=CORPUS_PATH, limit=500, seed=0, form="question"):
+    """Benchmark queries from the corpus: {"query", "input", "form"} per sampled question"""
+    with open(corpus_path, "r") as f:
+        records = json.load(f)
+    questions = sorted({record["input"] for record in records if record.get("input")})
+    random.Random(seed).shuffle(questions)
+    forms = ["question", "keywords"] if form == "both" else [form]
+
+    queries = []
+    for question in questions[:limit]:
+        for query_form in forms:
+            # Keyword paraphrase: the question without stopwords or punctuation
+            text = question if query_form == "question" else " ".join(tokenize(question))
+            queries.append({"query": text, "input": question, "form": query_form})
+    return queries
+
+
+def first_relevant_rank(metadatas, question):
+    """1-based rank of the first result from a record asking the question, else None"""
+    for rank, metadata in enumerate(metadatas, 1):
+        if (metadata or {}).get("input") == question:
+            return rank
+    return None
+
+
+def evaluate(search, queries, k):
+    """recall@k, MRR@k and latency percentiles of search(query) -> [metadata, ...]"""
+    for query in queries[:WARMUP_QUERIES]:
+        search(query)
+
+    latencies, reciprocal_ranks, hits = [], [], 0
+    for query in queries:
+        started = time.perf_counter()
+        metadatas = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rank = first_relevant_rank(metadatas[:k], query["input"])
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    latencies = np.asarray(latencies)
+    return {
+        "queries": len(queries),
+        f"recall@{k}": round(hits / len(queries), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def qdrant_search(client, collection_name, vectors, k, threshold, params):
+    def search(query):
+        points = client.query_points(
+            collection_name=collection_name,
+            query=vectors[query["query"]],
+            limit=k,
+            score_threshold=threshold or None,
+            search_params=params,
+            with_payload=True,
+        ).points
+        return [(point.payload or {}).get("metadata") for point in points]
+
+    return search
+
+
+def run_benchmark(backends, ks, thresholds, hnsw_efs, collections, queries, url="http://localhost:6333",
+                  rescores=(True,)):
+    """One result row per backend configuration"""
+    from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+    rows = []
+    embeddings = SentenceTransformerEmbeddings(model_name=EMBEDDING_MODEL)
+    texts = list(dict.fromkeys(query["query"] for query in queries))
+
+    vectors = {}
+    encode_ms = None
+    if any(backend in backends for backend in ("numpy", "hybrid", "qdrant")):
+        started = time.perf_counter()
+        vectors = dict(zip(texts, embeddings.embed_documents(texts)))
+        encode_ms = round((time.perf_counter() - started) * 1000 / len(texts), 3)
+        print(f"🧮 Encoded {len(texts)} queries: {encode_ms} ms per query (batched)")
+
+    index = None
+    lexical = None
+    if any(backend in backends for backend in ("numpy", "lexical", "hybrid")):
+        index = NumpyVectorIndex.load(embeddings, latest_artifact())
+        lexical = BM25Index(index.records)
+
+    client = None
+    storages = {}
+    if "qdrant" in backends:
+        from qdrant_client import QdrantClient
+
+        client = QdrantClient(url=url, timeout=60)
+        storages = {name: collection_storage(client, name) for name in collections}
+
+    def add(backend, config, k, metrics, dense):
+        row = {"backend": backend, **config, "k": k, **metrics}
+        if dense:
+            row["encode_ms"] = encode_ms
+        rows.append(row)
+        print(f"  {backend:<8} {json.dumps(config):<60} k={k:<3} recall={metrics[f'recall@{k}']:.3f} "
+              f"mrr={metrics['mrr']:.3f} p50={metrics['p50_ms']:.2f}ms p95={metrics['p95_ms']:.2f}ms")
+
+    for k in ks:
+        if "lexical" in backends:
+            search = lambda query: [doc.metadata for doc, _ in lexical.search(query["query"], k)]
+            add("lexical", {}, k, evaluate(search, queries, k), dense=False)
+
+        for threshold in thresholds:
+            if "numpy" in backends:
+                search = lambda query: [
+                    doc.metadata for doc, _ in index.similarity_search_with_score_by_vector(
+                        vectors[query["query"]], k=k, score_threshold=threshold or None)
+                ]
+                add("numpy", {"score_threshold": threshold}, k, evaluate(search, queries, k), dense=True)
+
+            if "hybrid" in backends:
+                candidates = max(k, hybrid_candidates())
+
+                def search(query):
+                    dense = [doc for doc, _ in index.similarity_search_with_score_by_vector(
+                        vectors[query["query"]], k=candidates, score_threshold=threshold or None)]
+                    sparse = [doc for doc, _ in lexical.search(query["query"], candidates)]
+                    return [doc.metadata for doc in reciprocal_rank_fusion([dense, sparse], k)]
+
+                add("hybrid", {"score_threshold": threshold, "candidates": candidates}, k,
+                    evaluate(search, queries, k), dense=True)
+
+            if "qdrant" in backends:
+                for collection_name in collections:
+                    storage = storages[collection_name]
+                    quantized = storage["quantization"] != "none"
+                    for hnsw_ef in hnsw_efs:
+                        # Rescoring only applies to quantized collections
+                        for rescore in (rescores if quantized else [None]):
+                            settings = collection_settings(rescore=rescore)
+                            settings["quantization"] = storage["quantization"]
+                            params = search_params(settings, hnsw_ef)
+                            search = qdrant_search(client, collection_name, vectors, k, threshold, params)
+                            config = {"collection": collection_name, "quantization": storage["quantization"],
+                                      "on_disk": storage["on_disk"], "hnsw_ef": hnsw_ef or "default",
+                                      "score_threshold": threshold}
+                            if quantized:
+                                config["rescore"] = rescore
+                                config["oversampling"] = settings["oversampling"] if rescore else None
+                            add("qdrant", config, k, evaluate(search, queries, k), dense=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LUNGSCAREAI retrieval quality and latency benchmark")
+    parser.add_argument("--backends", default="numpy,lexical,hybrid",
+                        help="comma-separated: numpy, lexical, hybrid, qdrant")
+    parser.add_argument("--k", default="1,3,5", help="comma-separated result counts")
+    parser.add_argument("--thresholds", default="0,0.5", help="comma-separated dense score thresholds (0 = none)")
+    parser.add_argument("--hnsw-ef", default="0,64,128", help="comma-separated Qdrant hnsw_ef values (0 = collection default)")
+    parser.add_argument("--rescore", default="1,0",
+                        help="comma-separated rescoring settings for quantized collections (1 = rescore, 0 = quantized scores only)")
+    parser.add_argument("--collections", default="medical_meadow", help="comma-separated Qdrant collections")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--queries", type=int, default=500, help="corpus questions sampled")
+    parser.add_argument("--query-form", choices=["question", "keywords", "both"], default="question")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the result rows as JSON")
+    args = parser.parse_args()
+
+    queries = load_queries(args.corpus, args.queries, args.seed, args.query_form)
+    print(f"📊 Benchmarking {len(queries)} queries ({args.query_form})")
+    rows = run_benchmark(
+        [backend.strip() for backend in args.backends.split(",")],
+        _int_list(args.k), _float_list(args.thresholds), _int_list(args.hnsw_ef),
+        [name.strip() for name in args.collections.split(",")],
+        queries, args.url, [value == 1 for value in _int_list(args.rescore)],
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"query_form": args.query_form, "seed": args.seed, "results": rows}, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Runtime Configuration for LUNGSCAREAI
+Sizes the PyTorch (audio) and TensorFlow (X-ray) thread pools per modality so the two
+frameworks do not each claim every core, and optionally pins a modality's dedicated worker
+process to a CPU set.
+
+Settings (per modality, MODALITY = AUDIO or XRAY):
+    LUNGSCARE_<MODALITY>_INTRA_OP_THREADS   default: available cores split evenly between modalities
+    LUNGSCARE_<MODALITY>_INTER_OP_THREADS   default: 1
+    LUNGSCARE_<MODALITY>_CPU_AFFINITY       e.g. "0-3" or "0,2,4" (default: unpinned; worker processes only)
+"""
+
+import os
+import threading
+
+MODALITY_FRAMEWORKS = {"audio": "torch", "xray": "tensorflow"}
+
+_APPLIED = {}
+_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    try:
+        value = int(os.getenv(name, default))
+        return value if value > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_cpu_list(spec):
+    """Parse a CPU list such as '0-3,6' into a sorted list of CPU ids"""
+    cpus = set()
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def available_cpus():
+    """CPUs this process may run on"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def thread_settings(modality):
+    """Requested thread settings for a modality, read from the environment"""
+    if modality not in MODALITY_FRAMEWORKS:
+        raise KeyError(f"Unknown modality '{modality}'")
+
+    prefix = f"LUNGSCARE_{modality.upper()}_"
+    affinity = parse_cpu_list(os.getenv(prefix + "CPU_AFFINITY", ""))
+    cores = len(affinity) if affinity else max(1, len(available_cpus()) // len(MODALITY_FRAMEWORKS))
+    return {
+        "framework": MODALITY_FRAMEWORKS[modality],
+        "intra_op_threads": _env_int(prefix + "INTRA_OP_THREADS", cores),
+        "inter_op_threads": _env_int(prefix + "INTER_OP_THREADS", 1),
+        "cpu_affinity": affinity,
+    }
+
+
+def _apply_affinity(cpus):
+    """Pin the calling thread (and threads it starts afterwards) to the given CPUs"""
+    if not cpus:
+        return False
+    try:
+        os.sched_setaffinity(0, cpus)
+        return True
+    except (AttributeError, OSError, ValueError) as e:
+        print(f"⚠️ Could not set CPU affinity {cpus}: {e}")
+        return False
+
+
+def _configure_torch(settings):
+    import torch
+
+    torch.set_num_threads(settings["intra_op_threads"])
+    try:
+        # Only allowed once, before any inter-op parallel work has started
+        torch.set_num_interop_threads(settings["inter_op_threads"])
+    except RuntimeError as e:
+        print(f"⚠️ PyTorch inter-op threads already fixed: {e}")
+    return {
+        "intra_op_threads": torch.get_num_threads(),
+        "inter_op_threads": torch.get_num_interop_threads(),
+    }
+
+
+def _configure_tensorflow(settings):
+    import tensorflow as tf
+
+    try:
+        # Must run before the TensorFlow runtime is initialized
+        tf.config.threading.set_intra_op_parallelism_threads(settings["intra_op_threads"])
+        tf.config.threading.set_inter_op_parallelism_threads(settings["inter_op_threads"])
+    except RuntimeError as e:
+        print(f"⚠️ TensorFlow thread pools already initialized: {e}")
+    return {
+        "intra_op_threads": tf.config.threading.get_intra_op_parallelism_threads(),
+        "inter_op_threads": tf.config.threading.get_inter_op_parallelism_threads(),
+    }
+
+
+def configure_runtime(modality, pin_cpus=False):
+    """Apply the thread (and affinity) settings for a modality once per process.
+
+    Called by the model loaders right before the framework builds its model, which is the
+    last point at which TensorFlow still accepts thread-pool changes. CPU affinity only pins
+    the calling thread and the threads it starts later, so it is applied (pin_cpus) only by a
+    dedicated worker process's initializer, never inside the API server.
+    """
+    with _lock:
+        if modality in _APPLIED:
+            return _APPLIED[modality]
+
+        settings = thread_settings(modality)
+        affinity_applied = _apply_affinity(settings["cpu_affinity"]) if pin_cpus else False
+        if settings["framework"] == "torch":
+            effective = _configure_torch(settings)
+        else:
+            effective = _configure_tensorflow(settings)
+
+        _APPLIED[modality] = {
+            "requested": settings,
+            "effective": dict(effective, cpu_affinity_applied=affinity_applied),
+            "pid": os.getpid(),
+        }
+        print(f"🧵 {modality} runtime: {effective['intra_op_threads']} intra-op / "
+              f"{effective['inter_op_threads']} inter-op threads")
+        return _APPLIED[modality]
+
+
+def runtime_settings():
+    """Report requested and effective runtime settings for every modality"""
+    with _lock:
+        return {
+            "cpu_count": os.cpu_count(),
+            "available_cpus": available_cpus(),
+            "modalities": {
+                modality: _APPLIED.get(modality, {"requested": thread_settings(modality), "effective": None})
+                for modality in MODALITY_FRAMEWORKS
+            },
+        }
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Semantic Answer Cache for LUNGSCAREAI
+Serves stored chat answers for questions that are near-duplicates of earlier ones
+("what is pneumonia" / "what's pneumonia?"). Only general, non-patient-specific answers
+are stored, and entries belong to a scope (corpus version, prompt version, language)
+so a knowledge base or prompt change invalidates them.
+
+Settings:
+    LUNGSCARE_SEMANTIC_CACHE_SIZE        answers kept (default 1000, 0 = off)
+    LUNGSCARE_SEMANTIC_CACHE_THRESHOLD   cosine similarity needed for a hit (default 0.92)
+    LUNGSCARE_SEMANTIC_CACHE_TTL         seconds an answer stays valid (default 86400)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embedding_cache import normalize_query
+
+
+def _env_number(name, default):
+    try:
+        return type(default)(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class SemanticAnswerCache:
+    """Embedding-similarity lookup of previous answers, LRU-bounded and scoped by version"""
+
+    def __init__(self, embeddings, max_entries=None, threshold=None, ttl=None):
+        self.embeddings = embeddings
+        self.max_entries = max_entries if max_entries is not None else _env_number("LUNGSCARE_SEMANTIC_CACHE_SIZE", 1000)
+        self.threshold = threshold if threshold is not None else _env_number("LUNGSCARE_SEMANTIC_CACHE_THRESHOLD", 0.92)
+        self.ttl = ttl if ttl is not None else _env_number("LUNGSCARE_SEMANTIC_CACHE_TTL", 86400.0)
+        self._entries = OrderedDict()  # normalised question -> entry
+        self._scope = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.embeddings is not None
+
+    def _check_scope(self, scope):
+        """Drop every entry when the corpus/prompt scope changes"""
+        if scope != self._scope:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._scope = scope
+
+    def _embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, question, scope):
+        """Stored answer for the question or a near-duplicate of it, else None"""
+        if not self.enabled:
+            return None
+        key = normalize_query(question)
+        now = time.time()
+        with self._lock:
+            self._check_scope(scope)
+            for stale in [k for k, entry in self._entries.items() if entry["expires_at"] <= now]:
+                del self._entries[stale]
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["answer"]
+            if not self._entries:
+                self.misses += 1
+                return None
+            keys = list(self._entries)
+            matrix = np.stack([self._entries[k]["vector"] for k in keys])
+
+        # Encoding happens outside the lock (and usually hits the query-embedding cache)
+        scores = matrix @ self._embed(question)
+        best = int(np.argmax(scores))
+        with self._lock:
+            entry = self._entries.get(keys[best])
+            if entry is not None and float(scores[best]) >= self.threshold and scope == self._scope:
+                self._entries.move_to_end(keys[best])
+                self.hits += 1
+                return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, question, scope, answer):
+        if not self.enabled or not answer:
+            return
+        vector = self._embed(question)
+        key = normalize_query(question)
+        with self._lock:
+            self._check_scope(scope)
+            self._entries[key] = {"vector": vector, "answer": answer, "expires_at": time.time() + self.ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.exact_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "scope": self._scope,
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round((self.hits + self.exact_hits) / lookups, 4) if lookups else 0.0,
+            }
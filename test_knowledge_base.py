@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_community")
+
+from knowledge_base import add_input_to_metadata, chunk_hash, content_version, point_id, source_hash
+
+RECORD = {"input": "What is asthma?", "output": "A chronic disease of the airways."}
+
+
+def _metadata(record=RECORD, source="/home/alice/corpus.json", seq_num=1):
+    return add_input_to_metadata(record, {"source": source, "seq_num": seq_num})
+
+
+def test_metadata_keeps_only_stable_fields():
+    assert _metadata() == {"source": "corpus.json", "input": "What is asthma?", "source_hash": source_hash(RECORD)}
+
+
+def test_chunk_hash_ignores_corpus_position_and_checkout_location():
+    text = "Q: What is asthma?\nA: A chronic disease of the airways."
+    moved = _metadata(source="/srv/lungscare/corpus.json", seq_num=42)
+
+    assert chunk_hash(text, _metadata()) == chunk_hash(text, moved)
+    assert point_id(chunk_hash(text, _metadata())) == point_id(chunk_hash(text, moved))
+
+
+def test_chunk_hash_changes_with_text_or_source_record():
+    text = "Q: What is asthma?\nA: A chronic disease of the airways."
+    edited = dict(RECORD, output="A chronic inflammatory disease of the airways.")
+
+    assert chunk_hash(text, _metadata()) != chunk_hash(text + " More.", _metadata())
+    # Same chunk text cut from an edited record (e.g. the unchanged first chunk) is a new chunk
+    assert chunk_hash(text, _metadata()) != chunk_hash(text, _metadata(edited))
+
+
+def test_content_version_names_the_set_of_chunks():
+    hashes = [chunk_hash(f"chunk {i}", _metadata()) for i in range(3)]
+
+    assert content_version(hashes) == content_version(list(reversed(hashes)))
+    assert content_version(hashes) != content_version(hashes[:2])
+    assert content_version(hashes[:2] + [chunk_hash("chunk 3", _metadata())]) != content_version(hashes)
+
+
+def test_content_version_tracks_the_embedding_model(monkeypatch):
+    import knowledge_base
+
+    hashes = [chunk_hash("chunk", _metadata())]
+    version = content_version(hashes)
+    monkeypatch.setattr(knowledge_base, "EMBEDDING_MODEL", "another-model")
+    assert content_version(hashes) != version
@@ -0,0 +1,78 @@
+import math
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from lexical_index import BM25Index, HybridRetriever, reciprocal_rank_fusion, tokenize
+
+RECORDS = [
+    {"page_content": "Asthma inhaler dosage", "metadata": {"id": 0}},
+    {"page_content": "Pneumonia antibiotics treatment", "metadata": {"id": 1}},
+    {"page_content": "Asthma asthma triggers", "metadata": {"id": 2}},
+]
+
+
+class FixedRetriever:
+    """Dense retriever double returning the same ranked documents for every query"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def invoke(self, query):
+        return list(self.documents)
+
+
+def _ids(results):
+    return [doc.metadata["id"] for doc, _ in results]
+
+
+def test_tokenize_drops_case_stopwords_and_single_characters():
+    assert tokenize("What is the dose of Salbutamol for a 5 year-old?") == ["dose", "salbutamol", "year", "old"]
+
+
+def test_bm25_scores_follow_the_okapi_formula():
+    index = BM25Index(RECORDS, k1=1.5, b=0.75)
+    # Every chunk has 3 terms, so length normalisation is 1; "asthma" is in 2 of 3 chunks
+    idf = math.log(1.0 + (3 - 2 + 0.5) / (2 + 0.5))
+    scores = {doc.metadata["id"]: score for doc, score in index.search("asthma", k=3)}
+
+    assert set(scores) == {0, 2}
+    assert scores[0] == pytest.approx(idf * 1 * 2.5 / (1 + 1.5), rel=1e-5)
+    assert scores[2] == pytest.approx(idf * 2 * 2.5 / (2 + 1.5), rel=1e-5)
+
+
+def test_rarer_terms_weigh_more():
+    index = BM25Index(RECORDS)
+    # "inhaler" (1 chunk) outweighs "asthma" (2 chunks) at equal term frequency
+    assert _ids(index.search("asthma inhaler", k=3)) == [0, 2]
+
+
+def test_search_without_matching_terms_returns_nothing():
+    index = BM25Index(RECORDS)
+    assert index.search("tuberculosis", k=3) == []
+    assert index.search("what is the", k=3) == []
+    assert index.stats()["chunks"] == 3
+
+
+def test_fusion_sums_reciprocal_ranks_and_deduplicates():
+    a, b, c, d = (Document(page_content=text) for text in "abcd")
+    fused = reciprocal_rank_fusion([[a, b, c], [b, d]], k=4)
+    # b: 1/62 + 1/61 beats a: 1/61, then d: 1/62 before c: 1/63
+    assert [doc.page_content for doc in fused] == ["b", "a", "d", "c"]
+    assert len(reciprocal_rank_fusion([[a, b], [a, b]], k=4)) == 2
+
+
+def test_hybrid_retriever_modes():
+    lexical = BM25Index(RECORDS)
+    dense_docs = [Document(page_content="Pneumonia antibiotics treatment", metadata={"id": 1}),
+                  Document(page_content="Asthma asthma triggers", metadata={"id": 2})]
+    retriever = HybridRetriever(dense=FixedRetriever(dense_docs), lexical=lexical, mode="hybrid", k=2, candidates=3)
+
+    assert [doc.metadata["id"] for doc in retriever.search("asthma", mode="lexical")] == [2, 0]
+    assert [doc.metadata["id"] for doc in retriever.search("asthma", mode="dense")] == [1, 2]
+    # Chunk 2 is ranked by both sides, so fusion puts it first
+    assert [doc.metadata["id"] for doc in retriever.search("asthma", mode="hybrid")][0] == 2
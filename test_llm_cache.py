@@ -0,0 +1,99 @@
+import pytest
+
+import llm_cache
+from llm_cache import CachedLLM, LLMResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLLM:
+    model = "test-model"
+    temperature = 0.0
+
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return f"answer to {prompt}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+
+def _cache(tmp_path, **kwargs):
+    return LLMResponseCache(path=str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_entries_expire_after_their_ttl(tmp_path, clock):
+    cache = _cache(tmp_path, ttl=60, max_entries=10, memory_entries=10)
+    cache.set("default", "a")
+    cache.set("short", "b", ttl=5)
+
+    clock.now += 10
+    assert cache.get("default") == "a"
+    assert cache.get("short") is None
+
+    clock.now += 60
+    assert cache.get("default") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_memory_tier_is_a_bounded_lru_backed_by_disk(tmp_path, clock):
+    cache = _cache(tmp_path, ttl=60, max_entries=10, memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("a") == "A"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"]) == (0, 1)
+    assert cache.get("a") == "A"
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_disk_keeps_the_most_recently_used_entries(tmp_path, clock):
+    cache = _cache(tmp_path, ttl=600, max_entries=2, memory_entries=0)
+    cache.set("a", "A")
+    clock.now += 1
+    cache.set("b", "B")
+    clock.now += 1
+    assert cache.get("a") == "A"
+    clock.now += 1
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+
+
+def test_zero_max_entries_disables_the_cache(tmp_path):
+    cache = _cache(tmp_path, max_entries=0)
+    cache.set("a", "A")
+    assert cache.get("a") is None
+    assert not (tmp_path / "cache.sqlite3").exists()
+
+
+def test_keys_depend_on_prompt_and_model_parameters():
+    key = LLMResponseCache.make_key("prompt", {"model": "m", "temperature": 0.0})
+    assert key == LLMResponseCache.make_key("prompt", {"temperature": 0.0, "model": "m"})
+    assert key != LLMResponseCache.make_key("prompt", {"model": "m", "temperature": 0.7})
+    assert key != LLMResponseCache.make_key("other prompt", {"model": "m", "temperature": 0.0})
+
+
+def test_cached_llm_calls_the_model_once_per_prompt(tmp_path, clock):
+    llm = CountingLLM()
+    cached = CachedLLM(llm, _cache(tmp_path, ttl=60, max_entries=10, memory_entries=10))
+
+    assert cached.invoke("tips") == cached.invoke("tips") == "answer to tips"
+    cached.invoke("other")
+    assert llm.prompts == ["tips", "other"]
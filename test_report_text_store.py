@@ -0,0 +1,69 @@
+import pytest
+
+from report_text_store import ReportTextStore, confidence_band
+
+
+class Generator:
+    """generate() double counting calls; fails while `failing` is set"""
+
+    def __init__(self):
+        self.calls = []
+        self.failing = False
+
+    def __call__(self, label, band_description, analysis_type):
+        self.calls.append((label, band_description, analysis_type))
+        if self.failing:
+            raise RuntimeError("quota exceeded")
+        return f"{label} report ({band_description})"
+
+
+@pytest.mark.parametrize("confidence, band", [
+    (0, "low"), (49.9, "low"), (50, "moderate"), (74.99, "moderate"), (75, "high"),
+    (89.9, "high"), (90, "very_high"), (100, "very_high"), ("82.5", "high"), (None, "low"), ("n/a", "low"),
+])
+def test_confidence_bands(confidence, band):
+    assert confidence_band(confidence)[0] == band
+
+
+def test_text_is_generated_once_per_label_band_and_type(tmp_path):
+    generate = Generator()
+    store = ReportTextStore(generate, "v1", path=str(tmp_path / "texts.json"))
+
+    first = store.get("Pneumonia", 91, "xray")
+    assert store.get(" pneumonia ", 99, "xray") == first
+    store.get("Pneumonia", 60, "xray")
+    store.get("Pneumonia", 91, "audio")
+
+    assert len(generate.calls) == 3
+    assert store.stats()["hits"] == 1
+
+
+def test_texts_persist_for_the_same_prompt_version_only(tmp_path):
+    path = str(tmp_path / "texts.json")
+    ReportTextStore(Generator(), "v1", path=path).get("Normal", 95, "audio")
+
+    generate = Generator()
+    ReportTextStore(generate, "v1", path=path).get("Normal", 95, "audio")
+    assert generate.calls == []
+
+    ReportTextStore(generate, "v2", path=path).get("Normal", 95, "audio")
+    assert len(generate.calls) == 1
+
+
+def test_failed_generation_is_retried(tmp_path):
+    generate = Generator()
+    store = ReportTextStore(generate, "v1", path=str(tmp_path / "texts.json"))
+
+    generate.failing = True
+    with pytest.raises(RuntimeError):
+        store.get("Abnormal", 80, "audio")
+    generate.failing = False
+    assert store.get("Abnormal", 80, "audio") == "Abnormal report (75-90%)"
+    assert len(generate.calls) == 2
+
+
+def test_pregenerate_fills_every_band(tmp_path):
+    store = ReportTextStore(Generator(), "v1", path=str(tmp_path / "texts.json"))
+
+    assert store.pregenerate({"audio": ["Normal", "Abnormal"]}) == 8
+    assert store.pregenerate({"audio": ["Normal", "Abnormal"]}) == 0
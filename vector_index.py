@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Embedded Vector Index for LUNGSCAREAI
+Exact cosine search over a memory-mapped NumPy embedding matrix: a retrieval backend that
+needs no Qdrant server. Exposes the LangChain VectorStore interface, so as_retriever()
+behaves like the Qdrant retriever.
+
+Files in the index directory:
+    embeddings.npy   (n_chunks, dim) L2-normalised matrix, float32 or float16
+    chunks.jsonl     one {"page_content": ..., "metadata": {...}} record per row
+
+Settings:
+    LUNGSCARE_VECTOR_INDEX_DIR     index directory (default vector_index)
+    LUNGSCARE_VECTOR_INDEX_DTYPE   float32 (default) or float16 (half the memory, slower scoring);
+                                   applies to the matrix held in memory, whatever dtype the files store
+"""
+
+import json
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.jsonl"
+SCORE_BLOCK_ROWS = 16384
+
+
+def default_index_dir():
+    return os.getenv("LUNGSCARE_VECTOR_INDEX_DIR", "vector_index")
+
+
+def default_dtype():
+    dtype = os.getenv("LUNGSCARE_VECTOR_INDEX_DTYPE", "float32").lower()
+    return dtype if dtype in ("float32", "float16") else "float32"
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first (argpartition, then sort only those k)"""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[-1])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def write_index(index_dir, vectors, texts, metadatas=None, dtype=None, extras=None):
+    """Write an index directory from chunk texts and their embeddings.
+
+    extras, if given, holds one dict of additional fields per chunk record.
+    """
+    dtype = dtype or default_dtype()
+    os.makedirs(index_dir, exist_ok=True)
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32)).astype(dtype)
+    np.save(os.path.join(index_dir, EMBEDDINGS_FILE), matrix)
+    metadatas = metadatas or [{} for _ in texts]
+    extras = extras or [{} for _ in texts]
+    with open(os.path.join(index_dir, CHUNKS_FILE), "w") as f:
+        for text, metadata, extra in zip(texts, metadatas, extras):
+            f.write(json.dumps({"page_content": text, "metadata": metadata, **extra}) + "\n")
+
+
+class ReadOnlyIndexError(Exception):
+    """Raised when texts are added to an embedded index, which is rebuilt rather than appended to"""
+
+
+class NumpyVectorIndex(VectorStore):
+    """In-process exact top-k cosine index over a memory-mapped embedding matrix.
+
+    Read-only: the matrix is typically a mapping of a versioned knowledge base artifact whose
+    files must not change under their version, so add_texts/add_documents raise
+    ReadOnlyIndexError. New content goes into a new index directory (from_texts, write_index)
+    or a new artifact (knowledge_base.py build).
+    """
+
+    def __init__(self, embedding, matrix, records, version=None):
+        self.embedding = embedding
+        self.matrix = matrix
+        self.records = records
+        self.version = version
+
+    @classmethod
+    def exists(cls, index_dir=None):
+        index_dir = index_dir or default_index_dir()
+        return (os.path.exists(os.path.join(index_dir, EMBEDDINGS_FILE))
+                and os.path.exists(os.path.join(index_dir, CHUNKS_FILE)))
+
+    @classmethod
+    def load(cls, embedding, index_dir=None, dtype=None):
+        """Memory-map an index directory written by write_index, as dtype (default: the setting)"""
+        index_dir = index_dir or default_index_dir()
+        path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        matrix = np.load(path, mmap_mode="r")
+        dtype = np.dtype(dtype or default_dtype())
+        if matrix.dtype != dtype:
+            # Knowledge base artifacts store float32 (incremental builds reuse their rows); the
+            # local matrix is an in-memory copy in the configured dtype instead of the mapping
+            matrix = np.ascontiguousarray(matrix, dtype=dtype)
+        with open(os.path.join(index_dir, CHUNKS_FILE), "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if len(records) != matrix.shape[0]:
+            raise ValueError(f"Index {index_dir} has {matrix.shape[0]} vectors but {len(records)} chunks")
+        manifest_path = os.path.join(index_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            # Knowledge base artifacts carry a content-hash version
+            with open(manifest_path, "r") as f:
+                version = f"numpy:{json.load(f)['version']}"
+        else:
+            version = f"numpy:{matrix.shape[0]}:{int(os.stat(path).st_mtime)}"
+        return cls(embedding, matrix, records, version=version)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, index_dir=None, dtype=None, **kwargs):
+        """Embed texts, write them as an index directory and load it"""
+        texts = list(texts)
+        index_dir = index_dir or default_index_dir()
+        write_index(index_dir, embedding.embed_documents(texts), texts, metadatas, dtype=dtype)
+        return cls.load(embedding, index_dir)
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise ReadOnlyIndexError("NumpyVectorIndex is read-only; build a new index directory or artifact instead")
+
+    def _score(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.matrix.dtype == np.float32:
+            return vectors @ self.matrix.T
+        # float16 rows are upcast block by block: float32 precision without a full-size copy
+        scores = np.empty(vectors.shape[:-1] + (self.matrix.shape[0],), dtype=np.float32)
+        for start in range(0, self.matrix.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(self.matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[..., start:start + SCORE_BLOCK_ROWS] = vectors @ block.T
+        return scores
+
+    def _results(self, scores, k, score_threshold=None):
+        results = []
+        for i in top_k(scores, k):
+            score = float(scores[i])
+            if score_threshold is not None and score < score_threshold:
+                break
+            record = self.records[i]
+            results.append((Document(page_content=record["page_content"], metadata=record.get("metadata", {})), score))
+        return results
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, score_threshold=None, **kwargs):
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        return self._results(self._score(query), k, score_threshold)
+
+    def search_batch_by_vectors(self, embeddings, k=4, score_threshold=None):
+        """(Document, score) lists for several query vectors, scored with one matrix multiply"""
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1))
+        scores = self._score(queries)
+        return [self._results(row, k, score_threshold) for row in scores]
+
+    def similarity_search_with_score(self, query, k=4, score_threshold=None, **kwargs):
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k=k, score_threshold=score_threshold
+        )
+
+    def similarity_search_by_vector(self, embedding, k=4, score_threshold=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, score_threshold)]
+
+    def similarity_search(self, query, k=4, score_threshold=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, score_threshold)]
+
+    def _similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        # Cosine similarity is already a relevance score
+        return self.similarity_search_with_score(query, k=k, **kwargs)
+
+    def __len__(self):
+        return self.matrix.shape[0]
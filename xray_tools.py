@@ -9,9 +9,10 @@ import json
 import numpy as np
 import tensorflow as tf
 from langchain.tools import BaseTool
-from typing import Dict, Any
 from PIL import Image
 import cv2
+from model_registry import model_registry
+from runtime_config import configure_runtime
 
 # Suppress TensorFlow warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -133,109 +134,127 @@ def preprocess_xray_image(img_path, target_size=(224, 224), enhance=True):
     except Exception as e:
         raise ValueError(f"Failed to preprocess X-ray image {img_path}: {e}")
 
-# Global model cache for X-ray models
-_XRAY_MODEL_CACHE = {
-    'model': None,
-    'class_indices': None,
-    'loaded': False
-}
+def load_xray_model():
+    """Load the X-ray classification model and class labels (called by the model registry)"""
+    print("🚀 Loading X-ray classification model...")
+    configure_runtime("xray")
+    
+    try:
+        # Get the absolute path to the model file
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        model_path = os.path.join(current_dir, "final_model.keras")
+        indices_path = os.path.join(current_dir, "inv_class_indices.json")
+        
+        # Load the model with custom objects
+        model = tf.keras.models.load_model(
+            model_path,
+            custom_objects={"CoordinateAttention": CoordinateAttention},
+            compile=False
+        )
+        
+        # Load class indices
+        with open(indices_path, "r") as f:
+            inv_class_indices = json.load(f)
+        class_indices = {int(k): v for k, v in inv_class_indices.items()}
+        
+        print("✅ X-ray model loaded successfully")
+        return model, class_indices
+        
+    except Exception as e:
+        print(f"❌ Failed to load X-ray model: {e}")
+        raise
 
 def get_cached_xray_model():
     """Get cached X-ray model components to avoid reloading"""
-    global _XRAY_MODEL_CACHE
-    
-    if not _XRAY_MODEL_CACHE['loaded']:
-        print("🚀 Loading X-ray classification model...")
-        
-        try:
-            # Get the absolute path to the model file
-            import os
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(current_dir, "final_model.keras")
-            indices_path = os.path.join(current_dir, "inv_class_indices.json")
-            
-            # Load the model with custom objects
-            _XRAY_MODEL_CACHE['model'] = tf.keras.models.load_model(
-                model_path,
-                custom_objects={"CoordinateAttention": CoordinateAttention},
-                compile=False
-            )
-            
-            # Load class indices
-            with open(indices_path, "r") as f:
-                inv_class_indices = json.load(f)
-            _XRAY_MODEL_CACHE['class_indices'] = {int(k): v for k, v in inv_class_indices.items()}
-            
-            print("✅ X-ray model loaded successfully")
-            _XRAY_MODEL_CACHE['loaded'] = True
-            
-        except Exception as e:
-            print(f"❌ Failed to load X-ray model: {e}")
-            raise
-    
-    return _XRAY_MODEL_CACHE['model'], _XRAY_MODEL_CACHE['class_indices']
+    return model_registry.get("xray")
 
 class XrayClassificationTool(BaseTool):
     name: str = "xray_classification"
     description: str = "Classifies chest X-ray images for various lung diseases/conditions with confidence percentage using enhanced CLAHE preprocessing. Input: path to X-ray image file"
-    model: Any = None
-    class_indices: Dict = None
     
-    def __init__(self):
-        super().__init__()
-        # Use cached model for faster initialization
-        self.model, self.class_indices = get_cached_xray_model()
+    # Model is resolved through the registry on each use so it can be unloaded when idle
+    @property
+    def model(self):
+        return get_cached_xray_model()[0]
+    
+    @property
+    def class_indices(self):
+        return get_cached_xray_model()[1]
     
     def _run(self, path: str) -> str:
+        return self._run_batch([path])[0]
+    
+    def _run_batch(self, paths: list) -> list:
+        """Classify several X-ray images with one batched prediction (one JSON result per path)"""
+        results = [None] * len(paths)
+        batch, indices, abs_paths = [], [], {}
+        for i, path in enumerate(paths):
+            try:
+                # Convert to absolute path if not already
+                if not os.path.isabs(path):
+                    path = os.path.abspath(path)
+                
+                # Check if file exists
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"X-ray image not found: {path}")
+                
+                # Enhanced preprocessing with CLAHE + GFB
+                orig_img, preprocessed_img, x = preprocess_xray_image(path, enhance=True)
+                batch.append(x)
+                indices.append(i)
+                abs_paths[i] = path
+            except Exception as e:
+                results[i] = f"Error processing X-ray image: {str(e)}"
+        
+        if not batch:
+            return results
+        
         try:
-            # Convert to absolute path if not already
-            if not os.path.isabs(path):
-                path = os.path.abspath(path)
-            
-            # Check if file exists
-            if not os.path.exists(path):
-                raise FileNotFoundError(f"X-ray image not found: {path}")
-            
-            # Enhanced preprocessing with CLAHE + GFB
-            orig_img, preprocessed_img, x = preprocess_xray_image(path, enhance=True)
+            model, class_indices = get_cached_xray_model()
             
             # Run prediction
-            pred = self.model.predict(x, verbose=0)
-            pred_class = np.argmax(pred, axis=1)[0]
-            pred_label = self.class_indices[pred_class]
-            confidence = float(pred[0][pred_class]) * 100
+            preds = model.predict(np.concatenate(batch, axis=0), verbose=0)
             
-            # Get top 5 predictions for additional context
-            top_5_indices = pred[0].argsort()[-5:][::-1]
-            top_5_predictions = []
-            for idx in top_5_indices:
-                top_5_predictions.append({
-                    "label": self.class_indices[idx],
-                    "confidence": float(pred[0][idx]) * 100
+            for i, pred in zip(indices, preds):
+                pred_class = int(np.argmax(pred))
+                pred_label = class_indices[pred_class]
+                confidence = float(pred[pred_class]) * 100
+                
+                # Get top 5 predictions for additional context
+                top_5_indices = pred.argsort()[-5:][::-1]
+                top_5_predictions = []
+                for idx in top_5_indices:
+                    top_5_predictions.append({
+                        "label": class_indices[idx],
+                        "confidence": float(pred[idx]) * 100
+                    })
+                
+                results[i] = json.dumps({
+                    "label": pred_label,
+                    "confidence": round(confidence, 2),
+                    "classification_type": "chest_xray",
+                    "preprocessing": "CLAHE + GFB Enhanced",
+                    "top_5_predictions": top_5_predictions,
+                    "image_path": abs_paths[i],
+                    "enhancement_applied": True
                 })
-            
-            return json.dumps({
-                "label": pred_label,
-                "confidence": round(confidence, 2),
-                "classification_type": "chest_xray",
-                "preprocessing": "CLAHE + GFB Enhanced",
-                "top_5_predictions": top_5_predictions,
-                "image_path": path,
-                "enhancement_applied": True
-            })
-            
         except Exception as e:
-            return f"Error processing X-ray image: {str(e)}"
+            for i in indices:
+                results[i] = f"Error processing X-ray image: {str(e)}"
+        return results
 
 class XrayVisualizationTool(BaseTool):
     name: str = "xray_visualization"
     description: str = "Classifies chest X-ray with enhanced CLAHE preprocessing and generates comprehensive visualization with original, preprocessed images and prediction analysis. Input: path to X-ray image file"
-    model: Any = None
-    class_indices: Dict = None
     
-    def __init__(self):
-        super().__init__()
-        self.model, self.class_indices = get_cached_xray_model()
+    # Model is resolved through the registry on each use so it can be unloaded when idle
+    @property
+    def model(self):
+        return get_cached_xray_model()[0]
+    
+    @property
+    def class_indices(self):
+        return get_cached_xray_model()[1]
     
     def _run(self, path: str) -> str:
         try: